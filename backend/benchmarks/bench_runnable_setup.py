@@ -0,0 +1,111 @@
+"""
+요청당 파이프라인 구성 비용 마이크로벤치마크
+- before: 요청마다 prompt | model | parser 체인, RunnableWithMessageHistory, AgentExecutor를 새로 구성
+- after: 시작 시 한 번 구성한 runnable을 재사용하고 세션은 config로만 바인딩
+
+실행 (backend 디렉토리에서):
+    python -m benchmarks.bench_runnable_setup --iterations 200
+"""
+import argparse
+import time
+from langchain.agents import AgentExecutor, create_tool_calling_agent
+from langchain_core.language_models.fake_chat_models import GenericFakeChatModel
+from langchain_core.output_parsers import JsonOutputParser
+from langchain_core.runnables import RunnableConfig
+from langchain_core.runnables.history import RunnableWithMessageHistory
+from langchain_core.utils.function_calling import convert_to_openai_tool
+from core.agent import create_agent_prompt
+from core.models import Router, CodeGenerator, VisualizationRecommendation
+from core.state import get_session_history
+from core.utils import visualization_prompt, get_visualization_chain
+
+
+class BenchChatModel(GenericFakeChatModel):
+    """도구 바인딩을 지원하는 가짜 채팅 모델 (구성 비용만 측정)"""
+
+    def bind_tools(self, tools, **kwargs):
+        return self.bind(tools=[convert_to_openai_tool(t) for t in tools], **kwargs)
+
+
+def build_per_request(model, prompts, tools):
+    """기존 방식: 요청마다 모든 파이프라인 구성"""
+    router_prompt, code_generator_prompt, agent_prompt = prompts
+
+    RunnableWithMessageHistory(
+        router_prompt | model | JsonOutputParser(pydantic_object=Router),
+        get_session_history,
+        input_messages_key="query",
+        history_messages_key="chat_history",
+    )
+    RunnableWithMessageHistory(
+        code_generator_prompt | model | JsonOutputParser(pydantic_object=CodeGenerator),
+        get_session_history,
+        input_messages_key="query",
+        history_messages_key="chat_history",
+    )
+    visualization_prompt | model | JsonOutputParser(pydantic_object=VisualizationRecommendation)
+
+    agent_obj = create_tool_calling_agent(model, tools, agent_prompt)
+    agent_executor = AgentExecutor(
+        agent=agent_obj,
+        tools=tools,
+        verbose=False,
+        max_iterations=10,
+        max_execution_time=120,
+        handle_parsing_errors=True,
+        return_intermediate_steps=True,
+    )
+    RunnableWithMessageHistory(
+        agent_executor,
+        get_session_history,
+        history_messages_key="chat_history",
+    )
+
+
+def bind_per_request(model, session_id):
+    """변경 후: 미리 구성한 runnable을 꺼내고 세션 config만 생성"""
+    get_visualization_chain(model)
+    return RunnableConfig(configurable={"session_id": session_id}, callbacks=[])
+
+
+def measure(func, iterations):
+    started = time.perf_counter()
+    for _ in range(iterations):
+        func()
+    return (time.perf_counter() - started) / iterations * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--iterations", type=int, default=200)
+    args = parser.parse_args()
+
+    from langchain_core.prompts import PromptTemplate
+    from langchain.agents import tool
+
+    model = BenchChatModel(messages=iter(()))
+
+    @tool
+    def code_generator(input):
+        """코드 생성"""
+        return input
+
+    @tool
+    def code_executor(input_code: str):
+        """코드 실행"""
+        return input_code
+
+    tools = [code_generator, code_executor]
+    simple_prompt = PromptTemplate.from_template("{chat_history} {query}")
+    prompts = (simple_prompt, simple_prompt, create_agent_prompt())
+
+    before = measure(lambda: build_per_request(model, prompts, tools), args.iterations)
+    after = measure(lambda: bind_per_request(model, "bench-session"), args.iterations)
+
+    print(f"요청당 구성 비용 (before): {before:10.1f} µs")
+    print(f"요청당 구성 비용 (after):  {after:10.1f} µs")
+    print(f"절감: {before - after:.1f} µs/request ({before / max(after, 1e-9):.0f}x)")
+
+
+if __name__ == "__main__":
+    main()
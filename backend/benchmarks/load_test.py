@@ -0,0 +1,157 @@
+"""
+엔드 투 엔드 부하 테스트
+- 동시성 단계별로 POST /api/ (질문) 후 GET /api/execution/{id} (실행 결과)를 호출
+- 엔드포인트별 p50/p95/p99 지연 시간과 처리량(질문/초)을 출력
+
+OpenAI 없이 측정하려면 서버를 재생 모드로 실행 (backend 디렉토리에서):
+    LLM_BACKEND=replay LLM_REPLAY_LATENCY_MS=300 python main.py
+    python -m benchmarks.load_test --concurrency 1,4,16 --requests 50
+
+질문 캐시를 거치지 않고 매번 그래프 전체를 실행하려면 서버에 QUESTION_CACHE_THRESHOLD=1.01 지정
+실제 응답을 재생하려면 먼저 LLM_BACKEND=record로 같은 질문을 한 번 실행하여 LLM_REPLAY_PATH에 기록
+"""
+import argparse
+import asyncio
+import json
+import math
+import time
+import uuid
+import httpx
+
+
+DEFAULT_QUESTIONS = [
+    "구별 공장 수를 알려줘",
+    "규모별 공장 수는?",
+    "업종별 종업원 합계 상위 20개",
+    "금천구에 있는 반도체 공장 수",
+    "성동구 중기업 공장 목록",
+    "여자종업원이 가장 많은 공장은?",
+]
+
+
+def percentile(values, q: float) -> float:
+    """nearest-rank 백분위수"""
+    if not values:
+        return float("nan")
+    ordered = sorted(values)
+    index = max(0, math.ceil(q / 100 * len(ordered)) - 1)
+    return ordered[index]
+
+
+def summarize(values):
+    return {
+        "count": len(values),
+        "p50": percentile(values, 50),
+        "p95": percentile(values, 95),
+        "p99": percentile(values, 99),
+    }
+
+
+async def run_one(client: httpx.AsyncClient, question: str, args, stats):
+    """질문 하나: /api/ 호출 후 execution_id가 있으면 실행 결과 조회"""
+    started = time.perf_counter()
+    try:
+        response = await client.post(f"{args.prefix}/api/", json={"message": question, "session_id": str(uuid.uuid4())})
+        response.raise_for_status()
+        body = response.json()
+    except (httpx.HTTPError, ValueError) as e:
+        stats["errors"].append(f"/api/: {type(e).__name__}: {e}")
+        return
+    stats["api"].append(time.perf_counter() - started)
+    if body.get("status") != "success":
+        stats["errors"].append(f"/api/: status={body.get('status')} {body.get('error_type', '')}")
+        return
+    stats["cached"] += bool(body.get("cached"))
+
+    execution_id = body.get("execution_id")
+    if not execution_id:
+        return
+    started = time.perf_counter()
+    try:
+        response = await client.get(f"{args.prefix}/api/execution/{execution_id}", params={"wait": args.wait})
+        response.raise_for_status()
+    except httpx.HTTPError as e:
+        stats["errors"].append(f"/api/execution: {type(e).__name__}: {e}")
+        return
+    stats["execution"].append(time.perf_counter() - started)
+
+
+async def run_level(concurrency: int, args, questions):
+    """동시성 한 단계 실행 (워커 concurrency개가 질문 args.requests개를 나눠 처리)"""
+    stats = {"api": [], "execution": [], "errors": [], "cached": 0}
+    queue = asyncio.Queue()
+    for i in range(args.requests):
+        queue.put_nowait(questions[i % len(questions)])
+
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    async with httpx.AsyncClient(base_url=args.base_url, timeout=args.timeout, limits=limits) as client:
+        async def worker():
+            while not queue.empty():
+                question = queue.get_nowait()
+                await run_one(client, question, args, stats)
+
+        started = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+        elapsed = time.perf_counter() - started
+
+    return {
+        "concurrency": concurrency,
+        "requests": args.requests,
+        "elapsed_seconds": round(elapsed, 3),
+        "throughput_rps": round(len(stats["api"]) / elapsed, 2) if elapsed else 0.0,
+        "api": summarize(stats["api"]),
+        "execution": summarize(stats["execution"]),
+        "cached": stats["cached"],
+        "errors": len(stats["errors"]),
+        "error_samples": stats["errors"][:5],
+    }
+
+
+def print_level(result):
+    print(f"\n동시성 {result['concurrency']:>3}: {result['requests']}건, {result['elapsed_seconds']:.2f}초, "
+          f"{result['throughput_rps']:.2f} req/s (질문 캐시 {result['cached']}, 오류 {result['errors']})")
+    for name in ("api", "execution"):
+        summary = result[name]
+        print(f"  {name:<10} n={summary['count']:<5} p50={summary['p50'] * 1000:8.1f}ms "
+              f"p95={summary['p95'] * 1000:8.1f}ms p99={summary['p99'] * 1000:8.1f}ms")
+    for sample in result["error_samples"]:
+        print(f"  ❌ {sample}")
+
+
+async def main_async(args):
+    questions = DEFAULT_QUESTIONS
+    if args.questions:
+        with open(args.questions, encoding="utf-8") as f:
+            questions = [line.strip() for line in f if line.strip()]
+
+    async with httpx.AsyncClient(base_url=args.base_url, timeout=10) as client:
+        health = (await client.get(f"{args.prefix}/health")).json()
+    print(f"대상: {args.base_url}{args.prefix} (worker_pid {health.get('worker_pid')}, llm {health.get('llm')})")
+
+    results = []
+    for concurrency in args.concurrency:
+        result = await run_level(concurrency, args, questions)
+        print_level(result)
+        results.append(result)
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(results, f, ensure_ascii=False, indent=2)
+        print(f"\n결과 저장: {args.output}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--base-url", default="http://localhost:8000")
+    parser.add_argument("--prefix", default="", help="nginx 뒤에서 실행할 때의 경로 접두사 (예: /projects/data-chatbot)")
+    parser.add_argument("--concurrency", type=lambda s: [int(x) for x in s.split(",")], default=[1, 4, 16])
+    parser.add_argument("--requests", type=int, default=50, help="동시성 단계별 질문 수")
+    parser.add_argument("--questions", help="질문 파일 (한 줄에 하나)")
+    parser.add_argument("--wait", type=float, default=15, help="/api/execution의 시각화 추천 대기 시간")
+    parser.add_argument("--timeout", type=float, default=240)
+    parser.add_argument("--output", help="결과 JSON 저장 경로")
+    asyncio.run(main_async(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
@@ -1,22 +1,43 @@
 """
 에이전트 모듈
 """
+import asyncio
+import inspect
 from functools import wraps
 import time
 from langchain.agents import create_tool_calling_agent
 from langchain.agents import AgentExecutor
 from langchain_core.prompts import ChatPromptTemplate
-from langchain_core.runnables import RunnableConfig
+from langchain_core.runnables import RunnableConfig, RunnableLambda
 from langchain_core.runnables.history import RunnableWithMessageHistory
 from langchain_openai import ChatOpenAI
 from core.models import GraphState
-from core.state import get_session_history
+from core.history_window import windowed_session_history
+from core.state import current_session_id
 from core.execution_store import ExecutionResultStore
+from core.streaming import emit_event, stream_callbacks
 
 
 def retry_on_failure(max_retries=3, delay=1):
-    """재시도 데코레이터"""
+    """재시도 데코레이터 (코루틴 함수는 asyncio.sleep으로 대기)"""
     def decorator(func):
+        if inspect.iscoroutinefunction(func):
+            @wraps(func)
+            async def async_wrapper(*args, **kwargs):
+                last_exception = None
+                for attempt in range(max_retries):
+                    try:
+                        return await func(*args, **kwargs)
+                    except Exception as e:
+                        last_exception = e
+                        if attempt < max_retries - 1:
+                            print(f"⚠️ 시도 {attempt + 1} 실패, {delay}초 후 재시도: {str(e)[:100]}")
+                            await asyncio.sleep(delay * (attempt + 1))  # 지수 백오프
+                        else:
+                            print(f"❌ 모든 재시도 실패: {str(e)}")
+                raise last_exception
+            return async_wrapper
+
         @wraps(func)
         def wrapper(*args, **kwargs):
             last_exception = None
@@ -94,36 +115,59 @@ def create_agent(model: ChatOpenAI, tools, execution_store: ExecutionResultStore
     """에이전트 생성 함수"""
     agent_prompt = create_agent_prompt()
 
+    # Agent는 한 번만 구성하고, 세션은 호출마다 config로 바인딩
+    agent_obj = create_tool_calling_agent(model, tools, agent_prompt)
+
+    agent_executor = AgentExecutor(
+        agent=agent_obj,
+        tools=tools,
+        verbose=False,
+        max_iterations=10,
+        max_execution_time=120,
+        handle_parsing_errors=True,
+        return_intermediate_steps=True
+    )
+
+    agent_with_history = RunnableWithMessageHistory(
+        agent_executor,
+        windowed_session_history("agent"),  # 토큰 예산 안의 최근 턴 + 요약만 프롬프트에 포함
+        history_messages_key="chat_history",
+    )
+
+    def agent_config(session_id: str) -> RunnableConfig:
+        # 콜백 비활성화하여 RootListenersTracer 에러 방지 (스트리밍 요청은 답변 토큰 콜백만 사용)
+        return RunnableConfig(
+            configurable={'session_id': session_id},
+            callbacks=stream_callbacks()
+        )
+
+    def apply_result(state: GraphState, result, execution_id: Optional[str]) -> GraphState:
+        # 결과에서 코드 실행이 필요하면 tools 내부에서 자동 호출됨
+        state['answer'] = result['output']
+        state['execution_id'] = execution_id
+        if execution_id:
+            emit_event("result_ready", execution_id=execution_id)
+        return state
+
+    def apply_failure(state: GraphState, error: Exception) -> GraphState:
+        print(f"❌ 에이전트 실행 최종 실패: {error}")
+        state['answer'] = f"죄송합니다. 질문 처리 중 오류가 발생했습니다. 새로운 창에서 질문해주세요."
+        return state
+
+    max_attempts = 5
+
     def agent(state: GraphState) -> GraphState:
         """
-        Agent 실행 함수
+        Agent 실행 함수 (동기)
         - domain_specific 질문은 tools(code_generator + safe_code_executor) 사용
         - code 실행 실패 시 재시도 구조 적용
         """
         session_id = state["session_id"]
         question = state["question"]
+        # 도구(code_generator)가 같은 세션 히스토리를 쓰도록 현재 세션 설정
+        session_token = current_session_id.set(session_id)
         
         try:
-            # Agent 생성
-            agent_obj = create_tool_calling_agent(model, tools, agent_prompt)
-
-            agent_executor = AgentExecutor(
-                agent=agent_obj,
-                tools=tools,
-                verbose=False,
-                max_iterations=10,
-                max_execution_time=120,
-                handle_parsing_errors=True,
-                return_intermediate_steps=True
-            )
-
-            agent_with_history = RunnableWithMessageHistory(
-                agent_executor,
-                get_session_history,
-                history_messages_key="chat_history",
-            )
-
-            max_attempts = 5
             for attempt in range(max_attempts):
                 try:
                     # Agent 실행 - 원본 질문 그대로 전달
@@ -131,31 +175,63 @@ def create_agent(model: ChatOpenAI, tools, execution_store: ExecutionResultStore
                         "input": question,  # state["question"] 대신 변수 사용
                         "session_id": session_id  
                     }
-
-                    # 콜백 비활성화하여 RootListenersTracer 에러 방지
-                    config = RunnableConfig(
-                        configurable={'session_id': session_id},
-                        callbacks=[]  # 콜백 비활성화
-                    )
                     result = agent_with_history.invoke(
                         input_data,
-                        config
+                        agent_config(session_id)
                     )
+                    execution_id = capture_execution_snapshot(session_id, result.get('intermediate_steps'), question, execution_store)
+                    return apply_result(state, result, execution_id)
+
+                except Exception as e_inner:
+                    print(f"⚠️ 에이전트 시도 {attempt+1}/{max_attempts} 실패: {e_inner}")
+                    # 실패한 시도에서 이미 보낸 답변 토큰은 버리라고 알림 (스트리밍 요청만, 다음 시도의 토큰이 새로 이어짐)
+                    emit_event("answer_reset", attempt=attempt + 1, retrying=attempt < max_attempts - 1)
+                    if attempt == max_attempts - 1:
+                        raise
 
-                    # 결과에서 코드 실행이 필요하면 tools 내부에서 자동 호출됨
-                    state['answer'] = result['output']
-                    state['execution_id'] = capture_execution_snapshot(session_id, result.get('intermediate_steps'), state['question'], execution_store)
-                    return state
+        except Exception as e:
+            return apply_failure(state, e)
+        finally:
+            current_session_id.reset(session_token)
+
+    async def aagent(state: GraphState) -> GraphState:
+        """
+        Agent 실행 함수 (비동기)
+        - LLM 호출은 ainvoke로 이벤트 루프에서 대기, 코드 실행만 스레드에서 수행
+        """
+        session_id = state["session_id"]
+        question = state["question"]
+        session_token = current_session_id.set(session_id)
+
+        try:
+            for attempt in range(max_attempts):
+                try:
+                    input_data = {
+                        "input": question,
+                        "session_id": session_id
+                    }
+                    result = await agent_with_history.ainvoke(
+                        input_data,
+                        agent_config(session_id)
+                    )
+                    # 결과 직렬화/프레임 인코딩/공유 저장소 기록은 워커 스레드에서 (시각화 추천은 저장소가 백그라운드로 계산)
+                    execution_id = await asyncio.to_thread(
+                        capture_execution_snapshot, session_id, result.get('intermediate_steps'), question, execution_store
+                    )
+                    return apply_result(state, result, execution_id)
 
                 except Exception as e_inner:
                     print(f"⚠️ 에이전트 시도 {attempt+1}/{max_attempts} 실패: {e_inner}")
+                    # 실패한 시도에서 이미 보낸 답변 토큰은 버리라고 알림 (스트리밍 요청만, 다음 시도의 토큰이 새로 이어짐)
+                    emit_event("answer_reset", attempt=attempt + 1, retrying=attempt < max_attempts - 1)
                     if attempt == max_attempts - 1:
                         raise
 
         except Exception as e:
-            print(f"❌ 에이전트 실행 최종 실패: {e}")
-            state['answer'] = f"죄송합니다. 질문 처리 중 오류가 발생했습니다. 새로운 창에서 질문해주세요."
-            return state
+            return apply_failure(state, e)
+        finally:
+            current_session_id.reset(session_token)
 
-    return agent
+    # graph.invoke와 graph.ainvoke 모두 지원
+    return RunnableLambda(agent, afunc=aagent)
 
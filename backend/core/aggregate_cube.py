@@ -0,0 +1,117 @@
+"""
+공장 수 집계 큐브 모듈
+- 데이터셋 로드 시 자주 쓰는 차원(구, 업종, 규모, 등록연도)의 모든 조합에 대해
+  고유 공장 수와 종업원 합계를 미리 계산
+- code_executor 실행 환경에 factory_counts() 헬퍼로 노출
+- 큐브에 없는 차원이 들어오면 None을 반환하여 생성 코드가 pandas로 직접 집계하도록 함
+"""
+import time
+from itertools import combinations
+from typing import Optional, Union
+import pandas as pd
+
+
+FACTORY_ID_COLUMN = "공장관리번호"
+EMPLOYEE_COLUMN = "종업원합계"
+CUBE_DIMENSIONS = ["정제_시군구명", "정제_업종명", "공장규모", "정제_최초등록연도"]
+
+COUNT_COLUMN = "공장수"
+EMPLOYEE_SUM_COLUMN = "종업원합계"
+
+
+class FactoryCube:
+    """
+    차원 조합별 집계 결과(cuboid) 저장소
+    - 공장관리번호가 여러 행에 나타나므로 (공장관리번호, 차원) 기준으로 중복 제거 후 집계
+    """
+
+    def __init__(self, df: pd.DataFrame):
+        self.dimensions = [dim for dim in CUBE_DIMENSIONS if dim in df.columns]
+        self._base = df[self.dimensions + [FACTORY_ID_COLUMN, EMPLOYEE_COLUMN]]
+
+        # 공장마다 값이 하나뿐인 차원은 여러 값으로 필터링해도 cuboid 합계가 정확함
+        per_factory = self._base.groupby(FACTORY_ID_COLUMN, observed=True)[self.dimensions].nunique(dropna=False)
+        self._additive = {dim for dim in self.dimensions if per_factory.empty or per_factory[dim].max() <= 1}
+
+        self._cuboids = {}
+        for size in range(len(self.dimensions) + 1):
+            for dims in combinations(self.dimensions, size):
+                self._cuboids[dims] = self._aggregate(self._base, list(dims))
+
+    @staticmethod
+    def _aggregate(base: pd.DataFrame, by: list) -> pd.DataFrame:
+        deduped = base.drop_duplicates([FACTORY_ID_COLUMN, *by])
+        if not by:
+            return pd.DataFrame({
+                COUNT_COLUMN: [deduped[FACTORY_ID_COLUMN].nunique()],
+                EMPLOYEE_SUM_COLUMN: [deduped[EMPLOYEE_COLUMN].sum()],
+            })
+        return (
+            deduped.groupby(by, observed=True)
+            .agg(**{
+                COUNT_COLUMN: (FACTORY_ID_COLUMN, "nunique"),
+                EMPLOYEE_SUM_COLUMN: (EMPLOYEE_COLUMN, "sum"),
+            })
+            .reset_index()
+        )
+
+    def _canonical(self, dims) -> tuple:
+        return tuple(dim for dim in self.dimensions if dim in dims)
+
+    def query(self, by: Union[str, list, None] = None, sort_by: Optional[str] = COUNT_COLUMN, **filters) -> Optional[pd.DataFrame]:
+        """
+        차원별 고유 공장 수와 종업원 합계 조회
+        - by: 그룹 기준 차원 (문자열 또는 리스트)
+        - sort_by: 내림차순 정렬 기준 ('공장수' 또는 '종업원합계', None이면 정렬하지 않음)
+        - filters: 차원=값 또는 차원=[값, ...]
+        - 큐브에 없는 차원이나 지원하지 않는 정렬 기준이면 None (원본 df로 직접 집계해야 함)
+        """
+        by = [by] if isinstance(by, str) else list(by or [])
+        if any(dim not in self.dimensions for dim in [*by, *filters]):
+            return None
+        if sort_by is not None and sort_by not in (COUNT_COLUMN, EMPLOYEE_SUM_COLUMN):
+            return None
+        filters = {dim: value if isinstance(value, (list, tuple, set, range)) else [value] for dim, value in filters.items()}
+        by_dims = self._canonical(by)
+
+        # 그룹 기준이 아닌 차원을 여러 값으로 필터링하면 공장이 중복 집계될 수 있어 원본에서 다시 집계
+        collapsed = [dim for dim, values in filters.items() if dim not in by_dims and len(values) > 1]
+        if any(dim not in self._additive for dim in collapsed):
+            mask = pd.Series(True, index=self._base.index)
+            for dim, values in filters.items():
+                mask &= self._base[dim].isin(list(values))
+            result = self._aggregate(self._base[mask], list(by_dims))
+        else:
+            cuboid = self._cuboids[self._canonical(set(by_dims) | set(filters))]
+            mask = pd.Series(True, index=cuboid.index)
+            for dim, values in filters.items():
+                mask &= cuboid[dim].isin(list(values))
+            result = cuboid[mask]
+            if by_dims:
+                if collapsed:
+                    result = result.groupby(list(by_dims), observed=True)[[COUNT_COLUMN, EMPLOYEE_SUM_COLUMN]].sum().reset_index()
+                result = result[[*by_dims, COUNT_COLUMN, EMPLOYEE_SUM_COLUMN]]
+            else:
+                result = pd.DataFrame({
+                    COUNT_COLUMN: [result[COUNT_COLUMN].sum()],
+                    EMPLOYEE_SUM_COLUMN: [result[EMPLOYEE_SUM_COLUMN].sum()],
+                })
+
+        if by_dims and sort_by is not None:
+            result = result.sort_values(sort_by, ascending=False, kind="stable")
+        return result.reset_index(drop=True)
+
+
+def create_aggregate_helpers(df: pd.DataFrame) -> dict:
+    """code_executor 실행 환경에 주입할 집계 함수 생성"""
+    started = time.perf_counter()
+    cube = FactoryCube(df)
+    print(f"🧊 공장 수 집계 큐브 생성 ({len(cube._cuboids)}개 조합, {(time.perf_counter() - started) * 1000:.0f}ms)")
+
+    def factory_counts(by: Optional[Union[str, list]] = None, sort_by: Optional[str] = COUNT_COLUMN, **filters) -> Optional[pd.DataFrame]:
+        """차원별 고유 공장 수('공장수')와 종업원 합계('종업원합계'), 큐브에 없는 차원이면 None"""
+        return cube.query(by, sort_by=sort_by, **filters)
+
+    return {
+        "factory_counts": factory_counts,
+    }
@@ -4,17 +4,27 @@ FastAPI 앱 및 엔드포인트 모듈
 import os
 import time
 import asyncio
-from typing import Optional
+from typing import List, Optional
 from contextlib import asynccontextmanager
 from functools import lru_cache
-from fastapi import FastAPI, Request, HTTPException
+from fastapi import FastAPI, Request, HTTPException, Query
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import PlainTextResponse, StreamingResponse
 from pydantic import BaseModel
 from pydantic_settings import BaseSettings
 from langgraph.errors import GraphRecursionError
 from core.models import GraphState
 from core.state import get_session_history, generate_session_id, thread_safe_store
 from core.execution_store import ExecutionResultStore
+from core.streaming import StreamEmitter, current_emitter, format_sse
+from core.tracing import RequestTrace, current_trace, render_metrics, span
+from core.result_rows import ROWS_DEFAULT_LIMIT, query_rows
+from core import visualization_rules, code_lint, code_repair, llm, tracing
+
+
+GRAPH_TIMEOUT_SECONDS = 180  # 3분 타임아웃
+VISUALIZATION_WAIT_SECONDS = float(os.getenv("VISUALIZATION_WAIT_SECONDS", "15"))  # 시각화 추천 대기 기본값
+VISUALIZATION_POLL_SECONDS = 0.25  # 다른 서버 워커가 계산 중인 시각화 추천 재조회 간격
 
 
 class MessageRequest(BaseModel):
@@ -48,17 +58,30 @@ def get_settings():
     return Settings()
 
 
-def create_app(graph, execution_store):
+def create_app(graph, execution_store, result_cache=None, question_cache=None, route_classifier=None, speculator=None, sandbox=None):
     """FastAPI 앱 생성"""
     settings = get_settings()
     current_user_id = None
+    checkpointer = getattr(graph, "checkpointer", None)
+
+    def graph_thread_id(session_id: str) -> str:
+        # 세션 ID 전체를 사용하여 세션 간 체크포인트 충돌 방지
+        return f"HIKE-FACTORY-CHATBOT-{session_id}"
 
     @asynccontextmanager
     async def lifespan(app: FastAPI):
         # 시작 시
         print("🚀 서버 시작")
+        thread_safe_store.start_sweeper()  # 유휴 세션은 백그라운드에서 정리
+        if hasattr(checkpointer, "start_sweeper"):
+            checkpointer.start_sweeper()  # 유휴 체크포인트 스레드 정리
         yield
         # 종료 시
+        thread_safe_store.stop_sweeper()
+        if hasattr(checkpointer, "stop_sweeper"):
+            checkpointer.stop_sweeper()
+        if sandbox is not None:
+            sandbox.close()
         print("🛑 서버 종료")
 
     app = FastAPI(
@@ -75,8 +98,152 @@ def create_app(graph, execution_store):
         allow_headers=["*"],
     )
 
+    def finish_trace(trace: RequestTrace) -> dict:
+        """응답에 붙일 timings(단계별 소요 시간)와 usage(요청/세션 LLM 호출 수, 토큰 사용량)"""
+        report = trace.finish()
+        report["usage"]["session"] = thread_safe_store.get_usage(trace.session_id)
+        return report
+
+    def build_success_response(final_state, message: str, client_session_id: str, use_question_cache: bool, trace: RequestTrace):
+        """그래프 최종 상태로 응답 생성"""
+        answer_text = final_state["answer"]
+
+        # 응답 검증
+        if not answer_text or not isinstance(answer_text, str):
+            answer_text = "죄송합니다. 응답을 생성할 수 없습니다."
+
+        # 데이터 조회 결과가 있는 답변만 질문 캐시에 저장
+        if use_question_cache and final_state.get("execution_id"):
+            question_cache.store(message, answer_text, final_state["execution_id"])
+
+        # 세션 통계
+        current_history = get_session_history(client_session_id)
+        message_count = len(current_history.messages)
+
+        print(f"✅ 세션 {client_session_id[:8]}... 응답 완료 (총 {message_count}개 메시지)")
+
+        return {
+            "answer": answer_text,
+            "session_id": client_session_id,
+            "message_count": message_count,
+            "status": "success",
+            "execution_id": final_state.get("execution_id"),
+            **finish_trace(trace)
+        }
+
+    def answer_from_question_cache(message: str, client_session_id: str, trace: RequestTrace):
+        """
+        질문 캐시 조회, (질문 캐시 사용 여부, 캐시된 응답 또는 None) 반환
+        - 이전 대화가 없는 질문만 대상 (후속 질문은 맥락에 따라 답이 달라짐)
+        - 세션 기록/실행 결과가 공유 SQLite에 있을 수 있으므로 워커 스레드에서 호출
+        """
+        if question_cache is None or get_session_history(client_session_id).messages:
+            return False, None
+        cached = question_cache.lookup(message)
+        if cached and cached["execution_id"] and not execution_store.get(cached["execution_id"]):
+            # 실행 결과가 이미 삭제된 항목은 버림
+            question_cache.invalidate_execution(cached["execution_id"])
+            cached = None
+        if not cached:
+            return True, None
+        current_history = get_session_history(client_session_id)
+        current_history.add_user_message(message)
+        current_history.add_ai_message(cached["answer"])
+        print(f"⚡ 질문 캐시 사용 (유사도 {cached['similarity']}): {client_session_id[:8]}...")
+        return True, {
+            "answer": cached["answer"],
+            "session_id": client_session_id,
+            "message_count": len(current_history.messages),
+            "status": "success",
+            "execution_id": cached["execution_id"],
+            "cached": True,
+            **finish_trace(trace)
+        }
+
+    def build_error_response(error: Exception, client_session_id: str):
+        """그래프 실행 오류 응답 생성"""
+        if isinstance(error, asyncio.TimeoutError):
+            print(f"⏰ 타임아웃: {client_session_id[:8]}...")
+            return {
+                "answer": "죄송합니다. 응답 시간이 초과되었습니다. 다시 시도해 주세요.",
+                "session_id": client_session_id,
+                "status": "timeout"
+            }
+        if isinstance(error, GraphRecursionError):
+            print(f"🔄 재귀 제한 초과: {error}")
+            return {
+                "answer": "죄송합니다. 질문이 너무 복잡합니다. 더 간단한 질문으로 다시 시도해 주세요.",
+                "session_id": client_session_id,
+                "status": "recursion_error"
+            }
+        print(f"❌ 그래프 실행 오류: {type(error).__name__}: {str(error)[:200]}")
+        return {
+            "answer": "죄송합니다. 처리 중 오류가 발생했습니다. 잠시 후 다시 시도해 주세요.",
+            "session_id": client_session_id,
+            "status": "error",
+            "error_type": type(error).__name__
+        }
+
+    def sse_response(events):
+        return StreamingResponse(
+            events,
+            media_type="text/event-stream",
+            headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}  # nginx 버퍼링 비활성화
+        )
+
+    async def stream_graph_events(inputs, config, message: str, client_session_id: str, use_question_cache: bool, trace: RequestTrace):
+        """
+        그래프 실행을 SSE 이벤트로 스트리밍
+        - session -> routed -> code_generated -> executing -> result_ready -> token... -> done
+        - answer_reset {attempt, retrying}: 에이전트 시도가 실패해 다시 실행됨, 그때까지 받은 token 텍스트는 버려야 함
+          (다시 실행하면 code_generated부터 다시 옴, 마지막 시도까지 실패하면 retrying=false 후 done에 오류 안내 답변)
+        - done 이벤트에는 JSON 모드와 같은 응답 본문이 담김
+        """
+        loop = asyncio.get_running_loop()
+        emitter = StreamEmitter(loop)
+
+        async def run_graph():
+            final_state = None
+            try:
+                async for mode, chunk in graph.astream(inputs, config, stream_mode=["updates", "values"]):
+                    if mode == "updates" and "Router" in chunk:
+                        emitter.emit("routed", {"q_type": chunk["Router"]["q_type"]})
+                    elif mode == "values":
+                        final_state = chunk
+                return final_state
+            finally:
+                emitter.close()
+
+        # 태스크 생성 시점의 컨텍스트가 복사되므로 노드/도구에서 emitter를 볼 수 있음
+        token = current_emitter.set(emitter)
+        trace_token = current_trace.set(trace)
+        try:
+            graph_task = asyncio.ensure_future(run_graph())
+        finally:
+            current_trace.reset(trace_token)
+            current_emitter.reset(token)
+
+        yield format_sse("session", {"session_id": client_session_id})
+        deadline = loop.time() + GRAPH_TIMEOUT_SECONDS
+        try:
+            while True:
+                event = await asyncio.wait_for(emitter.next_event(), timeout=max(deadline - loop.time(), 0))
+                if event is None:
+                    break
+                yield format_sse(*event)
+            final_state = await graph_task
+            response = await asyncio.to_thread(build_success_response, final_state, message, client_session_id, use_question_cache, trace)
+            yield format_sse("done", response)
+        except Exception as e:
+            yield format_sse("done", build_error_response(e, client_session_id))
+        finally:
+            # 클라이언트 연결이 끊기거나 타임아웃이면 진행 중인 LLM 호출까지 취소
+            if not graph_task.done():
+                graph_task.cancel()
+
     @app.post("/api/")
     async def stream_responses(request: Request):
+        trace = RequestTrace(usage_sink=thread_safe_store.add_usage)
         try:
             data = await request.json()
             message = data.get('message')
@@ -102,13 +269,24 @@ def create_app(graph, execution_store):
             # 세션 ID 처리
             if not client_session_id:
                 client_session_id = generate_session_id()
+            trace.session_id = client_session_id
+
+            # Server-Sent Events 모드 (단계 이벤트와 답변 토큰을 순서대로 전송)
+            wants_stream = bool(data.get('stream')) or 'text/event-stream' in request.headers.get('accept', '')
+
+            # 질문 캐시 (세션 기록/실행 결과 조회는 SQLite일 수 있어 이벤트 루프 밖에서)
+            use_question_cache, response = await asyncio.to_thread(answer_from_question_cache, message, client_session_id, trace)
+            if response is not None:
+                if wants_stream:
+                    return sse_response(iter([format_sse("done", response)]))
+                return response
 
             # 설정 최적화
             from langchain_core.runnables import RunnableConfig
             config = RunnableConfig(
                 recursion_limit=10,  # 재귀 제한 줄임
                 configurable={
-                    "thread_id": f"HIKE-FACTORY-CHATBOT-{client_session_id[:8]}", 
+                    "thread_id": graph_thread_id(client_session_id),
                     "user_id": current_user_id, 
                     "session_id": client_session_id
                 }
@@ -125,55 +303,22 @@ def create_app(graph, execution_store):
                 execution_id=None,
             )
 
+            if wants_stream:
+                return sse_response(stream_graph_events(inputs, config, message, client_session_id, use_question_cache, trace))
+
+            # 그래프 태스크 생성 시점의 컨텍스트가 복사되므로 노드/도구/LLM 호출 시간과 사용량이 이 요청의 trace에 모임
+            trace_token = current_trace.set(trace)
             try:
-                # 타임아웃 설정으로 무한 대기 방지
+                # 타임아웃 설정으로 무한 대기 방지 (타임아웃 시 그래프 실행도 취소됨)
                 final_state = await asyncio.wait_for(
-                    asyncio.to_thread(graph.invoke, inputs, config),
-                    timeout=180  # 3분 타임아웃
+                    graph.ainvoke(inputs, config),
+                    timeout=GRAPH_TIMEOUT_SECONDS
                 )
-                
-                answer_text = final_state["answer"]
-                
-                # 응답 검증
-                if not answer_text or not isinstance(answer_text, str):
-                    answer_text = "죄송합니다. 응답을 생성할 수 없습니다."
-                
-                # 세션 통계
-                current_history = get_session_history(client_session_id)
-                message_count = len(current_history.messages)
-                
-                print(f"✅ 세션 {client_session_id[:8]}... 응답 완료 (총 {message_count}개 메시지)")
-                
-                return {
-                    "answer": answer_text,
-                    "session_id": client_session_id,
-                    "message_count": message_count,
-                    "status": "success",
-                    "execution_id": final_state.get("execution_id")
-                }
-                
-            except asyncio.TimeoutError:
-                print(f"⏰ 타임아웃: {client_session_id[:8]}...")
-                return {
-                    "answer": "죄송합니다. 응답 시간이 초과되었습니다. 다시 시도해 주세요.",
-                    "session_id": client_session_id,
-                    "status": "timeout"
-                }
-            except GraphRecursionError as e:
-                print(f"🔄 재귀 제한 초과: {e}")
-                return {
-                    "answer": "죄송합니다. 질문이 너무 복잡합니다. 더 간단한 질문으로 다시 시도해 주세요.",
-                    "session_id": client_session_id,
-                    "status": "recursion_error"
-                }
+                return await asyncio.to_thread(build_success_response, final_state, message, client_session_id, use_question_cache, trace)
             except Exception as e:
-                print(f"❌ 그래프 실행 오류: {type(e).__name__}: {str(e)[:200]}")
-                return {
-                    "answer": "죄송합니다. 처리 중 오류가 발생했습니다. 잠시 후 다시 시도해 주세요.",
-                    "session_id": client_session_id,
-                    "status": "error",
-                    "error_type": type(e).__name__
-                }
+                return build_error_response(e, client_session_id)
+            finally:
+                current_trace.reset(trace_token)
 
         except HTTPException:
             raise
@@ -182,48 +327,102 @@ def create_app(graph, execution_store):
             raise HTTPException(status_code=500, detail="Internal server error")
 
     @app.get("/api/execution/{execution_id}")
-    async def get_execution_result(execution_id: str):
-        record = execution_store.get(execution_id)
+    async def get_execution_result(execution_id: str, wait: float = VISUALIZATION_WAIT_SECONDS):
+        """
+        실행 결과 조회
+        - 시각화 추천이 아직 계산 중이면 최대 wait초 기다리고, 그래도 끝나지 않으면 visualization_status='pending'으로 반환
+        - wait=0이면 기다리지 않음
+        - 다른 서버 워커가 계산 중이면 공유 저장소를 주기적으로 다시 조회
+        - 저장소 조회는 공유 SQLite일 수 있으므로 워커 스레드에서 실행
+        """
+        pending = execution_store.get_pending_visualization(execution_id)
+        if pending is not None and wait > 0:
+            try:
+                # 타임아웃이 나도 백그라운드 추론은 계속되도록 shield
+                await asyncio.wait_for(asyncio.shield(asyncio.wrap_future(pending)), timeout=min(wait, GRAPH_TIMEOUT_SECONDS))
+            except asyncio.TimeoutError:
+                pass
+        record = await asyncio.to_thread(execution_store.get, execution_id)
+        if pending is None and wait > 0:
+            loop = asyncio.get_running_loop()
+            deadline = loop.time() + min(wait, GRAPH_TIMEOUT_SECONDS)
+            while record and record.get("visualization_status") == "pending" and loop.time() < deadline:
+                await asyncio.sleep(VISUALIZATION_POLL_SECONDS)
+                record = await asyncio.to_thread(execution_store.get, execution_id)
         if not record:
             raise HTTPException(status_code=404, detail="Execution result not found")
         return record
 
+    @app.get("/api/execution/{execution_id}/rows")
+    def get_execution_rows(
+        execution_id: str,
+        offset: int = 0,
+        limit: int = ROWS_DEFAULT_LIMIT,
+        sort: Optional[str] = None,
+        order: str = "asc",
+        filter: List[str] = Query(default=[]),
+    ):
+        """
+        전체 실행 결과 페이지 조회 (LLM 호출 없이 저장된 결과에서 필터 -> 정렬 -> offset/limit)
+        - filter: 'column:op:value' (op: eq, ne, gt, gte, lt, lte, contains), 여러 개면 AND
+        - order: asc 또는 desc
+        - 동기 함수라 스레드 풀에서 실행되어 큰 결과를 정렬해도 이벤트 루프를 막지 않음
+        """
+        if order not in ("asc", "desc"):
+            raise HTTPException(status_code=400, detail="order must be 'asc' or 'desc'")
+        with span("rows"):
+            frame = execution_store.get_frame(execution_id)
+            if frame is None:
+                if not execution_store.get(execution_id):
+                    raise HTTPException(status_code=404, detail="Execution result not found")
+                raise HTTPException(status_code=404, detail="Full rows are not available for this result")
+            try:
+                page = query_rows(frame, offset, limit, sort, order == "desc", filter)
+            except ValueError as e:
+                raise HTTPException(status_code=400, detail=str(e))
+        return {"execution_id": execution_id, "row_count": int(len(frame)), **page}
+
+    def reset_sessions(session_id_to_reset: Optional[str]) -> dict:
+        """세션 기록/실행 결과/체크포인트 삭제 (공유 SQLite일 수 있으므로 워커 스레드에서 호출)"""
+        if session_id_to_reset:
+            # 특정 세션만 초기화
+            message_count = thread_safe_store.clear_session(session_id_to_reset)
+            # 해당 세션의 실행 결과와 그래프 체크포인트도 함께 삭제
+            execution_store.clear_session(session_id_to_reset)
+            if hasattr(checkpointer, "delete_thread"):
+                checkpointer.delete_thread(graph_thread_id(session_id_to_reset))
+            new_session_id = generate_session_id()
+
+            print(f"🗑️ 세션 삭제: {session_id_to_reset[:8]}... ({message_count}개 메시지)")
+
+            return {
+                "status": "Session reset successfully",
+                "session_id": new_session_id,
+                "cleared_messages": message_count
+            }
+        else:
+            # 모든 세션 초기화
+            total_sessions, total_messages = thread_safe_store.clear_session()
+            # 모든 실행 결과와 그래프 체크포인트 초기화
+            execution_store.clear_session()
+            if hasattr(checkpointer, "clear"):
+                checkpointer.clear()
+            new_session_id = generate_session_id()
+
+            print(f"🧹 전체 초기화: {total_sessions}개 세션, {total_messages}개 메시지 삭제")
+
+            return {
+                "status": "All sessions reset successfully",
+                "session_id": new_session_id,
+                "cleared_sessions": total_sessions,
+                "cleared_messages": total_messages
+            }
+
     @app.post("/api/reset")
     async def reset_store(request: Request):
         try:
             data = await request.json()
-            session_id_to_reset = data.get('session_id')
-
-            if session_id_to_reset:
-                # 특정 세션만 초기화
-                message_count = thread_safe_store.clear_session(session_id_to_reset)
-                # 해당 세션의 실행 결과도 함께 삭제
-                execution_store.clear_session(session_id_to_reset)
-                new_session_id = generate_session_id()
-
-                print(f"🗑️ 세션 삭제: {session_id_to_reset[:8]}... ({message_count}개 메시지)")
-
-                return {
-                    "status": "Session reset successfully",
-                    "session_id": new_session_id,
-                    "cleared_messages": message_count
-                }
-            else:
-                # 모든 세션 초기화
-                total_sessions, total_messages = thread_safe_store.clear_session()
-                # 모든 실행 결과 초기화
-                execution_store.clear_session()
-                new_session_id = generate_session_id()
-
-                print(f"🧹 전체 초기화: {total_sessions}개 세션, {total_messages}개 메시지 삭제")
-
-                return {
-                    "status": "All sessions reset successfully",
-                    "session_id": new_session_id,
-                    "cleared_sessions": total_sessions,
-                    "cleared_messages": total_messages
-                }
-                
+            return await asyncio.to_thread(reset_sessions, data.get('session_id'))
         except Exception as e:
             print(f"❌ 리셋 오류: {e}")
             # 오류 발생시에도 새 세션 ID 반환
@@ -235,14 +434,36 @@ def create_app(graph, execution_store):
                 "error": str(e)
             }
 
+    @app.get("/metrics", response_class=PlainTextResponse)
+    async def metrics():
+        """단계별 지연 시간 히스토그램 (Prometheus 텍스트 형식, 프로세스별 집계)"""
+        return PlainTextResponse(render_metrics(), media_type="text/plain; version=0.0.4")
+
     @app.get("/health")
-    async def health_check():
+    def health_check():
+        """서버/저장소 상태 (공유 SQLite 통계를 조회하므로 동기 함수로 두어 스레드 풀에서 실행)"""
         stats = thread_safe_store.get_stats()
         return {
             "status": "healthy",
             "timestamp": time.time(),
+            "worker_pid": os.getpid(),
             "sessions": stats['total_sessions'],
-            "messages": stats['total_messages']
+            "messages": stats['total_messages'],
+            "session_evictions": stats['evictions'],
+            "trimmed_messages": stats['trimmed_messages'],
+            "execution_store": execution_store.get_stats(),
+            "checkpoints": checkpointer.get_stats() if hasattr(checkpointer, "get_stats") else None,
+            "result_cache": result_cache.get_stats() if result_cache else None,
+            "question_cache": question_cache.get_stats() if question_cache else None,
+            "router_paths": route_classifier.get_stats() if route_classifier else None,
+            "visualization_paths": visualization_rules.get_stats(),
+            "code_lint": code_lint.get_stats(),
+            "code_repair": code_repair.get_stats(),
+            "llm": llm.get_stats(),
+            "stages": tracing.get_stats(),
+            "llm_usage": tracing.get_usage_stats(),
+            "speculative_codegen": speculator.get_stats() if speculator else None,
+            "sandbox": sandbox.get_stats() if sandbox else None
         }
 
     return app
@@ -0,0 +1,280 @@
+"""
+LangGraph 체크포인터 모듈
+- 스레드(세션)마다 최근 N개 체크포인트만 유지
+- 일정 시간 사용되지 않은 스레드는 백그라운드에서 삭제
+- 메모리(기본) 또는 로컬 SQLite 파일에 저장
+"""
+import os
+import time
+import asyncio
+import sqlite3
+import threading
+from collections import OrderedDict
+from functools import partial
+from typing import Any, AsyncIterator, Dict, List, Optional, Sequence, Tuple
+from langchain_core.runnables import RunnableConfig
+from langgraph.checkpoint.base import BaseCheckpointSaver, Checkpoint, CheckpointMetadata, CheckpointTuple
+from langgraph.checkpoint.memory import MemorySaver
+from langgraph.checkpoint.sqlite import SqliteSaver
+from core.shared_state import connect_sqlite
+
+
+CHECKPOINT_BACKEND = os.getenv("CHECKPOINT_BACKEND", "memory")  # memory | sqlite
+CHECKPOINT_SQLITE_PATH = os.getenv("CHECKPOINT_SQLITE_PATH", os.path.join("data", ".cache", "checkpoints.sqlite"))
+CHECKPOINT_MAX_PER_THREAD = int(os.getenv("CHECKPOINT_MAX_PER_THREAD", "5"))
+CHECKPOINT_IDLE_TTL_SECONDS = float(os.getenv("CHECKPOINT_IDLE_TTL_SECONDS", str(2 * 60 * 60)))
+CHECKPOINT_SWEEP_INTERVAL_SECONDS = float(os.getenv("CHECKPOINT_SWEEP_INTERVAL_SECONDS", "60"))
+
+
+class _IdleThreadSweeper:
+    """유휴 스레드 정리 데몬 스레드 (prune_idle을 주기적으로 호출)"""
+
+    def start_sweeper(self, interval_seconds: float = CHECKPOINT_SWEEP_INTERVAL_SECONDS):
+        sweeper = getattr(self, "_sweeper", None)
+        if sweeper is not None and sweeper.is_alive():
+            return
+        self._sweeper_stop = threading.Event()
+
+        def run():
+            while not self._sweeper_stop.wait(interval_seconds):
+                try:
+                    removed = self.prune_idle()
+                    if removed:
+                        print(f"🧹 유휴 체크포인트 스레드 {removed}개 정리")
+                except Exception as e:
+                    print(f"⚠️ 체크포인트 정리 실패: {e}")
+
+        self._sweeper = threading.Thread(target=run, name="checkpoint-sweeper", daemon=True)
+        self._sweeper.start()
+
+    def stop_sweeper(self):
+        sweeper = getattr(self, "_sweeper", None)
+        if sweeper is not None:
+            self._sweeper_stop.set()
+            sweeper.join(timeout=5)
+            self._sweeper = None
+
+
+class BoundedMemorySaver(MemorySaver, _IdleThreadSweeper):
+    """
+    스레드별 최근 max_checkpoints개만 메모리에 유지하는 MemorySaver
+    - _last_used는 마지막 사용 순서(OrderedDict)로 유지하여 유휴 스레드를 앞에서부터 제거
+    """
+
+    def __init__(self, max_checkpoints: int = CHECKPOINT_MAX_PER_THREAD, idle_ttl_seconds: float = CHECKPOINT_IDLE_TTL_SECONDS, **kwargs):
+        super().__init__(**kwargs)
+        self.max_checkpoints = max_checkpoints
+        self.idle_ttl_seconds = idle_ttl_seconds
+        self._last_used = OrderedDict()  # thread_id -> 마지막 사용 시각
+        self._lock = threading.RLock()
+        self.pruned = {"checkpoints": 0, "idle_threads": 0}
+
+    def _touch(self, thread_id: str):
+        self._last_used[thread_id] = time.time()
+        self._last_used.move_to_end(thread_id)
+
+    def get_tuple(self, config: RunnableConfig) -> Optional[CheckpointTuple]:
+        thread_id = config["configurable"]["thread_id"]
+        with self._lock:
+            # defaultdict에 빈 스레드가 생기지 않도록 없는 스레드는 바로 None
+            if thread_id not in self.storage:
+                return None
+            self._touch(thread_id)
+            return super().get_tuple(config)
+
+    def list(self, config: Optional[RunnableConfig], **kwargs):
+        with self._lock:
+            if config and config["configurable"]["thread_id"] not in self.storage:
+                return iter(())
+            return iter(list(super().list(config, **kwargs)))
+
+    def put(self, config: RunnableConfig, checkpoint: Checkpoint, metadata: CheckpointMetadata) -> RunnableConfig:
+        thread_id = config["configurable"]["thread_id"]
+        with self._lock:
+            saved = super().put(config, checkpoint, metadata)
+            self._touch(thread_id)
+            checkpoints = self.storage[thread_id]
+            # dict는 삽입 순서 = 체크포인트 생성 순서
+            while len(checkpoints) > self.max_checkpoints:
+                oldest = next(iter(checkpoints))
+                del checkpoints[oldest]
+                self.writes.pop((thread_id, oldest), None)
+                self.pruned["checkpoints"] += 1
+            return saved
+
+    def put_writes(self, config: RunnableConfig, writes: List[Tuple[str, Any]], task_id: str):
+        with self._lock:
+            return super().put_writes(config, writes, task_id)
+
+    def delete_thread(self, thread_id: str):
+        with self._lock:
+            for ts in self.storage.pop(thread_id, {}):
+                self.writes.pop((thread_id, ts), None)
+            self._last_used.pop(thread_id, None)
+
+    def clear(self):
+        with self._lock:
+            self.storage.clear()
+            self.writes.clear()
+            self._last_used.clear()
+
+    def prune_idle(self, now: Optional[float] = None) -> int:
+        now = time.time() if now is None else now
+        removed = 0
+        with self._lock:
+            while self._last_used:
+                thread_id, last_used = next(iter(self._last_used.items()))
+                if now - last_used < self.idle_ttl_seconds:
+                    break
+                self.delete_thread(thread_id)
+                removed += 1
+            self.pruned["idle_threads"] += removed
+        return removed
+
+    def get_stats(self):
+        with self._lock:
+            return {
+                "backend": "memory",
+                "threads": len(self.storage),
+                "checkpoints": sum(len(checkpoints) for checkpoints in self.storage.values()),
+                "max_per_thread": self.max_checkpoints,
+                "idle_ttl_seconds": self.idle_ttl_seconds,
+                "pruned": dict(self.pruned),
+            }
+
+
+class BoundedSqliteSaver(SqliteSaver, _IdleThreadSweeper):
+    """
+    로컬 SQLite 파일에 저장하고 스레드별 최근 max_checkpoints개만 유지하는 체크포인터
+    - thread_activity 테이블로 스레드별 마지막 사용 시각 관리
+    - 비동기 메서드는 동기 메서드를 실행기에서 호출
+    - from_path로 만들면 프로세스마다 연결을 새로 열어 멀티 워커(preload 후 fork)에서도 파일 하나를 공유
+    """
+
+    _path: Optional[str] = None
+
+    def __init__(self, conn: sqlite3.Connection, max_checkpoints: int = CHECKPOINT_MAX_PER_THREAD, idle_ttl_seconds: float = CHECKPOINT_IDLE_TTL_SECONDS, **kwargs):
+        super().__init__(conn, **kwargs)
+        self.max_checkpoints = max_checkpoints
+        self.idle_ttl_seconds = idle_ttl_seconds
+        self.pruned = {"checkpoints": 0, "idle_threads": 0}
+
+    @property
+    def conn(self) -> sqlite3.Connection:
+        if self._path and self._conn_pid != os.getpid():
+            self._conn = connect_sqlite(self._path)
+            self._conn_pid = os.getpid()
+        return self._conn
+
+    @conn.setter
+    def conn(self, conn: sqlite3.Connection):
+        self._conn = conn
+        self._conn_pid = os.getpid()
+
+    @classmethod
+    def from_path(cls, path: str, **kwargs) -> "BoundedSqliteSaver":
+        saver = cls(connect_sqlite(path), **kwargs)
+        saver._path = path
+        return saver
+
+    def setup(self) -> None:
+        if self.is_setup:
+            return
+        super().setup()
+        self.conn.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS thread_activity (
+                thread_id TEXT PRIMARY KEY,
+                last_used REAL NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS thread_activity_last_used ON thread_activity (last_used);
+            """
+        )
+
+    def put(self, config: RunnableConfig, checkpoint: Checkpoint, metadata: CheckpointMetadata) -> RunnableConfig:
+        saved = super().put(config, checkpoint, metadata)
+        thread_id = str(config["configurable"]["thread_id"])
+        with self.lock, self.cursor() as cur:
+            cur.execute(
+                "INSERT OR REPLACE INTO thread_activity (thread_id, last_used) VALUES (?, ?)",
+                (thread_id, time.time()),
+            )
+            cur.execute(
+                """
+                DELETE FROM checkpoints WHERE thread_id = ? AND thread_ts NOT IN (
+                    SELECT thread_ts FROM checkpoints WHERE thread_id = ? ORDER BY thread_ts DESC LIMIT ?
+                )
+                """,
+                (thread_id, thread_id, self.max_checkpoints),
+            )
+            self.pruned["checkpoints"] += cur.rowcount
+            cur.execute(
+                "DELETE FROM writes WHERE thread_id = ? AND thread_ts NOT IN (SELECT thread_ts FROM checkpoints WHERE thread_id = ?)",
+                (thread_id, thread_id),
+            )
+        return saved
+
+    def delete_thread(self, thread_id: str):
+        with self.lock, self.cursor() as cur:
+            for table in ("checkpoints", "writes", "thread_activity"):
+                cur.execute(f"DELETE FROM {table} WHERE thread_id = ?", (str(thread_id),))
+
+    def clear(self):
+        with self.lock, self.cursor() as cur:
+            for table in ("checkpoints", "writes", "thread_activity"):
+                cur.execute(f"DELETE FROM {table}")
+
+    def prune_idle(self, now: Optional[float] = None) -> int:
+        cutoff = (time.time() if now is None else now) - self.idle_ttl_seconds
+        with self.lock, self.cursor() as cur:
+            cur.execute("SELECT thread_id FROM thread_activity WHERE last_used <= ?", (cutoff,))
+            thread_ids = [(row[0],) for row in cur.fetchall()]
+            for table in ("checkpoints", "writes", "thread_activity"):
+                cur.executemany(f"DELETE FROM {table} WHERE thread_id = ?", thread_ids)
+        self.pruned["idle_threads"] += len(thread_ids)
+        return len(thread_ids)
+
+    def get_stats(self):
+        with self.cursor(transaction=False) as cur:
+            cur.execute("SELECT COUNT(DISTINCT thread_id), COUNT(*) FROM checkpoints")
+            threads, checkpoints = cur.fetchone()
+        return {
+            "backend": "sqlite",
+            "threads": threads,
+            "checkpoints": checkpoints,
+            "max_per_thread": self.max_checkpoints,
+            "idle_ttl_seconds": self.idle_ttl_seconds,
+            "pruned": dict(self.pruned),
+        }
+
+    async def aget_tuple(self, config: RunnableConfig) -> Optional[CheckpointTuple]:
+        return await asyncio.get_running_loop().run_in_executor(None, self.get_tuple, config)
+
+    async def alist(
+        self,
+        config: Optional[RunnableConfig],
+        *,
+        filter: Optional[Dict[str, Any]] = None,
+        before: Optional[RunnableConfig] = None,
+        limit: Optional[int] = None,
+    ) -> AsyncIterator[CheckpointTuple]:
+        items = await asyncio.get_running_loop().run_in_executor(
+            None, lambda: list(self.list(config, filter=filter, before=before, limit=limit))
+        )
+        for item in items:
+            yield item
+
+    async def aput(self, config: RunnableConfig, checkpoint: Checkpoint, metadata: CheckpointMetadata) -> RunnableConfig:
+        return await asyncio.get_running_loop().run_in_executor(None, self.put, config, checkpoint, metadata)
+
+    async def aput_writes(self, config: RunnableConfig, writes: Sequence[Tuple[str, Any]], task_id: str):
+        return await asyncio.get_running_loop().run_in_executor(None, partial(self.put_writes, config, writes, task_id))
+
+
+def create_checkpointer(backend: str = CHECKPOINT_BACKEND) -> BaseCheckpointSaver:
+    """환경변수 설정에 따른 체크포인터 생성 (memory 또는 sqlite)"""
+    if backend == "sqlite":
+        return BoundedSqliteSaver.from_path(CHECKPOINT_SQLITE_PATH)
+    if backend != "memory":
+        raise ValueError(f"Unknown CHECKPOINT_BACKEND: {backend}")
+    return BoundedMemorySaver()
@@ -3,17 +3,26 @@
 """
 from typing import Optional
 from langchain.agents import tool
+from langchain_core.tools import StructuredTool, ToolException
 from langchain_core.output_parsers import JsonOutputParser
 from langchain_core.prompts import PromptTemplate
 from langchain_core.runnables import RunnableConfig
 from langchain_core.runnables.history import RunnableWithMessageHistory
 from langchain_openai import ChatOpenAI
 from core.models import CodeGenerator
-from core.state import get_session_history, generate_session_id
+from core.result_cache import ExecutionResultCache
+from core.speculation import SpeculativeCodeGenerator
+from core.sandbox import SandboxPool
+from core.code_lint import CodeLinter
+from core.code_repair import CodeRepairer, classify_error, is_empty_result
+from core.streaming import emit_event
+from core.tracing import span, traced
+from core.history_window import windowed_session_history
+from core.state import generate_session_id, current_session_id
 
 
-def create_code_tools(model: ChatOpenAI, df):
-    """코드 생성 및 실행 도구 생성"""
+def create_code_generator_chain(model: ChatOpenAI):
+    """코드 생성 체인 (prompt | model | parser) 생성, 입력은 query와 chat_history"""
     code_generator_output_parser = JsonOutputParser(pydantic_object=CodeGenerator)
     code_generator_format_instructions = code_generator_output_parser.get_format_instructions()
 
@@ -45,8 +54,8 @@ def create_code_tools(model: ChatOpenAI, df):
                 13. '종업원합계' (Total Employees): Total number of employees
 
                 # Production Information
-                14. '생산품' (Products): Products manufactured at the factory. It's not categorized and normalized, so you need use 'str.contains' to filter the products.
-                15. '원자재' (Raw Materials): Raw materials used in production. It's not categorized and normalized, so you need use 'str.contains' to filter the products.
+                14. '생산품' (Products): Products manufactured at the factory. It's not categorized and normalized, so filter it with the pre-built index helper 'search_products(keyword, ...)' instead of 'str.contains'. It returns a boolean mask aligned with df (case-insensitive substring match, multiple keywords are OR), e.g. df[search_products('반도체')].
+                15. '원자재' (Raw Materials): Raw materials used in production. It's not categorized and normalized, so filter it with 'search_materials(keyword, ...)' in the same way, e.g. df[search_materials('실리콘', '웨이퍼')].
                 16. '공장규모' (Factory Scale): Size classification of the factory. e.g. ['소기업', '중기업', '대기업', '중견기업']
                 
                 # Facility Specifications
@@ -75,7 +84,17 @@ def create_code_tools(model: ChatOpenAI, df):
                 32. '인구' (Population): Population in each '시군구명'. Unit is person.
 
                 # Date Fields
-                31. '정제_최초등록일' (Standardized Initial Registration Date): Standardized date of initial registration (format: YYYY-MM-DD). Use this columns when "연도" or "년도" is in the question.            32. '정제_최초승인일' (Standardized Initial Approval Date): Standardized date of initial approval (format: YYYY-MM-DD)
+                31. '정제_최초등록일' (Standardized Initial Registration Date): Standardized date of initial registration. Already parsed as datetime64, so do not call 'pd.to_datetime' on it.
+                32. '정제_최초승인일' (Standardized Initial Approval Date): Standardized date of initial approval. Already parsed as datetime64, so do not call 'pd.to_datetime' on it.
+                33. '정제_최초등록연도' / '정제_최초등록월' (Registration Year / Month): Year and month of '정제_최초등록일' as integers. Use '정제_최초등록연도' when "연도" or "년도" is in the question.
+                34. '정제_최초승인연도' / '정제_최초승인월' (Approval Year / Month): Year and month of '정제_최초승인일' as integers.
+
+                # Data Types
+                - '정제_시군구명', '정제_시도명', '정제_업종명', '정제_대표업종', '정제_용도지역', '정제_지목', '정제_보유구분', '정제_관리기관', '공장규모', '공장구분', '설립구분', '입주형태', '등록구분' are categorical columns. Always pass 'observed=True' to 'groupby' and 'pivot_table' on them, drop the 0 counts of unobserved categories from 'value_counts()' (e.g. '.value_counts().loc[lambda s: s > 0]'), and convert with '.astype(str)' before string concatenation or filling new values.
+
+                # Pre-computed Helpers
+                - 'factory_counts(by=None, **filters)': Pre-computed distinct factory counts ('공장수', unique '공장관리번호') and employee sums ('종업원합계', each factory counted once) by any combination of '정제_시군구명', '정제_업종명', '공장규모', '정제_최초등록연도'. 'by' is a column name or a list of them, and filters are column=value or column=[values]. It returns a DataFrame sorted by '공장수' in descending order; pass sort_by='종업원합계' to rank by employees or sort_by=None to keep it unsorted. It returns None for any other column, so compute those with pandas on df instead. Prefer it over groupby + nunique whenever the question only uses these dimensions.
+                  e.g. factory_counts('정제_시군구명'), factory_counts(['정제_시군구명', '공장규모'], 정제_최초등록연도=list(range(2015, 2025))), factory_counts(정제_시군구명='강남구')
 
                 Write the code with the most efficient way.
                 <Output format>: Always respond with Python Pandas code. Always assign the final result to a variable called `return_var`. Do not use print(). {format_instructions}
@@ -87,53 +106,161 @@ def create_code_tools(model: ChatOpenAI, df):
         partial_variables={"format_instructions": code_generator_format_instructions},
     )
 
-    @tool
-    def code_generator(input, session_id: Optional[str] = None):
-        """
-        사용자의 질문에 답하기 위해 CSV에서 쿼리할 수 있는 Python Pandas 코드를 작성하는 도구
-        """
-        chain = code_generator_prompt | model | code_generator_output_parser
+    return code_generator_prompt | model | code_generator_output_parser
 
-        resolved_session_id = session_id or generate_session_id()
 
-        code_generator_with_history = RunnableWithMessageHistory(
-            chain,
-            get_session_history,
-            input_messages_key="query",
-            history_messages_key="chat_history",
-        )
+def create_code_tools(
+    model: ChatOpenAI,
+    df,
+    namespace: Optional[dict] = None,
+    result_cache: Optional[ExecutionResultCache] = None,
+    speculator: Optional[SpeculativeCodeGenerator] = None,
+    sandbox: Optional[SandboxPool] = None,
+):
+    """
+    코드 생성 및 실행 도구 생성
+    - namespace: 생성 코드 실행 시 df와 함께 주입할 헬퍼 (예: search_products, factory_counts)
+    - result_cache: 같은 코드의 반복 실행을 건너뛰기 위한 실행 결과 캐시
+    - speculator: 라우팅과 동시에 미리 생성해 둔 코드가 있으면 첫 code_generator 호출에서 사용
+    - sandbox: 생성 코드를 워커 프로세스 풀에서 실행 (없으면 현재 프로세스에서 exec)
+    """
+    namespace = namespace or {}
+    code_linter = CodeLinter(df)
+    code_repairer = CodeRepairer(df)
+
+    # 체인은 한 번만 구성하고, 세션은 호출마다 config로 바인딩
+    code_generator_chain = create_code_generator_chain(model)
+    code_generator_with_history = RunnableWithMessageHistory(
+        code_generator_chain,
+        windowed_session_history("code_generator"),  # 토큰 예산 안의 최근 턴 + 요약만 프롬프트에 포함
+        input_messages_key="query",
+        history_messages_key="chat_history",
+    )
 
+    def code_generator_config() -> RunnableConfig:
+        resolved_session_id = current_session_id.get() or generate_session_id()
         # 콜백 비활성화하여 RootListenersTracer 에러 방지
-        config = RunnableConfig(
+        return RunnableConfig(
             configurable={'session_id': resolved_session_id},
             callbacks=[]  # 콜백 비활성화
         )
-        code_generator_result = code_generator_with_history.invoke(
-            {"query": input},  # 원본 input 그대로 전달
-            config
-        )
+
+    def generate_code(input):
+        """
+        사용자의 질문에 답하기 위해 CSV에서 쿼리할 수 있는 Python Pandas 코드를 작성하는 도구
+        """
+        with span("tool.code_generator"):
+            code_generator_result = code_generator_with_history.invoke(
+                {"query": input},  # 원본 input 그대로 전달
+                code_generator_config()
+            )
+        emit_event("code_generated", code=code_generator_result['code'])
+        return code_generator_result['code']
+
+    async def agenerate_code(input):
+        session_id = current_session_id.get()
+        with span("tool.code_generator"):
+            if speculator is not None and session_id:
+                speculative_code = await speculator.consume(session_id, input)
+                if speculative_code is not None:
+                    emit_event("code_generated", code=speculative_code)
+                    return speculative_code
+
+            code_generator_result = await code_generator_with_history.ainvoke(
+                {"query": input},
+                code_generator_config()
+            )
+        emit_event("code_generated", code=code_generator_result['code'])
         return code_generator_result['code']
 
+    # AgentExecutor.ainvoke에서는 coroutine 경로로 LLM을 비동기 호출
+    code_generator = StructuredTool.from_function(
+        func=generate_code,
+        coroutine=agenerate_code,
+        name="code_generator",
+    )
+
     @tool
+    @traced("tool.code_executor")
     def code_executor(input_code: str, max_retries=3):
         """
         LLM이 생성한 Pandas 코드를 안전하게 실행하고 return_var 반환.
-        df는 글로벌 변수 사용.
+        df와 namespace의 헬퍼(search_products 등)는 글로벌 변수 사용.
         NA, None, 0 등의 에러 대비.
+        실행 전에 린터로 느린 패턴을 고치고, 너무 오래 걸릴 코드는 실행하지 않고 피드백 반환.
+        실행 오류는 유형별로 분류하여 기계적으로 고칠 수 있으면 바로 고쳐서 다시 실행 (최대 max_retries회 실행).
         """
-        local_vars = {'df': df}
+        emit_event("executing")
+        report = code_linter.check(input_code)
+        if report.fixes:
+            print(f"🔧 생성 코드 자동 수정: {', '.join(report.fixes)}")
+            input_code = report.code
+        if report.rejected:
+            print(f"⛔ 예상 실행 시간 {report.estimated_seconds:.1f}s, 실행하지 않고 거부")
+            raise ToolException(report.feedback())
+        if report.issues:
+            print(f"🐢 느린 패턴 {len(report.issues)}개 (예상 {report.estimated_seconds:.2f}s): {', '.join(issue.kind for issue in report.issues)}")
+
+        cache_key = result_cache.make_key(input_code) if result_cache else None
+        if cache_key:
+            hit, cached = result_cache.get(cache_key)
+            if hit:
+                print("♻️ 코드 실행 결과 캐시 사용")
+                return cached
+
+        @traced("exec")
+        def run(code: str):
+            if sandbox is not None:
+                # 미리 fork한 워커 프로세스에서 시간/CPU/메모리 제한을 걸고 실행
+                return sandbox.execute(code)
+            local_vars = {'df': df, **namespace}
+            exec(code, local_vars)
+            if 'return_var' not in local_vars:
+                raise ValueError("Generated code did not assign value to 'return_var'.")
+            return local_vars['return_var']
 
+        # 같은 코드를 다시 실행하지 않고, 오류 유형별로 고칠 수 있는 경우만 고쳐서 다시 실행
+        code = input_code
         for attempt in range(max_retries):
             try:
-                exec(input_code, local_vars)
-                if 'return_var' not in local_vars:
-                    raise ValueError("Generated code did not assign value to 'return_var'.")
-                return local_vars['return_var']
+                return_var = run(code)
+            except (TimeoutError, MemoryError) as e:
+                # 자원 제한 초과는 같은 코드로 재시도해도 같은 결과이므로, 에이전트 재시도 대신 가벼운 코드로 다시 작성하게 함
+                print(f"⚠️ 코드 실행 자원 제한 초과: {e}")
+                limit = "time limit" if isinstance(e, TimeoutError) else "memory limit"
+                raise ToolException(
+                    f"{type(e).__name__}: {e}. The code exceeded the sandbox {limit}. "
+                    "Rewrite it to aggregate (groupby, value_counts, factory_counts) or filter first, "
+                    "and limit the rows (e.g. .head(100)) instead of processing or returning the whole dataset."
+                )
             except Exception as e:
-                print(f"⚠️ 코드 실행 실패 (시도 {attempt+1}/{max_retries}): {e}")
-                # NA나 boolean 비교 에러 등 재시도 가능
-                if attempt == max_retries - 1:
-                    raise
+                repair = code_repairer.repair(code, e) if attempt < max_retries - 1 else None
+                if repair is None:
+                    print(f"⚠️ 코드 실행 실패 ({classify_error(e)}): {e}")
+                    # 고칠 수 없는 오류는 에이전트가 코드를 다시 작성하도록 관찰 결과로 돌려줌
+                    raise ToolException(f"{type(e).__name__}: {e}")
+                print(f"🩹 코드 자동 수정 후 재실행 ({repair.kind}): {repair.description}")
+                code = repair.code
+                continue
+
+            if is_empty_result(return_var):
+                # 예외 없이 빈 결과면 타입/㈜(주) 표기 불일치를 고쳐서 한 번만 더 실행
+                repair = code_repairer.repair_empty(code)
+                if repair is not None:
+                    try:
+                        repaired = run(repair.code)
+                    except Exception:
+                        repaired = None
+                    if repaired is not None and not is_empty_result(repaired):
+                        print(f"🩹 빈 결과 자동 수정 ({repair.kind}): {repair.description}")
+                        code_repairer.record(repair.kind)
+                        return_var = repaired
+            if cache_key:
+                result_cache.put(cache_key, return_var)
+            return return_var
+
+    # 린터가 거부했거나 자동으로 고칠 수 없는 코드는 에러 대신 피드백을 관찰 결과로 돌려주어 에이전트가 다시 작성하게 함
+    code_executor.handle_tool_error = True
 
     return [code_generator, code_executor]
 
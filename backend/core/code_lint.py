@@ -0,0 +1,498 @@
+"""
+생성 코드 성능 린터
+- 실행 전에 생성된 Pandas 코드의 AST를 분석하여 느린 패턴을 찾음
+- 결과가 바뀌지 않는 경우는 바로 고쳐서 실행
+  str.contains/startswith/endswith에 na=False, groupby/pivot_table에 observed=True,
+  value_counts 결과에서 관측되지 않은 카테고리(0건) 제거,
+  이미 datetime인 컬럼에 대한 pd.to_datetime 제거, 수정하지 않는 df.copy() 제거
+- 나머지(iterrows, 행 단위 apply, df 행 반복, 반복문 안 pd.to_datetime/필터링)는 에이전트에 돌려줄 피드백으로 모음
+- 행 수 기반 예상 실행 시간이 상한을 넘으면 실행하지 않고 거부
+"""
+import os
+import ast
+import threading
+from typing import Dict, List, Optional, Set, Tuple
+import pandas as pd
+
+
+# 예상 실행 시간이 이보다 길면 실행하지 않음 (0이면 거부하지 않음)
+LINT_MAX_ESTIMATED_SECONDS = float(os.getenv("LINT_MAX_ESTIMATED_SECONDS", "10"))
+
+# 대략적인 비용 (초), 데이터셋 2만 행 기준 측정값
+ITERROWS_ROW_SECONDS = 2.5e-5
+ITERTUPLES_ROW_SECONDS = 4e-6
+ROW_APPLY_ROW_SECONDS = 6e-6  # apply(axis=1) 행당
+ELEMENT_APPLY_ROW_SECONDS = 2e-7  # Series.apply/map 원소당
+PYTHON_ROW_SECONDS = 1e-7  # df 값을 도는 for 문 한 바퀴
+TO_DATETIME_CALL_SECONDS = 2.5e-4  # 스칼라 pd.to_datetime 한 번
+DATAFRAME_OP_SECONDS = 5e-5  # 인덱싱/메서드 호출 한 번의 고정 비용
+DATAFRAME_SCAN_ROW_SECONDS = 1e-7  # 전체 행을 비교하는 마스크의 행당 비용 (문자열 컬럼 기준)
+
+# 반복 횟수를 알 수 없는 반복문 (그룹/고유값/기타)
+GROUP_ITERATIONS = 50
+DEFAULT_ITERATIONS = 10
+
+NA_METHODS = {"contains": 3, "startswith": 1, "endswith": 1}  # 메서드 -> na의 위치 인자 순서
+GROUP_METHODS = {"unique", "value_counts", "groupby", "drop_duplicates", "nunique"}
+MUTATING_METHODS = {"insert", "pop", "update", "__setitem__"}
+SCALAR_INDEXERS = {"at", "iat"}  # 항상 값 하나
+ROW_INDEXERS = {"loc", "iloc"}  # 행 인덱스가 슬라이스/마스크가 아니면 행 하나
+
+# 린트 통계 (checked: 검사, fixed: 자동 수정, flagged: 느린 패턴 발견, rejected: 실행 거부)
+_counters = {"checked": 0, "fixed": 0, "flagged": 0, "rejected": 0}
+_counters_lock = threading.Lock()
+
+
+class LintIssue:
+    def __init__(self, kind: str, line: int, message: str):
+        self.kind = kind
+        self.line = line
+        self.message = message
+
+    def __str__(self):
+        return f"line {self.line}: {self.message}"
+
+
+class LintReport:
+    """
+    린트 결과
+    - code: 자동 수정이 반영된 실행할 코드
+    - fixes: 적용한 자동 수정, issues: 남은 느린 패턴
+    """
+
+    def __init__(self, code: str, fixes: List[str], issues: List[LintIssue], estimated_seconds: float, max_seconds: float, row_count: int):
+        self.code = code
+        self.fixes = fixes
+        self.issues = issues
+        self.estimated_seconds = estimated_seconds
+        self.max_seconds = max_seconds
+        self.row_count = row_count
+
+    @property
+    def rejected(self) -> bool:
+        return self.max_seconds > 0 and self.estimated_seconds > self.max_seconds
+
+    def feedback(self) -> str:
+        """에이전트에 돌려줄 피드백 (코드를 고칠 때 참고)"""
+        lines = [f"- {issue}" for issue in self.issues]
+        if self.rejected:
+            header = (
+                f"Code was rejected before execution: estimated {self.estimated_seconds:.0f}s on {self.row_count:,} rows "
+                f"exceeds the {self.max_seconds:.0f}s limit. Rewrite it with vectorized pandas operations:"
+            )
+        else:
+            header = "Slow patterns found in the code:"
+        return "\n".join([header, *lines])
+
+
+def _root_name(node: ast.AST) -> Optional[str]:
+    """df['a'].str.contains(...) 같은 체인의 시작 이름"""
+    while True:
+        if isinstance(node, (ast.Attribute, ast.Subscript)):
+            node = node.value
+        elif isinstance(node, ast.Call):
+            node = node.func
+        elif isinstance(node, ast.Name):
+            return node.id
+        else:
+            return None
+
+
+def _keyword_names(node: ast.Call) -> Set[Optional[str]]:
+    return {keyword.arg for keyword in node.keywords}
+
+
+def _is_pd_call(node: ast.AST, name: str) -> bool:
+    return (
+        isinstance(node, ast.Call)
+        and isinstance(node.func, ast.Attribute)
+        and node.func.attr == name
+        and isinstance(node.func.value, ast.Name)
+        and node.func.value.id in {"pd", "pandas"}
+    )
+
+
+def _column_name(node: ast.AST, frame_names: Set[str]) -> Optional[str]:
+    """df['col'] / df.col 형태면 컬럼 이름"""
+    if isinstance(node, ast.Subscript) and isinstance(node.value, ast.Name) and node.value.id in frame_names:
+        if isinstance(node.slice, ast.Constant) and isinstance(node.slice.value, str):
+            return node.slice.value
+    if isinstance(node, ast.Attribute) and isinstance(node.value, ast.Name) and node.value.id in frame_names:
+        return node.attr
+    return None
+
+
+def _is_scalar_index(node: ast.AST) -> bool:
+    """행 하나를 가리키는 인덱스인지 (반복 변수, 숫자, i + 1 등, 슬라이스/마스크/리스트는 아님)"""
+    if isinstance(node, ast.Constant):
+        return not isinstance(node.value, str)
+    return isinstance(node, (ast.Name, ast.BinOp, ast.UnaryOp, ast.Attribute))
+
+
+def _is_scalar_access(node: ast.AST) -> bool:
+    """
+    df.at[i, 'b'], df.loc[i, 'b'], df['b'][i], df.shape[0]처럼 체인 중간에 값/행 하나를 고르는 인덱싱이 있는지
+    (전체 행을 훑지 않으므로 비교해도 스캔 비용이 들지 않음)
+    """
+    while True:
+        if isinstance(node, ast.Subscript):
+            value = node.value
+            index = node.slice.elts[0] if isinstance(node.slice, ast.Tuple) and node.slice.elts else node.slice
+            if isinstance(value, ast.Attribute) and value.attr in SCALAR_INDEXERS:
+                return True
+            if isinstance(value, ast.Attribute) and value.attr in ROW_INDEXERS:
+                if _is_scalar_index(index):
+                    return True
+            # df[...]는 컬럼 선택, .str[0]은 원소별 연산
+            elif not isinstance(value, ast.Name) and not (isinstance(value, ast.Attribute) and value.attr == "str"):
+                if _is_scalar_index(index):
+                    return True
+            node = value
+        elif isinstance(node, ast.Attribute):
+            node = node.value
+        elif isinstance(node, ast.Call):
+            node = node.func
+        else:
+            return False
+
+
+def _has_mutation(tree: ast.AST) -> bool:
+    """코드 어디에서든 객체를 제자리 수정하는지 (대입 인덱싱, 속성 대입, 복합 대입, inplace=True 등)"""
+    for node in ast.walk(tree):
+        if isinstance(node, (ast.Subscript, ast.Attribute)) and isinstance(node.ctx, (ast.Store, ast.Del)):
+            return True
+        if isinstance(node, ast.AugAssign):
+            return True
+        if isinstance(node, ast.Call):
+            if isinstance(node.func, ast.Attribute) and node.func.attr in MUTATING_METHODS:
+                return True
+            for keyword in node.keywords:
+                if keyword.arg == "inplace" and not (isinstance(keyword.value, ast.Constant) and keyword.value.value is False):
+                    return True
+    return False
+
+
+class _SafeRewriter(ast.NodeTransformer):
+    """결과가 바뀌지 않는 자동 수정"""
+
+    def __init__(self, datetime_columns: Set[str]):
+        self.datetime_columns = datetime_columns
+        self.fixes: List[str] = []
+
+    def visit_Call(self, node: ast.Call):
+        self.generic_visit(node)
+        func = node.func
+        if not isinstance(func, ast.Attribute):
+            return node
+        keywords = _keyword_names(node)
+
+        # .str.contains(...) 등: 결측값이 NaN으로 남아 boolean 마스크가 깨지지 않도록 na=False
+        if (
+            func.attr in NA_METHODS
+            and isinstance(func.value, ast.Attribute)
+            and func.value.attr == "str"
+            and "na" not in keywords
+            and None not in keywords
+            and len(node.args) <= NA_METHODS[func.attr]
+        ):
+            node.keywords.append(ast.keyword(arg="na", value=ast.Constant(value=False)))
+            self.fixes.append(f"str.{func.attr}(na=False)")
+            return node
+
+        # groupby: categorical 컬럼의 관측되지 않은 조합을 만들지 않도록 observed=True
+        if (
+            func.attr == "groupby"
+            and _root_name(func.value) != "itertools"
+            and "observed" not in keywords
+            and None not in keywords
+            and len(node.args) <= 1
+        ):
+            node.keywords.append(ast.keyword(arg="observed", value=ast.Constant(value=True)))
+            self.fixes.append("groupby(observed=True)")
+            return node
+
+        # pivot_table: groupby와 같이 관측되지 않은 카테고리 행/열(0 또는 NaN)을 만들지 않도록 observed=True
+        if (
+            func.attr == "pivot_table"
+            and "observed" not in keywords
+            and None not in keywords
+            and len(node.args) <= 5
+        ):
+            node.keywords.append(ast.keyword(arg="observed", value=ast.Constant(value=True)))
+            self.fixes.append("pivot_table(observed=True)")
+            return node
+
+        # Series.value_counts: categorical 컬럼은 필터링 후에도 모든 카테고리를 0건으로 포함하므로 0건 제거
+        # (categorical이 아니면 0건이 나오지 않아 결과가 같음, 구간별 집계(bins)는 0건도 의미가 있어 제외)
+        if func.attr == "value_counts" and "bins" not in keywords and None not in keywords:
+            self.fixes.append("value_counts() without unobserved categories")
+            return ast.Subscript(
+                value=ast.Attribute(value=node, attr="loc", ctx=ast.Load()),
+                slice=ast.Lambda(
+                    args=ast.arguments(posonlyargs=[], args=[ast.arg(arg="counts")], kwonlyargs=[], kw_defaults=[], defaults=[]),
+                    body=ast.Compare(left=ast.Name(id="counts", ctx=ast.Load()), ops=[ast.Gt()], comparators=[ast.Constant(value=0)]),
+                ),
+                ctx=ast.Load(),
+            )
+
+        # 이미 datetime64인 컬럼의 pd.to_datetime은 불필요한 변환
+        if (
+            _is_pd_call(node, "to_datetime")
+            and len(node.args) == 1
+            and keywords <= {"errors", "format"}
+            and _column_name(node.args[0], {"df"}) in self.datetime_columns
+        ):
+            self.fixes.append("pd.to_datetime(datetime column)")
+            return node.args[0]
+        return node
+
+
+def _remove_unused_copies(tree: ast.Module) -> List[str]:
+    """
+    `x = df.copy()` 후 아무것도 제자리 수정하지 않는 코드에서 copy() 제거
+    (x를 한 번만 대입하고, 코드 전체에 제자리 수정이 없을 때만)
+    """
+    if _has_mutation(tree):
+        return []
+    assignments: Dict[str, int] = {}
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Name) and isinstance(node.ctx, ast.Store):
+            assignments[node.id] = assignments.get(node.id, 0) + 1
+
+    fixes = []
+    for node in ast.walk(tree):
+        if not (isinstance(node, ast.Assign) and len(node.targets) == 1 and isinstance(node.targets[0], ast.Name)):
+            continue
+        value = node.value
+        if (
+            isinstance(value, ast.Call)
+            and isinstance(value.func, ast.Attribute)
+            and value.func.attr == "copy"
+            and isinstance(value.func.value, ast.Name)
+            and value.func.value.id == "df"
+            and not value.args
+            and assignments.get(node.targets[0].id) == 1
+        ):
+            node.value = ast.copy_location(ast.Name(id="df", ctx=ast.Load()), value)
+            fixes.append("df.copy()")
+    return fixes
+
+
+class _CostEstimator(ast.NodeVisitor):
+    """
+    행 수 기반 예상 실행 시간 추정 (대략적인 값)
+    - 반복문/행 단위 apply 안의 코드는 반복 횟수를 곱해서 계산
+    - df에서 만든 변수(frame_names)도 df와 같은 행 수로 봄
+    """
+
+    def __init__(self, row_count: int, column_count: int):
+        self.row_count = row_count
+        self.column_count = column_count
+        self.frame_names = {"df"}
+        self.functions: Dict[str, ast.AST] = {}
+        self.multiplier = 1
+        self.seconds = 0.0
+        self.issues: List[LintIssue] = []
+        self._reported = set()
+        self._row_loop = False  # df 행 단위 반복 안인지
+
+    def _issue(self, kind: str, node: ast.AST, message: str):
+        key = (kind, getattr(node, "lineno", 0))
+        if key not in self._reported:
+            self._reported.add(key)
+            self.issues.append(LintIssue(kind, getattr(node, "lineno", 0), message))
+
+    def _is_frame(self, node: ast.AST) -> bool:
+        return _root_name(node) in self.frame_names
+
+    def _visit_repeated(self, nodes, iterations: int):
+        previous = self.multiplier
+        self.multiplier *= max(iterations, 1)
+        for node in nodes:
+            self.visit(node)
+        self.multiplier = previous
+
+    def _iterations(self, node: ast.AST) -> Tuple[int, Optional[str]]:
+        """반복 대상의 (반복 횟수, 종류) 추정, 종류는 df 행을 도는 경우만 (iterrows/itertuples/rows)"""
+        if isinstance(node, ast.Call) and isinstance(node.func, ast.Name):
+            name = node.func.id
+            if name in {"enumerate", "reversed", "sorted", "list"} and node.args:
+                return self._iterations(node.args[0])
+            if name == "zip" and node.args:
+                return max((self._iterations(arg) for arg in node.args), key=lambda item: item[0])
+            if name == "range":
+                bound = node.args[-1] if len(node.args) <= 2 and node.args else None
+                if (
+                    isinstance(bound, ast.Call)
+                    and getattr(bound.func, "id", None) == "len"
+                    and bound.args
+                    and self._is_frame(bound.args[0])
+                ):
+                    return self.row_count, "rows"
+                values = [arg.value for arg in node.args if isinstance(arg, ast.Constant) and isinstance(arg.value, int)]
+                if values and len(values) == len(node.args):
+                    start, stop = (0, values[0]) if len(values) == 1 else (values[0], values[1])
+                    return max(stop - start, 0), None
+            return DEFAULT_ITERATIONS, None
+        if isinstance(node, (ast.List, ast.Tuple, ast.Set)):
+            return len(node.elts), None
+        if not self._is_frame(node):
+            return DEFAULT_ITERATIONS, None
+        if isinstance(node, ast.Call) and isinstance(node.func, ast.Attribute):
+            if node.func.attr == "iterrows":
+                return self.row_count, "iterrows"
+            if node.func.attr == "itertuples":
+                return self.row_count, "itertuples"
+        if isinstance(node, ast.Attribute) and node.attr == "columns":
+            return self.column_count, None
+        # groupby/unique 등을 거친 값은 그룹 수만큼 반복
+        if any(
+            isinstance(part, ast.Call) and isinstance(part.func, ast.Attribute) and part.func.attr in GROUP_METHODS
+            for part in ast.walk(node)
+        ):
+            return GROUP_ITERATIONS, None
+        return self.row_count, "rows"
+
+    def _loop(self, node: ast.AST, iterable: ast.AST, body):
+        iterations, kind = self._iterations(iterable)
+        if kind == "iterrows":
+            self.seconds += self.multiplier * iterations * ITERROWS_ROW_SECONDS
+            self._issue(kind, node, f"`iterrows()` runs Python code for each of {iterations:,} rows. Use vectorized column operations, boolean masks or groupby instead.")
+        elif kind == "itertuples":
+            self.seconds += self.multiplier * iterations * ITERTUPLES_ROW_SECONDS
+            self._issue(kind, node, f"`itertuples()` runs Python code for each of {iterations:,} rows. Use vectorized column operations, boolean masks or groupby instead.")
+        elif kind == "rows":
+            self.seconds += self.multiplier * iterations * PYTHON_ROW_SECONDS
+            self._issue("row_loop", node, f"Python loop over {iterations:,} DataFrame rows. Replace it with vectorized operations (boolean masks, groupby, merge, map).")
+        previous_row_loop = self._row_loop
+        self._row_loop = previous_row_loop or kind is not None
+        self._visit_repeated(body, iterations)
+        self._row_loop = previous_row_loop
+
+    def visit_FunctionDef(self, node: ast.FunctionDef):
+        # 본문은 apply 등에서 호출될 때 반복 횟수를 곱해서 계산
+        self.functions[node.name] = node
+
+    def visit_Assign(self, node: ast.Assign):
+        self.visit(node.value)
+        if self._is_frame(node.value):
+            for target in node.targets:
+                if isinstance(target, ast.Name):
+                    self.frame_names.add(target.id)
+
+    def visit_For(self, node: ast.For):
+        self.visit(node.iter)
+        self._loop(node, node.iter, [*node.body, *node.orelse])
+
+    def visit_While(self, node: ast.While):
+        self._visit_repeated([node.test, *node.body, *node.orelse], DEFAULT_ITERATIONS)
+
+    def _visit_comprehension(self, node):
+        iterations = 1
+        for generator in node.generators:
+            self.visit(generator.iter)
+            count, kind = self._iterations(generator.iter)
+            if kind is not None:
+                self._loop(node, generator.iter, [])
+            iterations *= max(count, 1)
+        elements = [node.key, node.value] if isinstance(node, ast.DictComp) else [node.elt]
+        conditions = [condition for generator in node.generators for condition in generator.ifs]
+        self._visit_repeated([*elements, *conditions], iterations)
+
+    visit_ListComp = visit_SetComp = visit_GeneratorExp = visit_DictComp = _visit_comprehension
+
+    def visit_Call(self, node: ast.Call):
+        func = node.func
+        if self.multiplier > 1 and _is_pd_call(node, "to_datetime"):
+            self.seconds += self.multiplier * TO_DATETIME_CALL_SECONDS
+            self._issue("to_datetime_in_loop", node, "`pd.to_datetime` is called inside a loop. Convert the column once outside the loop; '정제_최초등록일' and '정제_최초승인일' are already datetime64.")
+
+        if isinstance(func, ast.Attribute) and func.attr in {"apply", "map", "applymap"} and self._is_frame(func.value):
+            self.visit(func.value)
+            for keyword in node.keywords:
+                self.visit(keyword.value)
+            axis = next((keyword.value for keyword in node.keywords if keyword.arg == "axis"), None)
+            row_wise = isinstance(axis, ast.Constant) and axis.value in (1, "columns")
+            callback = node.args[0] if node.args else None
+            body = []
+            if isinstance(callback, ast.Lambda):
+                body = [callback.body]
+            elif isinstance(callback, ast.Name) and callback.id in self.functions:
+                body = self.functions[callback.id].body
+            if row_wise:
+                self.seconds += self.multiplier * self.row_count * ROW_APPLY_ROW_SECONDS
+                self._issue("row_apply", node, f"`apply(..., axis=1)` calls a Python function for each of {self.row_count:,} rows. Combine columns with vectorized arithmetic, `np.where` or `.str`/`.dt` accessors instead.")
+            elif body:
+                self.seconds += self.multiplier * self.row_count * ELEMENT_APPLY_ROW_SECONDS
+            before = len(self.issues)
+            previous_row_loop = self._row_loop
+            self._row_loop = previous_row_loop or bool(body)
+            self._visit_repeated(body, self.row_count if body else 1)
+            self._row_loop = previous_row_loop
+            if body and not row_wise and len(self.issues) > before:
+                self._issue("element_apply", node, f"`{func.attr}` runs a Python function with DataFrame work for each of {self.row_count:,} values. Use vectorized `.str`/`.dt` accessors, `map` with a dict, or merge instead.")
+            return
+
+        if self.multiplier > 1 and self._row_loop and self._is_frame(func):
+            self.seconds += self.multiplier * DATAFRAME_OP_SECONDS
+        self.generic_visit(node)
+
+    def visit_Compare(self, node: ast.Compare):
+        # 반복문 안에서 df 전체(컬럼/프레임)를 비교하는 마스크는 반복마다 전체 행을 다시 훑음
+        # df.loc[i, 'b'] == 'x' 같은 값 하나의 비교는 제외
+        if self.multiplier > 1 and any(
+            self._is_frame(operand) and not _is_scalar_access(operand)
+            for operand in [node.left, *node.comparators]
+        ):
+            self.seconds += self.multiplier * (DATAFRAME_OP_SECONDS + self.row_count * DATAFRAME_SCAN_ROW_SECONDS)
+            if self._row_loop:
+                self._issue("filter_in_loop", node, f"DataFrame filtering inside a row loop rescans all {self.row_count:,} rows on every iteration. Use groupby, map or a single merge instead.")
+        self.generic_visit(node)
+
+    def visit_Subscript(self, node: ast.Subscript):
+        if self.multiplier > 1 and self._row_loop and self._is_frame(node):
+            self.seconds += self.multiplier * DATAFRAME_OP_SECONDS
+        self.generic_visit(node)
+
+
+class CodeLinter:
+    """데이터셋 행 수/컬럼 dtype을 기준으로 생성 코드를 검사"""
+
+    def __init__(self, df: pd.DataFrame, max_estimated_seconds: float = LINT_MAX_ESTIMATED_SECONDS):
+        self.row_count = len(df)
+        self.column_count = len(df.columns)
+        self.datetime_columns = {
+            str(column) for column in df.columns if pd.api.types.is_datetime64_any_dtype(df[column])
+        }
+        self.max_estimated_seconds = max_estimated_seconds
+
+    def check(self, code: str) -> LintReport:
+        """자동 수정을 적용하고 느린 패턴/예상 실행 시간을 계산 (파싱할 수 없는 코드는 그대로 반환)"""
+        try:
+            tree = ast.parse(code)
+        except SyntaxError:
+            return LintReport(code, [], [], 0.0, self.max_estimated_seconds, self.row_count)
+
+        rewriter = _SafeRewriter(self.datetime_columns)
+        tree = rewriter.visit(tree)
+        fixes = rewriter.fixes + _remove_unused_copies(tree)
+        if fixes:
+            ast.fix_missing_locations(tree)
+            code = ast.unparse(tree)
+
+        estimator = _CostEstimator(self.row_count, self.column_count)
+        estimator.visit(tree)
+        report = LintReport(code, fixes, estimator.issues, estimator.seconds, self.max_estimated_seconds, self.row_count)
+
+        with _counters_lock:
+            _counters["checked"] += 1
+            _counters["fixed"] += bool(fixes)
+            _counters["flagged"] += bool(report.issues)
+            _counters["rejected"] += report.rejected
+        return report
+
+
+def get_stats():
+    """린트 결과별 횟수"""
+    with _counters_lock:
+        return dict(_counters)
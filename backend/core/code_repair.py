@@ -0,0 +1,305 @@
+"""
+생성 코드 실행 오류 자동 수정 모듈
+- 실행 예외를 유형별로 분류하고, 기계적으로 고칠 수 있으면 코드를 고쳐 LLM 호출 없이 다시 실행
+  na_mask: NA가 섞인 boolean 마스크 -> 마스크의 NA를 False로
+  type_mismatch: 숫자 컬럼과 문자열 비교(또는 반대), 날짜 컬럼과 연도 비교 -> 상수/컬럼을 dtype에 맞게 변환
+  unknown_column: 없는 컬럼 -> 가장 비슷한 실제 컬럼 이름으로 교체
+  missing_import: np/pd 등 import 누락 -> import 추가
+- 예외 없이 빈 결과가 나온 경우 타입 불일치와 ㈜/(주) 표기 차이(corp_mark)를 고쳐서 한 번 더 실행
+- 고칠 수 없는 오류만 에이전트(LLM)에 돌려보냄
+"""
+import re
+import ast
+import difflib
+import threading
+from typing import Dict, Optional, Set
+import numpy as np
+import pandas as pd
+from core.schema import DATE_COLUMNS
+
+
+CORP_MARKS = ("(주)", "㈜")
+
+# 자주 빠뜨리는 import
+KNOWN_IMPORTS = {
+    "np": "import numpy as np",
+    "pd": "import pandas as pd",
+    "re": "import re",
+    "math": "import math",
+    "Counter": "from collections import Counter",
+}
+
+# 마스크의 NA를 False로 채우는 헬퍼 (고친 코드 앞에 붙여서 실행, 샌드박스에서도 그대로 동작)
+FILL_NA_MASK_SOURCE = '''
+def _fill_na_mask(mask):
+    if hasattr(mask, "fillna") and getattr(mask, "dtype", None) != bool:
+        return mask.astype("boolean").fillna(False).astype(bool)
+    return mask
+'''
+
+MASK_METHODS = {"contains", "startswith", "endswith", "match", "fullmatch", "isin", "between", "isna", "notna", "isnull", "notnull"}
+
+# 자동 수정 통계 (유형별 성공 횟수, 고칠 수 없어 LLM으로 넘긴 횟수)
+_counters = {"na_mask": 0, "type_mismatch": 0, "unknown_column": 0, "missing_import": 0, "corp_mark": 0, "unrecoverable": 0}
+_counters_lock = threading.Lock()
+
+
+class CodeRepair:
+    def __init__(self, kind: str, code: str, description: str):
+        self.kind = kind
+        self.code = code
+        self.description = description
+
+
+def classify_error(error: Exception) -> str:
+    """실행 예외 유형 분류 (고칠 수 없는 경우 unrecoverable)"""
+    message = str(error)
+    if isinstance(error, NameError):
+        return "missing_import"
+    if isinstance(error, KeyError) or "not in index" in message or "do not exist" in message:
+        return "unknown_column"
+    if "NA / NaN" in message or "boolean value of NA" in message or "containing NA" in message:
+        return "na_mask"
+    if isinstance(error, TypeError) and ("Invalid comparison between" in message or "not supported between instances of" in message):
+        return "type_mismatch"
+    return "unrecoverable"
+
+
+def _is_mask(node: ast.AST) -> bool:
+    if isinstance(node, (ast.Compare, ast.BoolOp)):
+        return True
+    if isinstance(node, ast.BinOp) and isinstance(node.op, (ast.BitAnd, ast.BitOr, ast.BitXor)):
+        return True
+    if isinstance(node, ast.UnaryOp) and isinstance(node.op, ast.Invert):
+        return True
+    return isinstance(node, ast.Call) and isinstance(node.func, ast.Attribute) and node.func.attr in MASK_METHODS
+
+
+class _MaskFiller(ast.NodeTransformer):
+    """x[mask] / x.loc[mask, ...]의 마스크를 _fill_na_mask(mask)로 감쌈"""
+
+    def __init__(self):
+        self.changed = False
+
+    def _wrap(self, node: ast.AST) -> ast.AST:
+        self.changed = True
+        return ast.Call(func=ast.Name(id="_fill_na_mask", ctx=ast.Load()), args=[node], keywords=[])
+
+    def visit_Subscript(self, node: ast.Subscript):
+        self.generic_visit(node)
+        if isinstance(node.slice, ast.Tuple) and node.slice.elts and _is_mask(node.slice.elts[0]):
+            node.slice.elts[0] = self._wrap(node.slice.elts[0])
+        elif _is_mask(node.slice):
+            node.slice = self._wrap(node.slice)
+        return node
+
+
+class CodeRepairer:
+    """데이터셋 컬럼/dtype을 기준으로 실행 오류를 분류하고 고침"""
+
+    def __init__(self, df: pd.DataFrame):
+        self.columns = [str(column) for column in df.columns]
+        self.numeric_columns: Set[str] = set()
+        self.text_columns: Set[str] = set()
+        for column in df.columns:
+            dtype = df[column].dtype
+            if pd.api.types.is_bool_dtype(dtype):
+                continue
+            if pd.api.types.is_numeric_dtype(dtype):
+                self.numeric_columns.add(str(column))
+            elif isinstance(dtype, pd.CategoricalDtype):
+                if pd.api.types.is_numeric_dtype(dtype.categories.dtype):
+                    self.numeric_columns.add(str(column))
+                else:
+                    self.text_columns.add(str(column))
+            elif pd.api.types.is_object_dtype(dtype) or pd.api.types.is_string_dtype(dtype):
+                self.text_columns.add(str(column))
+        # 날짜 컬럼 -> 연도 컬럼 (날짜 컬럼을 연도 숫자와 비교한 경우)
+        self.year_columns: Dict[str, str] = {
+            date_column: year_column
+            for date_column, (year_column, _) in DATE_COLUMNS.items()
+            if date_column in self.columns and year_column in self.columns
+        }
+
+    # 예외 발생 시
+
+    def repair(self, code: str, error: Exception) -> Optional[CodeRepair]:
+        """예외를 분류하고 고친 코드 반환, 고칠 수 없으면 None"""
+        kind = classify_error(error)
+        try:
+            tree = ast.parse(code)
+        except SyntaxError:
+            tree = None
+        repair = None
+        if tree is not None:
+            if kind == "na_mask":
+                repair = self._fill_na_masks(tree)
+            elif kind == "type_mismatch":
+                repair = self._coerce_comparisons(tree)
+            elif kind == "unknown_column":
+                repair = self._replace_unknown_columns(tree, str(error))
+            elif kind == "missing_import":
+                repair = self._add_import(code, error)
+        with _counters_lock:
+            _counters[repair.kind if repair else "unrecoverable"] += 1
+        return repair
+
+    def repair_empty(self, code: str) -> Optional[CodeRepair]:
+        """빈 결과를 낸 코드에서 타입 불일치/㈜(주) 표기를 고친 코드 (고칠 것이 없으면 None)"""
+        try:
+            tree = ast.parse(code)
+        except SyntaxError:
+            return None
+        return self._coerce_comparisons(tree) or self._swap_corp_marks(tree)
+
+    @staticmethod
+    def record(kind: str):
+        """빈 결과 수정이 실제로 결과를 찾은 경우 통계 반영"""
+        with _counters_lock:
+            _counters[kind] += 1
+
+    # 유형별 수정
+
+    def _fill_na_masks(self, tree: ast.Module) -> Optional[CodeRepair]:
+        filler = _MaskFiller()
+        tree = filler.visit(tree)
+        if not filler.changed:
+            return None
+        tree.body = ast.parse(FILL_NA_MASK_SOURCE).body + tree.body
+        return CodeRepair("na_mask", ast.unparse(ast.fix_missing_locations(tree)), "filled NA values in boolean masks with False")
+
+    def _column_of(self, node: ast.AST) -> Optional[str]:
+        """x['col'] 형태의 컬럼 이름 (데이터셋 컬럼만)"""
+        if isinstance(node, ast.Subscript) and isinstance(node.slice, ast.Constant) and node.slice.value in self.columns:
+            return node.slice.value
+        return None
+
+    def _coerce(self, column: str, value: ast.AST) -> Optional[ast.AST]:
+        """컬럼 dtype에 맞게 변환한 상수 (변환할 필요가 없으면 None)"""
+        if not isinstance(value, ast.Constant) or isinstance(value.value, bool):
+            return None
+        constant = value.value
+        if column in self.numeric_columns and isinstance(constant, str):
+            text = constant.strip().replace(",", "")
+            if re.fullmatch(r"-?\d+", text):
+                return ast.Constant(value=int(text))
+            if re.fullmatch(r"-?\d+\.\d*", text):
+                return ast.Constant(value=float(text))
+        if column in self.text_columns and isinstance(constant, (int, float)):
+            return ast.Constant(value=str(constant))
+        return None
+
+    def _coerce_comparisons(self, tree: ast.Module) -> Optional[CodeRepair]:
+        changes = []
+        for node in ast.walk(tree):
+            if isinstance(node, ast.Compare):
+                operands = [node.left, *node.comparators]
+                columns = [self._column_of(operand) for operand in operands]
+                for index, operand in enumerate(operands):
+                    # 날짜 컬럼과 연도 숫자 비교 -> 연도 컬럼으로 비교
+                    if columns[index] in self.year_columns and any(
+                        isinstance(other, ast.Constant) and isinstance(other.value, int) and 1900 <= other.value <= 2100
+                        for other in operands
+                    ):
+                        operand.slice = ast.Constant(value=self.year_columns[columns[index]])
+                        changes.append(f"{columns[index]} -> {operand.slice.value}")
+                        continue
+                    column = next((name for name in columns if name), None)
+                    coerced = self._coerce(column, operand) if column and columns[index] is None else None
+                    if coerced is not None:
+                        if index == 0:
+                            node.left = coerced
+                        else:
+                            node.comparators[index - 1] = coerced
+                        changes.append(f"{column}: {operand.value!r} -> {coerced.value!r}")
+            elif isinstance(node, ast.Call) and isinstance(node.func, ast.Attribute) and node.func.attr in {"isin", "between"}:
+                column = self._column_of(node.func.value)
+                if column is None:
+                    continue
+                values = node.args[0].elts if node.func.attr == "isin" and node.args and isinstance(node.args[0], (ast.List, ast.Tuple, ast.Set)) else node.args
+                for index, value in enumerate(values):
+                    coerced = self._coerce(column, value)
+                    if coerced is not None:
+                        values[index] = coerced
+                        changes.append(f"{column}: {value.value!r} -> {coerced.value!r}")
+        if not changes:
+            return None
+        return CodeRepair("type_mismatch", ast.unparse(ast.fix_missing_locations(tree)), "matched comparison types to column dtypes (" + ", ".join(changes) + ")")
+
+    def _defined_names(self, tree: ast.Module) -> Set[str]:
+        """코드에서 새로 만드는 컬럼/키 이름 (없는 컬럼으로 보지 않음)"""
+        names = set()
+        for node in ast.walk(tree):
+            if isinstance(node, ast.Subscript) and isinstance(node.ctx, ast.Store) and isinstance(node.slice, ast.Constant):
+                names.add(node.slice.value)
+            elif isinstance(node, ast.Dict):
+                names.update(value.value for value in node.values if isinstance(value, ast.Constant))
+                names.update(key.value for key in node.keys if isinstance(key, ast.Constant))
+            elif isinstance(node, ast.keyword) and node.arg:
+                names.add(node.arg)
+                if node.arg == "name" and isinstance(node.value, ast.Constant):
+                    names.add(node.value.value)
+        return names
+
+    def _closest_column(self, name: str) -> Optional[str]:
+        if f"정제_{name}" in self.columns:
+            return f"정제_{name}"
+        matches = [column for column in self.columns if column.endswith(name) or name.endswith(column)]
+        if len(matches) == 1:
+            return matches[0]
+        close = difflib.get_close_matches(name, self.columns, n=1, cutoff=0.6)
+        return close[0] if close else None
+
+    def _replace_unknown_columns(self, tree: ast.Module, message: str) -> Optional[CodeRepair]:
+        constants = {
+            node.value for node in ast.walk(tree) if isinstance(node, ast.Constant) and isinstance(node.value, str)
+        }
+        defined = self._defined_names(tree)
+        replacements = {}
+        for name in re.findall(r"'([^']+)'", message):
+            if name in self.columns or name in defined or name not in constants:
+                continue
+            column = self._closest_column(name)
+            if column is None:
+                return None
+            replacements[name] = column
+        if not replacements:
+            return None
+        for node in ast.walk(tree):
+            if isinstance(node, ast.Constant) and node.value in replacements:
+                node.value = replacements[node.value]
+        description = ", ".join(f"{name} -> {column}" for name, column in replacements.items())
+        return CodeRepair("unknown_column", ast.unparse(tree), f"replaced unknown columns ({description})")
+
+    def _add_import(self, code: str, error: Exception) -> Optional[CodeRepair]:
+        match = re.search(r"name '(\w+)' is not defined", str(error))
+        statement = KNOWN_IMPORTS.get(match.group(1)) if match else None
+        if statement is None:
+            return None
+        return CodeRepair("missing_import", f"{statement}\n{code}", f"added `{statement}`")
+
+    def _swap_corp_marks(self, tree: ast.Module) -> Optional[CodeRepair]:
+        changed = False
+        for node in ast.walk(tree):
+            if isinstance(node, ast.Constant) and isinstance(node.value, str):
+                for mark, other in (CORP_MARKS, CORP_MARKS[::-1]):
+                    if mark in node.value:
+                        node.value = node.value.replace(mark, other)
+                        changed = True
+                        break
+        if not changed:
+            return None
+        return CodeRepair("corp_mark", ast.unparse(tree), "swapped ㈜ / (주) notation")
+
+
+def is_empty_result(value) -> bool:
+    """다시 시도해 볼 만한 빈 결과 (행이 없는 DataFrame/Series, 개수 0)"""
+    if isinstance(value, (pd.DataFrame, pd.Series)):
+        return len(value) == 0
+    return isinstance(value, (int, np.integer)) and not isinstance(value, bool) and value == 0
+
+
+def get_stats():
+    """자동 수정 유형별 횟수"""
+    with _counters_lock:
+        return dict(_counters)
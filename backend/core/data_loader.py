@@ -0,0 +1,153 @@
+"""
+데이터셋 로더 모듈
+- 원본 CSV를 한 번만 파싱하여 Arrow(Feather v2) 스냅샷으로 저장
+- 스냅샷은 원본 파일 해시로 식별하며, 이후 시작 시에는 메모리 맵으로 로드
+- 원본 CSV가 바뀐 경우에만 CSV를 다시 파싱
+- 스냅샷에는 스키마 변환(core.schema)이 적용된 DataFrame을 저장
+"""
+import os
+import json
+import hashlib
+import time
+import pandas as pd
+from core.schema import SCHEMA_VERSION, compact_factory_dataframe
+
+# pyarrow가 없으면 스냅샷 없이 CSV를 직접 읽음
+try:
+    import pyarrow as pa
+    import pyarrow.feather as feather
+except ImportError:
+    pa = None
+    feather = None
+
+
+# 스냅샷 포맷이 바뀌면 올려서 기존 스냅샷을 무효화
+SNAPSHOT_FORMAT_VERSION = 1
+DEFAULT_CACHE_DIR = os.getenv("DATASET_CACHE_DIR", "data/.cache")
+HASH_CHUNK_SIZE = 1024 * 1024
+
+
+def _hash_file(path: str) -> str:
+    """파일 내용의 해시 계산"""
+    hasher = hashlib.blake2b(digest_size=16)
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(HASH_CHUNK_SIZE), b""):
+            hasher.update(chunk)
+    return hasher.hexdigest()
+
+
+def get_dataset_version(csv_path: str, cache_dir: str = DEFAULT_CACHE_DIR) -> str:
+    """
+    원본 CSV의 해시(데이터셋 버전)를 반환합니다.
+    파일 크기/수정 시각이 같으면 사이드카 파일에 저장된 해시를 재사용하여 재계산을 피합니다.
+    """
+    stat = os.stat(csv_path)
+    sidecar_path = os.path.join(cache_dir, os.path.basename(csv_path) + ".hash.json")
+    stat_key = {"size": stat.st_size, "mtime_ns": stat.st_mtime_ns}
+
+    try:
+        with open(sidecar_path, "r", encoding="utf-8") as f:
+            cached = json.load(f)
+        if cached.get("stat") == stat_key:
+            return cached["hash"]
+    except (OSError, ValueError, KeyError):
+        pass
+
+    digest = _hash_file(csv_path)
+    try:
+        os.makedirs(cache_dir, exist_ok=True)
+        with open(sidecar_path, "w", encoding="utf-8") as f:
+            json.dump({"stat": stat_key, "hash": digest}, f)
+    except OSError as e:
+        print(f"⚠️ 데이터셋 해시 캐시 저장 실패: {e}")
+    return digest
+
+
+def _snapshot_stem(csv_path: str) -> str:
+    return os.path.splitext(os.path.basename(csv_path))[0]
+
+
+def get_snapshot_path(csv_path: str, cache_dir: str = DEFAULT_CACHE_DIR) -> str:
+    """원본 CSV에 대응하는 스냅샷 경로"""
+    version = get_dataset_version(csv_path, cache_dir)
+    stem = _snapshot_stem(csv_path)
+    return os.path.join(cache_dir, f"{stem}.v{SNAPSHOT_FORMAT_VERSION}s{SCHEMA_VERSION}.{version}.arrow")
+
+
+def _normalize_object_columns(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    숫자와 문자열이 섞인 object 컬럼을 문자열로 통일
+    (Arrow는 한 컬럼에 한 타입만 허용하므로 CSV/스냅샷 경로의 결과를 동일하게 맞춤)
+    """
+    for column in df.columns[df.dtypes == object]:
+        values = df[column]
+        non_null = values.dropna()
+        if not non_null.map(type).eq(str).all():
+            df[column] = values.where(values.isna(), values.astype(str))
+    return df
+
+
+def _read_csv(csv_path: str) -> pd.DataFrame:
+    df = _normalize_object_columns(pd.read_csv(csv_path, low_memory=False))
+    return compact_factory_dataframe(df)
+
+
+def _write_snapshot(df: pd.DataFrame, snapshot_path: str, stem: str):
+    """Arrow 스냅샷 저장 (임시 파일에 쓴 뒤 교체하여 부분 기록 방지)"""
+    directory = os.path.dirname(snapshot_path) or "."
+    os.makedirs(directory, exist_ok=True)
+    tmp_path = f"{snapshot_path}.{os.getpid()}.tmp"
+    # 메모리 맵으로 읽을 수 있도록 압축하지 않음
+    feather.write_feather(df, tmp_path, compression="uncompressed")
+    os.replace(tmp_path, snapshot_path)
+
+    # 같은 원본의 이전 스냅샷 정리
+    for name in os.listdir(directory):
+        old_path = os.path.join(directory, name)
+        if name.startswith(f"{stem}.v") and name.endswith(".arrow") and old_path != snapshot_path:
+            try:
+                os.remove(old_path)
+            except OSError:
+                pass
+
+
+def _read_snapshot(snapshot_path: str) -> pd.DataFrame:
+    """
+    메모리 맵으로 Arrow 스냅샷 로드
+    - split_blocks로 컬럼별 블록을 유지하여 null 없는 숫자/날짜 컬럼은 메모리 맵 버퍼를 복사 없이 참조
+      (self_destruct는 변환 후 Arrow 버퍼를 해제하므로 사용하지 않음, 페이지 캐시를 프로세스 간 공유)
+    - 문자열(object) 컬럼은 파이썬 객체로 변환되므로 파싱 시간만 줄어듦
+    """
+    table = feather.read_table(snapshot_path, memory_map=True)
+    return table.to_pandas(split_blocks=True)
+
+
+def load_factory_dataframe(csv_path: str, cache_dir: str = DEFAULT_CACHE_DIR) -> pd.DataFrame:
+    """
+    공장 데이터셋 로드
+    - 유효한 스냅샷이 있으면 메모리 맵으로 로드
+    - 없거나 원본이 바뀌었으면 CSV를 파싱하고 스냅샷을 새로 생성
+    """
+    started = time.perf_counter()
+
+    if feather is None:
+        print("⚠️ pyarrow가 없어 CSV를 직접 로드합니다.")
+        return _read_csv(csv_path)
+
+    snapshot_path = get_snapshot_path(csv_path, cache_dir)
+    if os.path.exists(snapshot_path):
+        try:
+            df = _read_snapshot(snapshot_path)
+            print(f"📦 데이터셋 스냅샷 로드 ({(time.perf_counter() - started) * 1000:.0f}ms): {snapshot_path}")
+            return df
+        except (OSError, pa.ArrowInvalid) as e:
+            print(f"⚠️ 스냅샷 로드 실패, CSV로 대체: {e}")
+
+    df = _read_csv(csv_path)
+    try:
+        _write_snapshot(df, snapshot_path, _snapshot_stem(csv_path))
+        print(f"💾 데이터셋 스냅샷 생성: {snapshot_path}")
+    except (OSError, pa.ArrowException) as e:
+        print(f"⚠️ 스냅샷 저장 실패: {e}")
+    print(f"📄 CSV 로드 완료 ({(time.perf_counter() - started) * 1000:.0f}ms): {csv_path}")
+    return df
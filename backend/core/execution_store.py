@@ -1,56 +1,335 @@
 """
 실행 결과 저장소
 """
+import os
+import json
 import uuid
+import contextvars
 import threading
 import time
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
 from typing import Optional
-from core.utils import serialize_execution_output
+import pandas as pd
+from core.utils import serialize_execution_output, infer_visualization_type, result_table
+from core.result_rows import encode_frame, decode_frame
+from core.visualization_rules import recommend_visualization
+from core.shared_state import SharedSqlite
+
+
+VISUALIZATION_WORKERS = int(os.getenv("VISUALIZATION_WORKERS", "4"))
+EXECUTION_TTL_SECONDS = float(os.getenv("EXECUTION_TTL_SECONDS", str(6 * 60 * 60)))
+EXECUTION_MAX_ENTRIES = int(os.getenv("EXECUTION_MAX_ENTRIES", "5000"))
+EXECUTION_MAX_BYTES = int(os.getenv("EXECUTION_MAX_BYTES", str(128 * 1024 * 1024)))
+EXECUTION_FRAME_CACHE_ENTRIES = int(os.getenv("EXECUTION_FRAME_CACHE_ENTRIES", "4"))  # 행 조회용으로 복원해 둘 전체 결과 수
+
+
+def dump_payload(payload: dict) -> str:
+    """레코드 JSON 직렬화 (크기 계산과 공유 저장소 기록에 사용)"""
+    return json.dumps(payload, ensure_ascii=False, default=str)
 
 
 class ExecutionResultStore:
     """
     세션별 실행 결과를 저장하는 스토어
     - key: execution_id
-    - value: { execution_id, session_id, code, result, created_at }
+    - value: { execution_id, session_id, code, result, visualization_status, created_at }
     - 별도 인덱스로 session_id -> [execution_id, ...] 관리
+    - 시각화 추천은 규칙으로 즉시 결정하고, 애매한 결과만 LLM으로 백그라운드 계산
+      visualization_status: pending -> ready (추론 불가/실패 시 none)
+    - 최대 보관 시간(ttl_seconds), 최대 개수(max_entries), 직렬화 크기 예산(max_bytes)을 넘으면 축출
+      _store는 조회 순서(LRU), _created는 생성 순서(TTL)를 유지하여 축출은 O(1)
+    - shared_db가 있으면 레코드를 공유 SQLite에도 기록하여 다른 서버 워커에서도 조회 가능
+      조회 시 공유 저장소가 기준이고 메모리는 캐시로만 사용 (다른 워커의 초기화/삭제/축출이 바로 보이도록),
+      공유 저장소는 생성 순서로 축출
+    - 표 형태 결과는 미리보기 외에 전체 결과를 컬럼형 바이트(frame)로 함께 저장하여 행 조회(get_frame)에 사용
+      크기 예산에는 frame 크기도 포함, 최근 조회한 frame은 복원된 DataFrame으로 몇 개만 캐시
     """
 
-    def __init__(self, model=None):
-        self._store = {}
+    def __init__(
+        self,
+        model=None,
+        visualization_workers: int = VISUALIZATION_WORKERS,
+        ttl_seconds: float = EXECUTION_TTL_SECONDS,
+        max_entries: int = EXECUTION_MAX_ENTRIES,
+        max_bytes: int = EXECUTION_MAX_BYTES,
+        shared_db: Optional[SharedSqlite] = None,
+    ):
+        self._store = OrderedDict()  # execution_id -> payload (LRU 순서)
+        self._created = OrderedDict()  # execution_id -> created_at (생성 순서)
+        self._sizes = {}  # execution_id -> 직렬화 크기 (frame 포함)
+        self._frames = {}  # execution_id -> 전체 결과 컬럼형 바이트
+        self._frame_cache = OrderedDict()  # execution_id -> 복원된 DataFrame (LRU)
+        self._bytes = 0
         self._session_index = {}  # session_id -> set(execution_id)
+        self._pending = {}  # execution_id -> Future (시각화 추론 중)
         self._lock = threading.RLock()
         self.model = model
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.evictions = {"expired": 0, "max_entries": 0, "max_bytes": 0}
+        self._visualizer = ThreadPoolExecutor(max_workers=visualization_workers, thread_name_prefix="visualization")
+        self.shared_db = shared_db
+        if shared_db is not None:
+            shared_db.executescript(
+                """
+                CREATE TABLE IF NOT EXISTS executions (
+                    execution_id TEXT PRIMARY KEY,
+                    session_id TEXT NOT NULL,
+                    created_at REAL NOT NULL,
+                    size INTEGER NOT NULL,
+                    payload TEXT NOT NULL
+                );
+                CREATE INDEX IF NOT EXISTS executions_session ON executions (session_id);
+                CREATE INDEX IF NOT EXISTS executions_created ON executions (created_at);
+                CREATE TABLE IF NOT EXISTS execution_frames (
+                    execution_id TEXT PRIMARY KEY,
+                    frame BLOB NOT NULL
+                );
+                """
+            )
 
     def save(self, session_id: str, code: Optional[str], output, question: str = ""):
         execution_id = str(uuid.uuid4())
+        result = serialize_execution_output(output)
+        # 규칙으로 결정되면 바로 반영하고, 애매한 결과만 백그라운드 LLM 추천
+        visualization_meta = recommend_visualization(question, output)
+        if visualization_meta:
+            result["visualization"] = visualization_meta
+        # LLM 시각화 추천은 표 형태(DataFrame/Series) 결과에만 수행
+        needs_visualization = (
+            visualization_meta is None
+            and bool(question and self.model)
+            and isinstance(output, (pd.DataFrame, pd.Series))
+        )
+        # 전체 결과는 컬럼형으로 저장 (/api/execution/{id}/rows에서 페이지 조회)
+        table = result_table(output)
+        frame = encode_frame(table) if table is not None and len(table) else None
         payload = {
             "execution_id": execution_id,
             "session_id": session_id,
             "code": code,
-            "result": serialize_execution_output(output, question, self.model),
+            "result": result,
+            "full_rows": frame is not None,
+            "visualization_status": "ready" if visualization_meta else ("pending" if needs_visualization else "none"),
             "created_at": time.time()
         }
+        encoded = dump_payload(payload)
+        size = len(encoded.encode("utf-8")) + len(frame or b"")
+        if self.shared_db is not None:
+            self._save_shared(payload, encoded, size, frame)
         with self._lock:
             self._store[execution_id] = payload
+            self._created[execution_id] = payload["created_at"]
+            self._sizes[execution_id] = size
+            self._bytes += size
+            if frame is not None:
+                self._frames[execution_id] = frame
             # 세션별 인덱스에 execution_id 등록
             if session_id not in self._session_index:
                 self._session_index[session_id] = set()
             self._session_index[session_id].add(execution_id)
+            self._evict(payload["created_at"])
+
+            if needs_visualization:
+                # 요청 컨텍스트를 넘겨 시각화 추천 LLM 사용량도 요청한 세션에 집계
+                self._pending[execution_id] = self._visualizer.submit(
+                    contextvars.copy_context().run, self._visualize, execution_id, question, output
+                )
         return execution_id
 
+    def _visualize(self, execution_id: str, question: str, output):
+        """백그라운드에서 시각화 타입을 추론해 레코드에 반영 (Future 완료 시점에 반영도 끝남)"""
+        visualization_meta = infer_visualization_type(question, output, self.model, use_rules=False)
+        with self._lock:
+            self._pending.pop(execution_id, None)
+            record = self._store.get(execution_id)
+            if record is None:
+                return
+            if visualization_meta:
+                # 응답 직렬화 중인 dict를 건드리지 않도록 result를 통째로 교체
+                record["result"] = {**record["result"], "visualization": visualization_meta}
+                record["visualization_status"] = "ready"
+            else:
+                record["visualization_status"] = "none"
+            encoded = dump_payload(record)
+            size = len(encoded.encode("utf-8")) + len(self._frames.get(execution_id) or b"")
+            self._bytes += size - self._sizes[execution_id]
+            self._sizes[execution_id] = size
+        if self.shared_db is not None:
+            with self.shared_db.cursor() as cur:
+                cur.execute(
+                    "UPDATE executions SET payload = ?, size = ? WHERE execution_id = ?",
+                    (encoded, size, execution_id),
+                )
+
+    def _save_shared(self, payload: dict, encoded: str, size: int, frame: Optional[bytes] = None):
+        """공유 저장소에 기록하고 만료/개수/크기 초과분을 생성 순서로 축출 (방금 기록한 항목은 유지)"""
+        with self.shared_db.cursor() as cur:
+            cur.execute(
+                "INSERT OR REPLACE INTO executions (execution_id, session_id, created_at, size, payload) VALUES (?, ?, ?, ?, ?)",
+                (payload["execution_id"], payload["session_id"], payload["created_at"], size, encoded),
+            )
+            if frame is not None:
+                cur.execute(
+                    "INSERT OR REPLACE INTO execution_frames (execution_id, frame) VALUES (?, ?)",
+                    (payload["execution_id"], frame),
+                )
+            cur.execute(
+                "DELETE FROM executions WHERE created_at <= ? AND execution_id != ?",
+                (payload["created_at"] - self.ttl_seconds, payload["execution_id"]),
+            )
+            cur.execute(
+                "DELETE FROM executions WHERE execution_id IN (SELECT execution_id FROM executions ORDER BY created_at DESC LIMIT -1 OFFSET ?)",
+                (max(self.max_entries, 1),),
+            )
+            cur.execute("SELECT COALESCE(SUM(size), 0) FROM executions")
+            overflow = cur.fetchone()[0] - self.max_bytes
+            if overflow > 0:
+                cur.execute("SELECT execution_id, size FROM executions ORDER BY created_at")
+                expired = []
+                for execution_id, row_size in cur.fetchall()[:-1]:
+                    if overflow <= 0:
+                        break
+                    expired.append((execution_id,))
+                    overflow -= row_size
+                cur.executemany("DELETE FROM executions WHERE execution_id = ?", expired)
+            self._delete_orphan_frames(cur)
+
+    @staticmethod
+    def _delete_orphan_frames(cur):
+        cur.execute("DELETE FROM execution_frames WHERE execution_id NOT IN (SELECT execution_id FROM executions)")
+
+    def _get_shared(self, execution_id: str):
+        """
+        공유 저장소 기준 조회
+        - 공유 저장소에 없으면(다른 워커가 삭제/축출) 메모리 사본도 버림
+        - 메모리 사본은 기록된 크기가 같을 때만 그대로 사용하고, 다르면 공유 저장소의 레코드로 교체
+        """
+        with self.shared_db.cursor() as cur:
+            cur.execute("SELECT size, created_at FROM executions WHERE execution_id = ?", (execution_id,))
+            row = cur.fetchone()
+            expired = row is not None and time.time() - row[1] >= self.ttl_seconds
+            if expired:
+                cur.execute("DELETE FROM executions WHERE execution_id = ?", (execution_id,))
+                self._delete_orphan_frames(cur)
+            if row is None or expired:
+                with self._lock:
+                    if execution_id in self._store:
+                        self._remove(execution_id)
+                return None
+            size = row[0]
+            with self._lock:
+                record = self._store.get(execution_id)
+                if record is not None and self._sizes.get(execution_id) == size:
+                    self._store.move_to_end(execution_id)
+                    return record
+            cur.execute("SELECT payload FROM executions WHERE execution_id = ?", (execution_id,))
+            row = cur.fetchone()
+        if row is None:
+            return None
+        record = json.loads(row[0])
+        with self._lock:
+            if execution_id in self._store:
+                self._store[execution_id] = record
+                self._store.move_to_end(execution_id)
+                self._bytes += size - self._sizes[execution_id]
+                self._sizes[execution_id] = size
+        return record
+
+    def _remove(self, execution_id: str):
+        payload = self._store.pop(execution_id)
+        self._created.pop(execution_id, None)
+        self._bytes -= self._sizes.pop(execution_id, 0)
+        self._frames.pop(execution_id, None)
+        self._frame_cache.pop(execution_id, None)
+        exec_ids = self._session_index.get(payload["session_id"])
+        if exec_ids is not None:
+            exec_ids.discard(execution_id)
+            if not exec_ids:
+                del self._session_index[payload["session_id"]]
+
+    def _evict(self, now: float):
+        """만료된 항목을 오래된 순으로, 그다음 개수/크기 초과분을 LRU 순으로 축출 (가장 최근 항목은 유지)"""
+        while self._created:
+            execution_id, created_at = next(iter(self._created.items()))
+            if now - created_at < self.ttl_seconds:
+                break
+            self._remove(execution_id)
+            self.evictions["expired"] += 1
+        while len(self._store) > self.max_entries and len(self._store) > 1:
+            self._remove(next(iter(self._store)))
+            self.evictions["max_entries"] += 1
+        while self._bytes > self.max_bytes and len(self._store) > 1:
+            self._remove(next(iter(self._store)))
+            self.evictions["max_bytes"] += 1
+
     def get(self, execution_id: str):
+        """실행 결과 조회 (shared_db가 있으면 공유 저장소 기준, 만료/삭제된 결과는 None)"""
+        if self.shared_db is not None:
+            return self._get_shared(execution_id)
         with self._lock:
-            return self._store.get(execution_id)
+            record = self._store.get(execution_id)
+            if record is not None:
+                if time.time() - record["created_at"] >= self.ttl_seconds:
+                    self._remove(execution_id)
+                    self.evictions["expired"] += 1
+                    return None
+                self._store.move_to_end(execution_id)
+                return record
+        return None
+
+    def get_frame(self, execution_id: str) -> Optional[pd.DataFrame]:
+        """전체 결과 DataFrame (표 형태가 아니거나 없는 결과는 None, 호출한 쪽에서 수정하지 않음)"""
+        record = self.get(execution_id)
+        if not record or not record.get("full_rows"):
+            return None
+        with self._lock:
+            frame = self._frame_cache.get(execution_id)
+            if frame is not None:
+                self._frame_cache.move_to_end(execution_id)
+                return frame
+            data = self._frames.get(execution_id)
+        if data is None and self.shared_db is not None:
+            with self.shared_db.cursor() as cur:
+                cur.execute("SELECT frame FROM execution_frames WHERE execution_id = ?", (execution_id,))
+                row = cur.fetchone()
+            data = row[0] if row else None
+        if data is None:
+            return None
+        frame = decode_frame(data)
+        with self._lock:
+            self._frame_cache[execution_id] = frame
+            while len(self._frame_cache) > EXECUTION_FRAME_CACHE_ENTRIES:
+                self._frame_cache.popitem(last=False)
+        return frame
+
+    def get_pending_visualization(self, execution_id: str) -> Optional[Future]:
+        """시각화 추론이 진행 중이면 Future, 아니면 None"""
+        with self._lock:
+            return self._pending.get(execution_id)
 
     def clear_session(self, session_id: Optional[str] = None):
         """
         특정 session_id에 해당하는 execution 결과만 삭제하거나,
         session_id가 없으면 전체 실행 결과를 삭제.
         """
+        if self.shared_db is not None:
+            with self.shared_db.cursor() as cur:
+                if session_id is None:
+                    cur.execute("DELETE FROM executions")
+                else:
+                    cur.execute("DELETE FROM executions WHERE session_id = ?", (session_id,))
+                self._delete_orphan_frames(cur)
         with self._lock:
             if session_id is None:
                 self._store.clear()
+                self._created.clear()
+                self._sizes.clear()
+                self._frames.clear()
+                self._frame_cache.clear()
+                self._bytes = 0
                 self._session_index.clear()
                 return
 
@@ -58,7 +337,26 @@ class ExecutionResultStore:
             if not exec_ids:
                 return
 
-            for eid in exec_ids:
-                self._store.pop(eid, None)
-            self._session_index.pop(session_id, None)
+            for eid in list(exec_ids):
+                self._remove(eid)
 
+    def get_stats(self):
+        shared = None
+        if self.shared_db is not None:
+            with self.shared_db.cursor() as cur:
+                cur.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM executions")
+                entries, size = cur.fetchone()
+            shared = {"entries": entries, "bytes": size}
+        with self._lock:
+            self._evict(time.time())
+            return {
+                "entries": len(self._store),
+                "sessions": len(self._session_index),
+                "bytes": self._bytes,
+                "max_entries": self.max_entries,
+                "max_bytes": self.max_bytes,
+                "ttl_seconds": self.ttl_seconds,
+                "pending_visualizations": len(self._pending),
+                "evictions": dict(self.evictions),
+                "shared": shared,
+            }
@@ -0,0 +1,143 @@
+"""
+로컬 질문 분류기 모듈
+- 데이터셋 컬럼/값 어휘 사전과 문자 n-gram 나이브 베이즈 모델로 질문 유형을 먼저 판별
+- 확신도가 낮을 때만 LLM Router로 넘김
+- 대화 기록이 없는 첫 질문에만 사용 (후속 질문은 맥락이 필요하므로 LLM Router가 판단, core.router 참고)
+"""
+import os
+import math
+import threading
+from collections import Counter
+from typing import Iterable, Optional
+from core.question_cache import normalize_question
+
+
+DEFAULT_CONFIDENCE = float(os.getenv("FAST_ROUTER_CONFIDENCE", "0.95"))
+
+# 데이터셋 컬럼에서 나온 도메인 어휘 (부분 문자열로 매칭하므로 일반 문장에도 흔한 단어는 넣지 않음)
+# 예: 회사/기업("회사에 취업"), 외국인("외국인 비자"), 단지("단지 궁금해서"), 구별("구별하는 방법")
+DOMAIN_KEYWORDS = [
+    "공장", "업체", "업종", "종업원", "직원", "근로자", "외국인종업원", "외국인근로자",
+    "생산품", "원자재", "공장규모", "소기업", "중기업", "중견기업", "대기업",
+    "용지면적", "제조시설", "부대시설", "건축면적", "지식산업센터", "필지",
+    "관리번호", "등록일", "승인일", "용도지역", "지목", "산업단지",
+    "시군구", "자치구", "업종별", "규모별", "연도별", "년도별",
+]
+
+# 학습용 예시 질문
+SEED_EXAMPLES = {
+    "domain_specific": [
+        "서울에서 공장이 가장 많은 구는 어디야?",
+        "지난 20년간 서울에서 공장 수가 가장 많이 증가한 5개 구를 알려줘",
+        "새로 생긴 공장들이 요즘 어느 지역에 많이 몰려 있어?",
+        "금천구에서 규모가 가장 큰 회사는 어디야?",
+        "공장의 면적 대비 직원 수가 많은 공장 상위 5개를 알려줘",
+        "여성 직원 비율이 높은 공장은 어떤 업종이 많아?",
+        "반도체를 생산하는 곳은 몇 개야?",
+        "2020년에 등록된 공장 수는?",
+        "구별 업종 분포를 보여줘",
+        "종업원이 100명 이상인 곳의 비율은?",
+        "그 중에서 가장 큰 곳은 어디야?",
+        "상위 10개만 다시 보여줘",
+        "연도별 등록 추이를 알려줘",
+        "인구 대비 공장 수가 많은 구는?",
+        "원자재로 플라스틱을 쓰는 업체 목록",
+        "count the unique values of factories in seoul",
+        "how many factories are in gangnam",
+    ],
+    "general": [
+        "안녕하세요",
+        "고마워",
+        "대한민국의 수도는 어디야?",
+        "이 문장을 영어로 번역해줘",
+        "translate this sentence into korean",
+        "what is the capital of south korea",
+        "오늘 날씨 어때?",
+        "너는 누구야?",
+        "파이썬이 뭐야?",
+        "좋은 아침이에요",
+        "농담 하나 해줘",
+        "맛있는 점심 메뉴 추천해줘",
+        "hello",
+        "thank you",
+        "인공지능이란 무엇인가요?",
+        "세계에서 가장 높은 산은?",
+        "두 단어를 구별하는 방법을 알려줘",
+        "회사에 취업하려면 어떻게 해야 해?",
+        "외국인 비자 발급 절차 알려줘",
+        "단지 궁금해서 물어보는 거야",
+    ],
+}
+
+
+def _features(normalized: str) -> Counter:
+    features = Counter(normalized)
+    features.update(normalized[i:i + 2] for i in range(len(normalized) - 1))
+    features.update(normalized[i:i + 3] for i in range(len(normalized) - 2))
+    return features
+
+
+class FastRouteClassifier:
+    """
+    LLM Router 앞단의 로컬 분류기
+    - 어휘 사전에 걸리면 domain_specific
+    - 아니면 나이브 베이즈 확률이 confidence 이상일 때만 결정, 그 외에는 None(LLM으로 위임)
+    """
+
+    def __init__(self, vocabulary: Iterable[str] = (), confidence: float = DEFAULT_CONFIDENCE):
+        self.confidence = confidence
+        terms = {normalize_question(term) for term in [*DOMAIN_KEYWORDS, *vocabulary]}
+        self._lexicon = sorted((term for term in terms if len(term) >= 2), key=len, reverse=True)
+        self._train(SEED_EXAMPLES)
+        self._lock = threading.Lock()
+        self.counters = {"lexicon": 0, "model": 0, "llm": 0}
+
+    def _train(self, examples: dict):
+        self._labels = list(examples)
+        self._feature_counts = {}
+        self._totals = {}
+        total_docs = sum(len(texts) for texts in examples.values())
+        self._priors = {}
+        vocabulary = set()
+        for label, texts in examples.items():
+            counts = Counter()
+            for text in texts:
+                counts.update(_features(normalize_question(text)))
+            self._feature_counts[label] = counts
+            self._totals[label] = sum(counts.values())
+            self._priors[label] = math.log(len(texts) / total_docs)
+            vocabulary.update(counts)
+        self._vocabulary_size = len(vocabulary)
+
+    def _predict(self, normalized: str):
+        """(label, posterior) 반환"""
+        features = _features(normalized)
+        scores = {}
+        for label in self._labels:
+            counts = self._feature_counts[label]
+            denominator = self._totals[label] + self._vocabulary_size
+            score = self._priors[label]
+            for feature, count in features.items():
+                score += count * math.log((counts.get(feature, 0) + 1) / denominator)
+            scores[label] = score
+        best = max(scores, key=scores.get)
+        norm = sum(math.exp(score - scores[best]) for score in scores.values())
+        return best, 1.0 / norm
+
+    def classify(self, question: str) -> Optional[str]:
+        """질문 유형 반환 (확신이 없으면 None)"""
+        normalized = normalize_question(question)
+        if any(term in normalized for term in self._lexicon):
+            path, label = "lexicon", "domain_specific"
+        else:
+            label, probability = self._predict(normalized) if normalized else (None, 0.0)
+            path = "model" if label and probability >= self.confidence else "llm"
+            if path == "llm":
+                label = None
+        with self._lock:
+            self.counters[path] += 1
+        return label
+
+    def get_stats(self):
+        with self._lock:
+            return dict(self.counters)
@@ -0,0 +1,149 @@
+"""
+대화 히스토리 윈도우 모듈
+- Router / code_generator / Agent 프롬프트에 넣는 chat_history를 단계별 토큰 예산 안으로 제한
+- 최근 턴은 그대로 두고, 예산을 넘는 오래된 턴은 짧은 요약 메시지 하나로 대체
+- 토큰 수는 외부 토크나이저 없이 로컬 추정치 사용
+"""
+import os
+from typing import Callable, List, Sequence
+from langchain_core.chat_history import BaseChatMessageHistory
+from langchain_core.messages import AIMessage, BaseMessage, HumanMessage, SystemMessage
+from core.state import get_session_history
+
+
+# 단계별 히스토리 토큰 예산
+HISTORY_TOKEN_BUDGETS = {
+    "router": int(os.getenv("HISTORY_TOKENS_ROUTER", "600")),
+    "code_generator": int(os.getenv("HISTORY_TOKENS_CODE_GENERATOR", "2000")),
+    "agent": int(os.getenv("HISTORY_TOKENS_AGENT", "3000")),
+}
+# 오래된 턴 요약에 쓰는 토큰 예산
+HISTORY_SUMMARY_TOKENS = int(os.getenv("HISTORY_SUMMARY_TOKENS", "300"))
+# 요약 한 줄에 남길 최대 글자 수
+SUMMARY_LINE_CHARS = 80
+# 메시지마다 붙는 역할/구분자 토큰
+MESSAGE_OVERHEAD_TOKENS = 4
+
+# Router 출력처럼 요약에 남길 필요 없는 답변
+_ROUTE_LABELS = {"general", "domain_specific"}
+
+
+def estimate_tokens(text: str) -> int:
+    """
+    로컬 토큰 수 추정
+    - ASCII(영문/코드)는 약 4글자당 1토큰, 한글 등 비ASCII 문자는 글자당 1토큰으로 계산
+    """
+    if not text:
+        return 0
+    non_ascii = sum(1 for char in text if ord(char) > 127)
+    return non_ascii + (len(text) - non_ascii + 3) // 4
+
+
+def estimate_message_tokens(message: BaseMessage) -> int:
+    content = message.content if isinstance(message.content, str) else str(message.content)
+    return estimate_tokens(content) + MESSAGE_OVERHEAD_TOKENS
+
+
+def _summary_line(message: BaseMessage):
+    """요약에 넣을 한 줄 (질문과 최종 답변만, 라우팅 결과/코드는 제외)"""
+    content = message.content if isinstance(message.content, str) else str(message.content)
+    content = " ".join(content.split())
+    if not content:
+        return None
+    if isinstance(message, HumanMessage):
+        prefix = "사용자"
+    elif isinstance(message, AIMessage):
+        if content in _ROUTE_LABELS or "return_var" in content:
+            return None
+        prefix = "답변"
+    else:
+        return None
+    if len(content) > SUMMARY_LINE_CHARS:
+        content = content[:SUMMARY_LINE_CHARS] + "…"
+    return f"- {prefix}: {content}"
+
+
+def window_messages(messages: Sequence[BaseMessage], budget: int, summary_budget: int = HISTORY_SUMMARY_TOKENS) -> List[BaseMessage]:
+    """
+    토큰 예산 안의 최근 턴 + 오래된 턴 요약 반환
+    - 뒤에서부터 턴(사람 메시지로 시작) 단위로 예산이 찰 때까지 그대로 유지
+    - 마지막 턴 하나가 예산을 넘더라도 최근 턴은 항상 포함
+    - 잘린 앞부분은 최근 것부터 summary_budget까지 요약 줄로 압축
+    """
+    messages = list(messages)
+    cut = len(messages)
+    total = 0
+    pending = 0  # 아직 턴 시작(사람 메시지)을 만나지 않은 메시지들의 토큰
+    for index in range(len(messages) - 1, -1, -1):
+        pending += estimate_message_tokens(messages[index])
+        if not isinstance(messages[index], HumanMessage):
+            continue
+        if total + pending > budget and cut < len(messages):
+            break
+        total += pending
+        pending = 0
+        cut = index
+    else:
+        # 맨 앞에 사람 메시지 없이 남은 메시지도 예산 안이면 포함
+        if total + pending <= budget:
+            cut = 0
+
+    if cut <= 0:
+        return messages
+
+    lines = []
+    seen = set()
+    used = 0
+    for message in reversed(messages[:cut]):
+        line = _summary_line(message)
+        # Router/code_generator/Agent가 같은 질문을 각각 기록하므로 중복 제거
+        if line is None or line in seen:
+            continue
+        cost = estimate_tokens(line) + 1
+        if used + cost > summary_budget:
+            break
+        seen.add(line)
+        lines.append(line)
+        used += cost
+
+    recent = messages[cut:]
+    if not lines:
+        return recent
+    summary = SystemMessage(content="이전 대화 요약 (오래된 것부터):\n" + "\n".join(reversed(lines)))
+    return [summary, *recent]
+
+
+class WindowedChatMessageHistory(BaseChatMessageHistory):
+    """
+    세션 히스토리의 읽기 전용 윈도우 뷰
+    - messages: 토큰 예산으로 자른 히스토리 (요약 포함)
+    - 추가/삭제는 원본 히스토리에 그대로 위임
+    """
+
+    def __init__(self, history: BaseChatMessageHistory, budget: int, summary_budget: int = HISTORY_SUMMARY_TOKENS):
+        self.history = history
+        self.budget = budget
+        self.summary_budget = summary_budget
+
+    @property
+    def messages(self) -> List[BaseMessage]:
+        return window_messages(self.history.messages, self.budget, self.summary_budget)
+
+    def add_message(self, message: BaseMessage) -> None:
+        self.history.add_message(message)
+
+    def add_messages(self, messages: Sequence[BaseMessage]) -> None:
+        self.history.add_messages(messages)
+
+    def clear(self) -> None:
+        self.history.clear()
+
+
+def windowed_session_history(stage: str) -> Callable[[str], WindowedChatMessageHistory]:
+    """RunnableWithMessageHistory에 넘길 단계별 get_session_history"""
+    budget = HISTORY_TOKEN_BUDGETS[stage]
+
+    def get_windowed_session_history(session_id: str) -> WindowedChatMessageHistory:
+        return WindowedChatMessageHistory(get_session_history(session_id), budget)
+
+    return get_windowed_session_history
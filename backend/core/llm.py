@@ -0,0 +1,352 @@
+"""
+채팅 모델 팩토리 및 오프라인 기록/재생(replay) 모델
+- LLM_BACKEND=openai (기본): ChatOpenAI
+- LLM_BACKEND=record: ChatOpenAI로 응답하면서 호출마다 (역할, 단계, 질문, 응답, 지연 시간, 토큰 사용량)을 LLM_REPLAY_PATH(JSONL)에 기록
+- LLM_BACKEND=replay: OpenAI 없이 기록된 응답을 재생 (기록이 없는 질문은 역할별 기본 응답)
+  LLM_REPLAY_LATENCY_MS로 호출당 인위적 지연을 지정 ("recorded"면 기록된 지연 시간 사용)
+  토큰 사용량은 기록된 값, 없으면 로컬 추정치로 보고
+- 모든 백엔드에서 모델에 LLMCallHandler를 연결하여 호출별 시간/토큰 사용량을 단계별로 집계
+"""
+import os
+import re
+import json
+import time
+import asyncio
+import hashlib
+import threading
+from typing import Any, Dict, List, Optional, Tuple
+from langchain_core.callbacks import BaseCallbackHandler
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk, BaseMessage, HumanMessage, ToolMessage
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+from langchain_core.pydantic_v1 import Field
+from langchain_core.utils.function_calling import convert_to_openai_tool
+from core.tracing import observe, record_llm_usage
+from core.history_window import estimate_tokens, estimate_message_tokens
+
+
+LLM_BACKEND = os.getenv("LLM_BACKEND", "openai")
+LLM_MODEL_NAME = os.getenv("LLM_MODEL_NAME", "gpt-5.1-2025-11-13")
+LLM_REPLAY_PATH = os.getenv("LLM_REPLAY_PATH", os.path.join("data", "llm_replay.jsonl"))
+LLM_REPLAY_LATENCY_MS = os.getenv("LLM_REPLAY_LATENCY_MS", "0")  # 숫자(ms) 또는 "recorded"
+REPLAY_STREAM_CHUNK_CHARS = 8  # 재생 스트리밍 시 토큰 청크 길이
+
+# 프롬프트 문구로 호출 역할 판별 (router / code_generator / visualization, 나머지는 agent)
+ROLE_MARKERS = [
+    ("router", "classifies the type of question"),
+    ("code_generator", "generate Python Pandas Code"),
+    ("visualization", "data visualization analyst"),
+]
+QUESTION_PATTERNS = {
+    "router": re.compile(r"<Question>:\s*(.*)", re.S),
+    "code_generator": re.compile(r"<Question>:\s*(.*)", re.S),
+    "visualization": re.compile(r"User question:\s*(.*?)\n", re.S),
+}
+
+# 기록이 없을 때 코드 생성 기본 응답 (질문 해시로 선택하여 결과 캐시만 타지 않도록 분산)
+DEFAULT_REPLAY_CODES = [
+    "return_var = df.groupby('정제_시군구명', observed=True)['공장관리번호'].nunique().sort_values(ascending=False)",
+    "return_var = df.groupby('공장규모', observed=True)['공장관리번호'].nunique().sort_values(ascending=False)",
+    "return_var = df.groupby('정제_업종명', observed=True)['종업원합계'].sum().sort_values(ascending=False).head(20)",
+]
+
+_counters = {"replayed": 0, "defaulted": 0, "recorded": 0}
+_counters_lock = threading.Lock()
+
+
+def _count(key: str):
+    with _counters_lock:
+        _counters[key] += 1
+
+
+def _message_text(messages: List[BaseMessage]) -> str:
+    return "\n".join(str(m.content) for m in messages)
+
+
+def classify_call(messages: List[BaseMessage]) -> Tuple[str, int, str]:
+    """
+    모델 호출을 (역할, 단계, 질문)으로 분류
+    - 단계: 에이전트 호출에서 마지막 사용자 메시지 이후의 도구 결과 수 (다른 역할은 0)
+    """
+    text = _message_text(messages)
+    for role, marker in ROLE_MARKERS:
+        if marker in text:
+            match = QUESTION_PATTERNS[role].search(text)
+            return role, 0, match.group(1).strip() if match else ""
+    step = 0
+    question = ""
+    for message in reversed(messages):
+        if isinstance(message, HumanMessage):
+            question = str(message.content).strip()
+            break
+        if isinstance(message, ToolMessage):
+            step += 1
+    return "agent", step, question
+
+
+def message_to_record(message: BaseMessage) -> Dict[str, Any]:
+    """응답 메시지를 JSON으로 저장할 수 있는 형태로 변환"""
+    return {
+        "content": message.content if isinstance(message.content, str) else json.dumps(message.content, ensure_ascii=False),
+        "tool_calls": [
+            {"name": call["name"], "args": call["args"]}
+            for call in (getattr(message, "tool_calls", None) or [])
+        ],
+    }
+
+
+def extract_usage(response) -> Tuple[int, int]:
+    """LLMResult에서 (입력 토큰, 출력 토큰) 추출 (usage_metadata 우선, 없으면 OpenAI llm_output.token_usage)"""
+    if response.generations and response.generations[0]:
+        usage = getattr(getattr(response.generations[0][0], "message", None), "usage_metadata", None)
+        if usage:
+            return int(usage.get("input_tokens", 0)), int(usage.get("output_tokens", 0))
+    token_usage = (response.llm_output or {}).get("token_usage") or {}
+    return int(token_usage.get("prompt_tokens", 0)), int(token_usage.get("completion_tokens", 0))
+
+
+def load_recordings(path: str) -> Dict[Tuple[str, int, str], List[Dict[str, Any]]]:
+    """JSONL 기록 로드 ((역할, 단계, 질문)별 응답 목록, 같은 키가 여러 번이면 순서대로 돌아가며 재생)"""
+    recordings: Dict[Tuple[str, int, str], List[Dict[str, Any]]] = {}
+    if not path or not os.path.exists(path):
+        return recordings
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            entry = json.loads(line)
+            key = (entry["role"], int(entry.get("step", 0)), entry.get("question", "").strip())
+            recordings.setdefault(key, []).append(entry)
+    return recordings
+
+
+class ReplayRecorder(BaseCallbackHandler):
+    """ChatOpenAI 호출을 재생용 JSONL로 기록하는 콜백 (config의 callbacks=[]와 무관하게 모델에 직접 연결)"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._pending: Dict[Any, Tuple[str, int, str, float]] = {}
+        self._lock = threading.Lock()
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+    def on_chat_model_start(self, serialized, messages, *, run_id, **kwargs):
+        role, step, question = classify_call(messages[0])
+        with self._lock:
+            self._pending[run_id] = (role, step, question, time.perf_counter())
+
+    def on_llm_end(self, response, *, run_id, **kwargs):
+        with self._lock:
+            pending = self._pending.pop(run_id, None)
+        if pending is None or not response.generations or not response.generations[0]:
+            return
+        role, step, question, started = pending
+        input_tokens, output_tokens = extract_usage(response)
+        entry = {
+            "role": role,
+            "step": step,
+            "question": question,
+            **message_to_record(response.generations[0][0].message),
+            "latency_ms": round((time.perf_counter() - started) * 1000, 1),
+            "usage": {"input_tokens": input_tokens, "output_tokens": output_tokens},
+        }
+        # 여러 서버 워커가 같은 파일에 기록해도 줄 단위로 추가되도록 한 번에 write
+        line = json.dumps(entry, ensure_ascii=False) + "\n"
+        with self._lock, open(self.path, "a", encoding="utf-8") as f:
+            f.write(line)
+        _count("recorded")
+
+    def on_llm_error(self, error, *, run_id, **kwargs):
+        with self._lock:
+            self._pending.pop(run_id, None)
+
+
+class LLMCallHandler(BaseCallbackHandler):
+    """
+    LLM 호출 시간과 토큰 사용량을 역할별 단계(llm.router, llm.agent 등)로 기록하는 콜백 (모델에 직접 연결)
+    - 에이전트 재시도/반복 턴, 코드 생성, 백그라운드 시각화 추천까지 호출마다 한 번씩 집계
+    """
+
+    run_inline = True  # 비동기 호출에서도 요청 컨텍스트(current_trace) 안에서 바로 실행
+
+    def __init__(self):
+        self._started: Dict[Any, Tuple[str, float]] = {}
+        self._lock = threading.Lock()
+
+    def on_chat_model_start(self, serialized, messages, *, run_id, **kwargs):
+        role, _, _ = classify_call(messages[0])
+        with self._lock:
+            self._started[run_id] = (role, time.perf_counter())
+
+    def _finish(self, run_id, response=None):
+        with self._lock:
+            started = self._started.pop(run_id, None)
+        if started is None:
+            return
+        role, started_at = started
+        stage = f"llm.{role}"
+        observe(stage, time.perf_counter() - started_at)
+        input_tokens, output_tokens = extract_usage(response) if response is not None else (0, 0)
+        record_llm_usage(stage, input_tokens, output_tokens)
+
+    def on_llm_end(self, response, *, run_id, **kwargs):
+        self._finish(run_id, response)
+
+    def on_llm_error(self, error, *, run_id, **kwargs):
+        self._finish(run_id)
+
+
+class ReplayChatModel(BaseChatModel):
+    """
+    기록된 응답을 재생하는 채팅 모델 (부하 테스트/CI용)
+    - 라우터/코드 생성/시각화 추천/에이전트 호출을 프롬프트로 구분하여 응답
+    - 기록이 없으면 기본 응답: domain_specific, 기본 코드, bar_chart, 에이전트는 code_generator -> code_executor -> [DATA] 답변
+    """
+
+    recordings: Dict[Tuple[str, int, str], List[Dict[str, Any]]] = Field(default_factory=dict)
+    latency_ms: str = "0"
+    positions: Dict[Tuple[str, int, str], int] = Field(default_factory=dict)
+
+    @property
+    def _llm_type(self) -> str:
+        return "replay"
+
+    @classmethod
+    def from_path(cls, path: str, latency_ms: str = "0", callbacks=None) -> "ReplayChatModel":
+        return cls(recordings=load_recordings(path), latency_ms=str(latency_ms), callbacks=callbacks)
+
+    def bind_tools(self, tools, **kwargs):
+        return self.bind(tools=[convert_to_openai_tool(t) for t in tools], **kwargs)
+
+    def _next_recording(self, key) -> Optional[Dict[str, Any]]:
+        entries = self.recordings.get(key)
+        if not entries:
+            return None
+        with _counters_lock:
+            position = self.positions.get(key, 0)
+            self.positions[key] = position + 1
+        return entries[position % len(entries)]
+
+    def _default_response(self, role: str, step: int, question: str, messages: List[BaseMessage]) -> Dict[str, Any]:
+        if role == "router":
+            return {"content": json.dumps({"type": "domain_specific"})}
+        if role == "code_generator":
+            digest = int(hashlib.md5(question.encode("utf-8")).hexdigest(), 16)
+            code = DEFAULT_REPLAY_CODES[digest % len(DEFAULT_REPLAY_CODES)]
+            return {"content": json.dumps({"code": code}, ensure_ascii=False)}
+        if role == "visualization":
+            return {"content": json.dumps({"chart_type": "bar_chart"})}
+        last_output = str(messages[-1].content) if step else ""
+        if step == 0:
+            return {"tool_calls": [{"name": "code_generator", "args": {"input": question}}]}
+        if step == 1:
+            return {"tool_calls": [{"name": "code_executor", "args": {"input_code": last_output}}]}
+        return {"content": "[DATA] 조회 결과입니다.\n" + last_output[:200]}
+
+    def _respond(self, messages: List[BaseMessage]) -> Tuple[AIMessage, float]:
+        role, step, question = classify_call(messages)
+        entry = self._next_recording((role, step, question))
+        if entry is None:
+            entry = self._default_response(role, step, question, messages)
+            _count("defaulted")
+        else:
+            _count("replayed")
+        tool_calls = [
+            {"name": call["name"], "args": call["args"], "id": f"call_{os.urandom(8).hex()}"}
+            for call in entry.get("tool_calls") or []
+        ]
+        if self.latency_ms == "recorded":
+            delay = float(entry.get("latency_ms", 0)) / 1000
+        else:
+            delay = float(self.latency_ms) / 1000
+        content = entry.get("content", "")
+        usage = entry.get("usage") or {
+            "input_tokens": sum(estimate_message_tokens(m) for m in messages),
+            "output_tokens": estimate_tokens(content) + sum(estimate_tokens(json.dumps(call["args"], ensure_ascii=False)) for call in tool_calls),
+        }
+        usage_metadata = {
+            "input_tokens": usage["input_tokens"],
+            "output_tokens": usage["output_tokens"],
+            "total_tokens": usage["input_tokens"] + usage["output_tokens"],
+        }
+        return AIMessage(content=content, tool_calls=tool_calls, usage_metadata=usage_metadata), delay
+
+    @staticmethod
+    def _chunks(message: AIMessage):
+        # 토큰 사용량은 OpenAI 스트리밍(stream_usage)처럼 마지막 청크에만 실음
+        if message.tool_calls:
+            yield ChatGenerationChunk(message=AIMessageChunk(content="", usage_metadata=message.usage_metadata, tool_call_chunks=[
+                {"name": call["name"], "args": json.dumps(call["args"], ensure_ascii=False), "id": call["id"], "index": index}
+                for index, call in enumerate(message.tool_calls)
+            ]))
+            return
+        content = message.content
+        starts = list(range(0, len(content), REPLAY_STREAM_CHUNK_CHARS)) or [0]
+        for start in starts:
+            usage_metadata = message.usage_metadata if start == starts[-1] else None
+            yield ChatGenerationChunk(message=AIMessageChunk(content=content[start:start + REPLAY_STREAM_CHUNK_CHARS], usage_metadata=usage_metadata))
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs) -> ChatResult:
+        message, delay = self._respond(messages)
+        if delay:
+            time.sleep(delay)
+        return ChatResult(generations=[ChatGeneration(message=message)])
+
+    async def _agenerate(self, messages, stop=None, run_manager=None, **kwargs) -> ChatResult:
+        # 기본 구현은 스레드 풀에서 _generate를 실행하므로, 지연은 이벤트 루프에서 기다려 동시성 측정이 왜곡되지 않게 함
+        message, delay = self._respond(messages)
+        if delay:
+            await asyncio.sleep(delay)
+        return ChatResult(generations=[ChatGeneration(message=message)])
+
+    def _stream(self, messages, stop=None, run_manager=None, **kwargs):
+        message, delay = self._respond(messages)
+        if delay:
+            time.sleep(delay)
+        for chunk in self._chunks(message):
+            if run_manager:
+                run_manager.on_llm_new_token(chunk.message.content, chunk=chunk)
+            yield chunk
+
+    async def _astream(self, messages, stop=None, run_manager=None, **kwargs):
+        message, delay = self._respond(messages)
+        if delay:
+            await asyncio.sleep(delay)
+        for chunk in self._chunks(message):
+            if run_manager:
+                await run_manager.on_llm_new_token(chunk.message.content, chunk=chunk)
+            yield chunk
+
+
+def create_chat_model(backend: Optional[str] = None) -> BaseChatModel:
+    """LLM_BACKEND에 따라 채팅 모델 생성 (openai / record / replay)"""
+    backend = backend or LLM_BACKEND
+    callbacks = [LLMCallHandler()]  # 실행 config의 callbacks=[]와 무관하게 호출 시간/토큰 사용량 기록
+    if backend == "replay":
+        print(f"📼 LLM 재생 모드: {LLM_REPLAY_PATH} (지연 {LLM_REPLAY_LATENCY_MS}ms)")
+        return ReplayChatModel.from_path(LLM_REPLAY_PATH, LLM_REPLAY_LATENCY_MS, callbacks=callbacks)
+    if backend not in ("openai", "record"):
+        raise ValueError(f"Unknown LLM_BACKEND: {backend}")
+
+    from langchain_openai import ChatOpenAI
+    openai_api_key = os.getenv("OPENAI_API_KEY")
+    if not openai_api_key:
+        raise ValueError("OPENAI_API_KEY not found in environment variables")
+    if backend == "record":
+        print(f"⏺️ LLM 응답 기록: {LLM_REPLAY_PATH}")
+        callbacks.append(ReplayRecorder(LLM_REPLAY_PATH))
+    return ChatOpenAI(
+        openai_api_key=openai_api_key,
+        model=LLM_MODEL_NAME,
+        temperature=0,
+        stream_usage=True,  # 스트리밍 호출도 마지막 청크로 토큰 사용량을 받음
+        callbacks=callbacks,
+    )
+
+
+def get_stats():
+    """LLM 백엔드 및 재생/기록 횟수"""
+    with _counters_lock:
+        return {"backend": LLM_BACKEND, **_counters}
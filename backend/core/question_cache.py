@@ -0,0 +1,213 @@
+"""
+질문 유사도 캐시 모듈
+- 한국어 질문을 정규화한 뒤 문자 n-gram 코사인 유사도로 이전 질문과 매칭 (외부 임베딩 없음)
+- 임계값 이상으로 매칭되면 저장된 답변과 execution_id를 반환하여 LLM 파이프라인을 건너뜀
+- 숫자/엔티티/방향·비교 표현(많은↔적은, 상위↔하위, 이상↔이하, 부정 등)은 유사도와 별개로 정확히 일치해야 함
+  (긴 질문에서는 한두 글자 차이가 n-gram 유사도에 거의 반영되지 않아 반대 의미의 답변을 돌려줄 수 있음)
+"""
+import os
+import re
+import math
+import time
+import threading
+import unicodedata
+from collections import Counter, OrderedDict, defaultdict
+from typing import Optional, Iterable
+
+
+DEFAULT_THRESHOLD = float(os.getenv("QUESTION_CACHE_THRESHOLD", "0.9"))
+DEFAULT_MAX_ENTRIES = int(os.getenv("QUESTION_CACHE_MAX_ENTRIES", "1000"))
+DEFAULT_TTL_SECONDS = float(os.getenv("QUESTION_CACHE_TTL", "3600"))
+MIN_QUESTION_LENGTH = 4
+
+_NON_WORD = re.compile(r"[^\w]+")
+_NUMBER = re.compile(r"\d+")
+
+# 방향/비교/부정 표현 (이름 -> 정규화 전 소문자 질문에서 찾을 패턴, \b는 어절 경계)
+# 짧은 어간은 다른 단어의 일부로 잡히지 않도록 어절 시작이나 활용형으로 한정 (예: '면적'의 '적', '오늘'의 '늘')
+DIRECTION_PATTERNS = {
+    name: re.compile(pattern)
+    for name, pattern in {
+        "많": r"많",
+        "적": r"\b적(?:은|게|었|어|음|고|다)",
+        "크": r"\b(?:큰|크[게고기다])",
+        "작": r"\b작(?:은|게|고|다)",
+        "상위": r"상위|\btop\b",
+        "하위": r"하위|\bbottom\b",
+        "최대": r"최대|최고|\bmax",
+        "최소": r"최소|최저|\bmin",
+        "증가": r"증가|늘어|늘었|늘린|\bincrease",
+        "감소": r"감소|줄어|줄었|줄인|\bdecrease",
+        "높": r"높",
+        "낮": r"낮",
+        "이상": r"이상|초과|\bover\b|\bmore\b",
+        "이하": r"이하|미만|\bunder\b|\bless\b",
+        "오름": r"오름",
+        "내림": r"내림",
+        "제외": r"제외|빼고|\bexcept",
+        "포함": r"포함|\binclud",
+        "부정": r"않|없|\b안\b|\b안(?:되|돼|한|하)|\bnot\b|\bno\b",
+    }.items()
+}
+
+
+def normalize_question(text: str) -> str:
+    """NFKC 정규화, 소문자화, 공백/문장부호 제거"""
+    text = unicodedata.normalize("NFKC", text).lower()
+    return _NON_WORD.sub("", text).replace("_", "")
+
+
+def _ngrams(text: str) -> Counter:
+    grams = Counter(text[i:i + 2] for i in range(len(text) - 1))
+    grams.update(text[i:i + 3] for i in range(len(text) - 2))
+    return grams
+
+
+class QuestionCache:
+    """
+    문자 n-gram 역색인 기반 질문 캐시
+    - 숫자와 엔티티(구 이름, 업종명 등)가 다르면 유사도와 관계없이 다른 질문으로 취급
+    """
+
+    def __init__(
+        self,
+        entity_terms: Iterable[str] = (),
+        threshold: float = DEFAULT_THRESHOLD,
+        max_entries: int = DEFAULT_MAX_ENTRIES,
+        ttl_seconds: float = DEFAULT_TTL_SECONDS,
+    ):
+        self.threshold = threshold
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        # 긴 이름부터 찾아 짧은 이름이 긴 이름의 일부로 잘못 잡히지 않게 함
+        self._entity_terms = sorted({normalize_question(term) for term in entity_terms if term}, key=len, reverse=True)
+        self._entries = OrderedDict()  # entry_id -> dict
+        self._postings = defaultdict(set)  # gram -> {entry_id}
+        self._by_text = {}  # normalized question -> entry_id
+        self._next_id = 0
+        self._lock = threading.RLock()
+        self.hits = 0
+        self.misses = 0
+
+    def _signature(self, question: str, normalized: str):
+        """유사도와 별개로 정확히 일치해야 하는 숫자/엔티티/방향 표현 집합"""
+        entities = set()
+        remaining = normalized
+        for term in self._entity_terms:
+            if term and term in remaining:
+                entities.add(term)
+                remaining = remaining.replace(term, " ")
+        text = unicodedata.normalize("NFKC", question).lower()
+        directions = frozenset(name for name, pattern in DIRECTION_PATTERNS.items() if pattern.search(text))
+        return frozenset(_NUMBER.findall(normalized)), frozenset(entities), directions
+
+    def _remove(self, entry_id: int):
+        entry = self._entries.pop(entry_id, None)
+        if entry is None:
+            return
+        if self._by_text.get(entry["normalized"]) == entry_id:
+            del self._by_text[entry["normalized"]]
+        for gram in entry["grams"]:
+            ids = self._postings.get(gram)
+            if ids is not None:
+                ids.discard(entry_id)
+                if not ids:
+                    del self._postings[gram]
+
+    def _expire(self, now: float):
+        while self._entries:
+            entry_id, entry = next(iter(self._entries.items()))
+            if now - entry["created_at"] <= self.ttl_seconds and len(self._entries) <= self.max_entries:
+                break
+            self._remove(entry_id)
+
+    def lookup(self, question: str) -> Optional[dict]:
+        """유사한 질문이 있으면 {answer, execution_id, question, similarity} 반환"""
+        normalized = normalize_question(question)
+        if len(normalized) < MIN_QUESTION_LENGTH:
+            return None
+
+        grams = _ngrams(normalized)
+        norm = math.sqrt(sum(count * count for count in grams.values()))
+        signature = self._signature(question, normalized)
+
+        with self._lock:
+            self._expire(time.time())
+
+            dots = defaultdict(float)
+            for gram, count in grams.items():
+                for entry_id in self._postings.get(gram, ()):
+                    dots[entry_id] += count * self._entries[entry_id]["grams"][gram]
+
+            best_id, best_score = None, 0.0
+            for entry_id, dot in dots.items():
+                entry = self._entries[entry_id]
+                score = dot / (norm * entry["norm"])
+                if score > best_score and entry["signature"] == signature:
+                    best_id, best_score = entry_id, score
+
+            if best_id is None or best_score < self.threshold:
+                self.misses += 1
+                return None
+
+            self.hits += 1
+            entry = self._entries[best_id]
+            return {
+                "answer": entry["answer"],
+                "execution_id": entry["execution_id"],
+                "question": entry["question"],
+                "similarity": round(best_score, 4),
+            }
+
+    def store(self, question: str, answer: str, execution_id: Optional[str]):
+        normalized = normalize_question(question)
+        if len(normalized) < MIN_QUESTION_LENGTH:
+            return
+
+        grams = _ngrams(normalized)
+        entry = {
+            "question": question.strip(),
+            "normalized": normalized,
+            "answer": answer,
+            "execution_id": execution_id,
+            "grams": grams,
+            "norm": math.sqrt(sum(count * count for count in grams.values())),
+            "signature": self._signature(question, normalized),
+            "created_at": time.time(),
+        }
+
+        with self._lock:
+            # 같은 질문은 최신 답변으로 교체
+            if normalized in self._by_text:
+                self._remove(self._by_text[normalized])
+
+            entry_id = self._next_id
+            self._next_id += 1
+            self._entries[entry_id] = entry
+            self._by_text[normalized] = entry_id
+            for gram in grams:
+                self._postings[gram].add(entry_id)
+            self._expire(entry["created_at"])
+
+    def invalidate_execution(self, execution_id: str):
+        """삭제된 실행 결과를 가리키는 항목 제거"""
+        with self._lock:
+            for entry_id, entry in list(self._entries.items()):
+                if entry["execution_id"] == execution_id:
+                    self._remove(entry_id)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._postings.clear()
+            self._by_text.clear()
+
+    def get_stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            }
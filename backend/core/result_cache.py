@@ -0,0 +1,117 @@
+"""
+코드 실행 결과 캐시 모듈
+- key: 정규화된 코드(AST dump, 공백/주석 무시) + 데이터셋 버전의 해시
+- 바이트 예산 기준 LRU 축출, hit/miss 카운터 제공
+- 저장/조회 모두 복사본을 사용하여 실행 이후 결과 객체를 수정해도 캐시 값이 바뀌지 않음
+"""
+import os
+import ast
+import copy
+import sys
+import pickle
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import Optional
+import pandas as pd
+
+
+DEFAULT_MAX_BYTES = int(os.getenv("RESULT_CACHE_MAX_BYTES", str(64 * 1024 * 1024)))
+
+# 실행 시점마다 결과가 달라질 수 있는 호출이 있으면 캐시하지 않음
+NON_DETERMINISTIC_NAMES = {"now", "today", "utcnow", "random", "sample", "shuffle", "choice"}
+
+
+def estimate_size(value) -> int:
+    """캐시 값의 대략적인 바이트 크기"""
+    if isinstance(value, pd.DataFrame):
+        return int(value.memory_usage(deep=True).sum())
+    if isinstance(value, pd.Series):
+        return int(value.memory_usage(deep=True))
+    try:
+        return len(pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL))
+    except Exception:
+        return sys.getsizeof(value)
+
+
+def _copy_value(value):
+    if isinstance(value, (pd.DataFrame, pd.Series)):
+        return value.copy(deep=True)
+    try:
+        return copy.deepcopy(value)
+    except Exception:
+        return value
+
+
+class ExecutionResultCache:
+    """스레드 안전한 LRU 실행 결과 캐시"""
+
+    def __init__(self, dataset_version: str = "", max_bytes: int = DEFAULT_MAX_BYTES):
+        self.dataset_version = dataset_version
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()  # key -> (value, size)
+        self._bytes = 0
+        self._lock = threading.RLock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def make_key(self, code: str) -> Optional[str]:
+        """코드의 캐시 키 (파싱할 수 없거나 비결정적인 코드는 None)"""
+        try:
+            tree = ast.parse(code)
+        except SyntaxError:
+            return None
+
+        for node in ast.walk(tree):
+            name = getattr(node, "attr", None) or getattr(node, "id", None)
+            if name in NON_DETERMINISTIC_NAMES:
+                return None
+
+        normalized = ast.dump(tree, annotate_fields=False, include_attributes=False)
+        return hashlib.sha256(f"{self.dataset_version}\0{normalized}".encode("utf-8")).hexdigest()
+
+    def get(self, key: str):
+        """(hit 여부, 값) 반환"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return False, None
+            self._entries.move_to_end(key)
+            self.hits += 1
+        return True, _copy_value(entry[0])
+
+    def put(self, key: str, value):
+        size = estimate_size(value)
+        if size > self.max_bytes:
+            return
+        value = _copy_value(value)
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self._bytes -= previous[1]
+            self._entries[key] = (value, size)
+            self._bytes += size
+            while self._bytes > self.max_bytes and self._entries:
+                _, (_, evicted_size) = self._entries.popitem(last=False)
+                self._bytes -= evicted_size
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def get_stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            }
@@ -0,0 +1,146 @@
+"""
+전체 실행 결과 행 조회 모듈
+- 응답에는 미리보기(앞 50행)만 담고, 전체 결과는 컬럼형(Arrow IPC, zstd 압축)으로 저장
+- /api/execution/{id}/rows에서 offset/limit, 정렬, 컬럼 필터를 서버에서 적용하여 LLM 호출 없이 페이지 조회
+- pyarrow가 없거나 Arrow로 변환할 수 없는 결과(타입이 섞인 object 컬럼 등)는 pickle로 저장
+"""
+import io
+import os
+import pickle
+from typing import List, Optional, Tuple
+import pandas as pd
+from core.utils import dataframe_to_rows
+
+# pyarrow가 없으면 pickle로만 저장
+try:
+    import pyarrow as pa
+    import pyarrow.ipc as ipc
+except ImportError:
+    pa = None
+    ipc = None
+
+
+ROWS_DEFAULT_LIMIT = 100
+ROWS_MAX_LIMIT = int(os.getenv("ROWS_MAX_LIMIT", "1000"))
+FILTER_OPERATORS = ("eq", "ne", "gt", "gte", "lt", "lte", "contains")
+
+_ARROW = b"A"
+_PICKLE = b"P"
+
+
+def encode_frame(frame: pd.DataFrame) -> bytes:
+    """전체 결과를 컬럼형 바이트로 변환 (첫 바이트로 포맷 구분, 인덱스는 미리보기와 같이 버림)"""
+    frame = frame.reset_index(drop=True)
+    frame.columns = [str(column) for column in frame.columns]
+    if pa is not None:
+        try:
+            table = pa.Table.from_pandas(frame, preserve_index=False)
+            sink = io.BytesIO()
+            options = ipc.IpcWriteOptions(compression="zstd" if pa.Codec.is_available("zstd") else None)
+            with ipc.new_stream(sink, table.schema, options=options) as writer:
+                writer.write_table(table)
+            return _ARROW + sink.getvalue()
+        except (pa.ArrowException, TypeError, ValueError):
+            pass
+    return _PICKLE + pickle.dumps(frame, protocol=pickle.HIGHEST_PROTOCOL)
+
+
+def decode_frame(data: bytes) -> pd.DataFrame:
+    if data[:1] == _ARROW:
+        with ipc.open_stream(io.BytesIO(data[1:])) as reader:
+            return reader.read_all().to_pandas()
+    return pickle.loads(data[1:])
+
+
+def parse_filter(expression: str) -> Tuple[str, str, str]:
+    """'컬럼:연산자:값' 형식의 필터 파싱 (값에는 ':'가 들어갈 수 있음)"""
+    parts = expression.split(":", 2)
+    if len(parts) != 3 or parts[1] not in FILTER_OPERATORS:
+        raise ValueError(f"Invalid filter '{expression}' (expected column:op:value, op in {', '.join(FILTER_OPERATORS)})")
+    return parts[0], parts[1], parts[2]
+
+
+def _coerce_value(series: pd.Series, value: str):
+    """필터 값을 컬럼 타입에 맞게 변환 (숫자/날짜 컬럼이 아니면 문자열 그대로)"""
+    if pd.api.types.is_bool_dtype(series):
+        return value.strip().lower() in ("1", "true", "yes")
+    if pd.api.types.is_numeric_dtype(series):
+        try:
+            return pd.to_numeric(value)
+        except ValueError:
+            raise ValueError(f"Filter value '{value}' is not a number for column '{series.name}'")
+    if pd.api.types.is_datetime64_any_dtype(series):
+        try:
+            return pd.Timestamp(value)
+        except ValueError:
+            raise ValueError(f"Filter value '{value}' is not a date for column '{series.name}'")
+    return value
+
+
+def _filter_mask(frame: pd.DataFrame, column: str, op: str, value: str) -> pd.Series:
+    if column not in frame.columns:
+        raise ValueError(f"Unknown column '{column}'")
+    series = frame[column]
+    if op == "contains":
+        return series.astype(str).str.contains(value, case=False, regex=False, na=False)
+    if isinstance(series.dtype, pd.CategoricalDtype) and op in ("eq", "ne"):
+        # 카테고리 코드로 비교 (없는 값이면 전부 불일치)
+        return (series == value) if op == "eq" else (series != value)
+    if isinstance(series.dtype, pd.CategoricalDtype) or series.dtype == object:
+        series = series.astype(str)
+    typed_value = _coerce_value(series, value)
+    comparisons = {
+        "eq": series.eq,
+        "ne": series.ne,
+        "gt": series.gt,
+        "gte": series.ge,
+        "lt": series.lt,
+        "lte": series.le,
+    }
+    try:
+        mask = comparisons[op](typed_value)
+    except TypeError:
+        raise ValueError(f"Cannot compare column '{column}' with '{value}'")
+    return mask.fillna(False).astype(bool)
+
+
+def query_rows(
+    frame: pd.DataFrame,
+    offset: int = 0,
+    limit: int = ROWS_DEFAULT_LIMIT,
+    sort: Optional[str] = None,
+    descending: bool = False,
+    filters: Optional[List[str]] = None,
+) -> dict:
+    """
+    필터 -> 정렬 -> offset/limit 순서로 적용한 한 페이지
+    - filters: 'column:op:value' 목록 (AND)
+    - 잘못된 컬럼/연산자/값은 ValueError
+    """
+    if offset < 0 or limit < 1:
+        raise ValueError("offset must be >= 0 and limit must be >= 1")
+    limit = min(limit, ROWS_MAX_LIMIT)
+
+    if filters:
+        mask = pd.Series(True, index=frame.index)
+        for expression in filters:
+            mask &= _filter_mask(frame, *parse_filter(expression))
+        frame = frame[mask]
+
+    if sort:
+        if sort not in frame.columns:
+            raise ValueError(f"Unknown sort column '{sort}'")
+        try:
+            frame = frame.sort_values(sort, ascending=not descending, kind="stable", na_position="last")
+        except TypeError:
+            # 타입이 섞인 object 컬럼은 문자열 기준으로 정렬
+            frame = frame.sort_values(sort, ascending=not descending, kind="stable", na_position="last", key=lambda s: s.astype(str))
+
+    page = frame.iloc[offset:offset + limit]
+    return {
+        "columns": list(frame.columns),
+        "rows": dataframe_to_rows(page, limit=len(page)),
+        "offset": offset,
+        "limit": limit,
+        "total_rows": int(len(frame)),
+    }
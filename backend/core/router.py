@@ -1,17 +1,26 @@
 """
 Router 노드 모듈
 """
+import asyncio
 from langchain_core.output_parsers import JsonOutputParser
 from langchain_core.prompts import PromptTemplate
-from langchain_core.runnables import RunnableConfig
+from langchain_core.runnables import RunnableConfig, RunnableLambda
 from langchain_core.runnables.history import RunnableWithMessageHistory
 from langchain_openai import ChatOpenAI
+from typing import Optional
 from core.models import GraphState, Router
+from core.history_window import windowed_session_history
 from core.state import get_session_history
+from core.fast_router import FastRouteClassifier
 
 
-def create_router(model: ChatOpenAI):
-    """Router 설정 생성"""
+def create_router(model: ChatOpenAI, fast_classifier: Optional[FastRouteClassifier] = None):
+    """
+    Router 설정 생성
+    - fast_classifier가 있으면 로컬 분류기가 확실한 질문을 먼저 처리하고, 나머지만 LLM으로 분류
+      (로컬 분류기는 질문만 보므로 대화 기록이 없는 세션의 첫 질문에만 사용,
+       "평균은 얼마야?" 같은 후속 질문은 기록과 함께 LLM이 분류)
+    """
     router_output_parser = JsonOutputParser(pydantic_object=Router)
     router_format_instructions = router_output_parser.get_format_instructions()
 
@@ -34,26 +43,54 @@ def create_router(model: ChatOpenAI):
         partial_variables={"format_instructions": router_format_instructions},
     )
 
-    def router(state: GraphState) -> GraphState:
-        """Router 노드 함수"""
-        question = state["question"] 
-        chain = router_prompt | model | router_output_parser
-        
-        router_with_history = RunnableWithMessageHistory(
-            chain,
-            get_session_history,
-            input_messages_key="query",
-            history_messages_key="chat_history",
-        )
-        
+    # 체인은 한 번만 구성하고, 세션은 호출마다 config로 바인딩
+    chain = router_prompt | model | router_output_parser
+    router_with_history = RunnableWithMessageHistory(
+        chain,
+        windowed_session_history("router"),  # 토큰 예산 안의 최근 턴 + 요약만 프롬프트에 포함
+        input_messages_key="query",
+        history_messages_key="chat_history",
+    )
+
+    def has_history(state: GraphState) -> bool:
+        return bool(get_session_history(state["session_id"]).messages)
+
+    def fast_route(state: GraphState, history: bool) -> bool:
+        """대화 기록이 없고 로컬 분류기로 결정되면 q_type을 채우고 True 반환"""
+        if history:
+            return False
+        q_type = fast_classifier.classify(state["question"])
+        if not q_type:
+            return False
+        state["q_type"] = q_type
+        return True
+
+    def router_config(state: GraphState) -> RunnableConfig:
         # 콜백 비활성화하여 RootListenersTracer 에러 방지
-        config = RunnableConfig(
+        return RunnableConfig(
             configurable={'session_id': state["session_id"]},
             callbacks=[]  # 콜백 비활성화
         )
+
+    def router(state: GraphState) -> GraphState:
+        """Router 노드 함수 (동기)"""
+        if fast_classifier is not None and fast_route(state, has_history(state)):
+            return state
         router_result = router_with_history.invoke(
-            {"query": question}, 
-            config
+            {"query": state["question"]}, 
+            router_config(state)
+        )
+        state["q_type"] = router_result['type']
+        return state
+
+    async def arouter(state: GraphState) -> GraphState:
+        """Router 노드 함수 (비동기)"""
+        # 세션 저장소가 SQLite일 수 있으므로 기록 조회는 워커 스레드에서
+        if fast_classifier is not None and fast_route(state, await asyncio.to_thread(has_history, state)):
+            return state
+        router_result = await router_with_history.ainvoke(
+            {"query": state["question"]},
+            router_config(state)
         )
         state["q_type"] = router_result['type']
         return state
@@ -63,5 +100,6 @@ def create_router(model: ChatOpenAI):
         q_type = state["q_type"].strip()
         return q_type
 
-    return router, router_conditional_edge
+    # graph.invoke와 graph.ainvoke 모두 지원
+    return RunnableLambda(router, afunc=arouter), router_conditional_edge
 
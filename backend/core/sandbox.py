@@ -0,0 +1,300 @@
+"""
+생성 코드 실행 샌드박스 모듈
+- 미리 fork한 워커 프로세스 풀에서 LLM이 생성한 Pandas 코드를 실행
+- 워커는 fork 시점의 df/헬퍼를 copy-on-write로 공유하므로 데이터셋을 다시 로드하지 않음
+- 워커는 시작 시점(스레드가 없을 때) fork한 zygote 프로세스가 대신 fork
+  (요청 처리 중인 멀티스레드 API 프로세스에서 직접 fork하면 다른 스레드가 잡고 있던 락을 물려받아 멈출 수 있음)
+- 실행마다 벽시계 시간(부모가 강제 종료), CPU 시간(RLIMIT_CPU), 메모리(RLIMIT_AS) 제한 적용
+- 결과는 pickle로 직렬화해 파이프로 반환, API 프로세스의 GIL을 잡지 않음
+"""
+import os
+import queue
+import pickle
+import signal
+import threading
+import multiprocessing
+from multiprocessing import reduction
+from multiprocessing.connection import Connection
+from typing import Optional
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+
+SANDBOX_WORKERS = int(os.getenv("SANDBOX_WORKERS", str(min(4, os.cpu_count() or 1))))
+SANDBOX_TIMEOUT_SECONDS = float(os.getenv("SANDBOX_TIMEOUT_SECONDS", "30"))
+SANDBOX_CPU_SECONDS = int(os.getenv("SANDBOX_CPU_SECONDS", "20"))
+SANDBOX_MEMORY_BYTES = int(os.getenv("SANDBOX_MEMORY_BYTES", str(1024 * 1024 * 1024)))
+SANDBOX_MAX_RESULT_BYTES = int(os.getenv("SANDBOX_MAX_RESULT_BYTES", str(32 * 1024 * 1024)))
+# 생성 코드가 df를 제자리 수정해도 영향이 쌓이지 않도록 워커를 주기적으로 교체
+SANDBOX_MAX_TASKS_PER_WORKER = int(os.getenv("SANDBOX_MAX_TASKS_PER_WORKER", "100"))
+
+
+class SandboxUnavailable(RuntimeError):
+    """워커를 사용할 수 없는 경우 (풀 종료 등)"""
+
+
+def fork_available() -> bool:
+    return "fork" in multiprocessing.get_all_start_methods()
+
+
+def _address_space_bytes() -> int:
+    """현재 프로세스의 가상 메모리 크기"""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[0]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError):
+        return 0
+
+
+def _raise_cpu_limit(signum, frame):
+    raise TimeoutError("Code execution exceeded its CPU time limit and was stopped.")
+
+
+def _worker_main(conn, df, namespace, cpu_seconds: int, memory_bytes: int, max_result_bytes: int):
+    """워커 프로세스: 코드를 받아 실행하고 (ok, payload)를 돌려줌"""
+    signal.signal(signal.SIGINT, signal.SIG_IGN)  # 종료는 부모가 관리
+    if resource is not None:
+        signal.signal(signal.SIGXCPU, _raise_cpu_limit)
+        if memory_bytes > 0:
+            # 이미 매핑된 데이터셋/라이브러리 크기 위에 실행용 메모리 예산만 추가로 허용
+            limit = _address_space_bytes() + memory_bytes
+            _, hard = resource.getrlimit(resource.RLIMIT_AS)
+            resource.setrlimit(resource.RLIMIT_AS, (limit, hard))
+
+    while True:
+        try:
+            code = conn.recv()
+        except (EOFError, OSError):
+            return  # 부모 종료
+
+        if resource is not None and cpu_seconds > 0:
+            usage = resource.getrusage(resource.RUSAGE_SELF)
+            _, hard = resource.getrlimit(resource.RLIMIT_CPU)
+            resource.setrlimit(resource.RLIMIT_CPU, (int(usage.ru_utime + usage.ru_stime) + cpu_seconds, hard))
+
+        local_vars = {'df': df, **namespace}
+        try:
+            exec(code, local_vars)
+            if 'return_var' not in local_vars:
+                raise ValueError("Generated code did not assign value to 'return_var'.")
+            payload = pickle.dumps(local_vars['return_var'], protocol=pickle.HIGHEST_PROTOCOL)
+            if len(payload) > max_result_bytes:
+                raise MemoryError(f"Result is too large to return ({len(payload)} bytes). Aggregate or limit the rows.")
+            message = (True, payload)
+        except BaseException as e:
+            if isinstance(e, (KeyboardInterrupt, SystemExit)):
+                e = RuntimeError(f"Generated code raised {type(e).__name__}.")
+            try:
+                message = (False, pickle.dumps(e, protocol=pickle.HIGHEST_PROTOCOL))
+            except Exception:
+                message = (False, pickle.dumps(RuntimeError(f"{type(e).__name__}: {e}")))
+        local_vars = None  # 다음 요청 전에 중간 결과 해제
+        try:
+            conn.send(message)
+        except (BrokenPipeError, OSError):
+            return
+
+
+def _zygote_main(control, parent_control, df, namespace, cpu_seconds: int, memory_bytes: int, max_result_bytes: int):
+    """
+    zygote 프로세스: 워커 파이프 fd를 받을 때마다 fork하여 워커 실행, 워커 pid를 돌려줌
+    - 단일 스레드 상태에서 fork되었으므로 여기서 fork한 워커도 락/스레드 상태가 깨끗함
+    - 종료된 워커는 SIGCHLD 무시로 자동 회수
+    - fork로 물려받은 부모 쪽 제어 파이프는 닫아야 부모가 닫았을 때 EOF를 받음
+    """
+    parent_control.close()
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    signal.signal(signal.SIGCHLD, signal.SIG_IGN)
+    while True:
+        try:
+            fd = reduction.recv_handle(control)
+        except (EOFError, OSError):
+            return  # 부모 종료 또는 풀 종료
+
+        pid = os.fork()
+        if pid == 0:
+            exit_code = 1
+            try:
+                control.close()
+                signal.signal(signal.SIGCHLD, signal.SIG_DFL)
+                _worker_main(Connection(fd), df, namespace, cpu_seconds, memory_bytes, max_result_bytes)
+                exit_code = 0
+            finally:
+                os._exit(exit_code)
+        os.close(fd)
+        try:
+            control.send(pid)
+        except (BrokenPipeError, OSError):
+            return
+
+
+class _Worker:
+    def __init__(self, pid: int, conn):
+        self.pid = pid
+        self.conn = conn
+        self.tasks = 0
+
+    def kill(self, force: bool = False):
+        """
+        파이프를 닫아 워커를 종료 (실행 중인 코드와 상관없이 멈춰야 하면 force로 SIGKILL)
+        이미 죽은 워커는 zygote가 회수하여 pid가 재사용될 수 있으므로 force는 살아있는 워커에만 사용
+        """
+        if force:
+            try:
+                os.kill(self.pid, signal.SIGKILL)
+            except ProcessLookupError:
+                pass
+        self.conn.close()
+
+
+class SandboxPool:
+    """
+    미리 fork한 코드 실행 워커 풀
+    - execute(code): 유휴 워커에 코드를 보내 return_var 반환, 생성 코드의 예외는 그대로 다시 발생
+    - 제한 시간을 넘기거나 비정상 종료된 워커는 죽이고 zygote에서 새로 fork
+    - start=False면 start()를 호출할 때 fork (멀티 워커 서버에서는 서버 워커마다 따로 시작)
+    """
+
+    def __init__(
+        self,
+        df,
+        namespace: Optional[dict] = None,
+        size: int = SANDBOX_WORKERS,
+        timeout_seconds: float = SANDBOX_TIMEOUT_SECONDS,
+        cpu_seconds: int = SANDBOX_CPU_SECONDS,
+        memory_bytes: int = SANDBOX_MEMORY_BYTES,
+        max_result_bytes: int = SANDBOX_MAX_RESULT_BYTES,
+        max_tasks_per_worker: int = SANDBOX_MAX_TASKS_PER_WORKER,
+        start: bool = True,
+    ):
+        if not fork_available():
+            raise SandboxUnavailable("fork start method is not available on this platform")
+        self._context = multiprocessing.get_context("fork")
+        self._df = df
+        self._namespace = namespace or {}
+        self.size = size
+        self.timeout_seconds = timeout_seconds
+        self.cpu_seconds = cpu_seconds
+        self.memory_bytes = memory_bytes
+        self.max_result_bytes = max_result_bytes
+        self.max_tasks_per_worker = max_tasks_per_worker
+        self._idle = queue.Queue()
+        self._lock = threading.Lock()
+        self._spawn_lock = threading.Lock()  # zygote 제어 파이프는 요청/응답 한 쌍씩 사용
+        self._zygote = None
+        self._control = None
+        self._closed = False
+        self._started = False
+        self.stats = {"executions": 0, "errors": 0, "timeouts": 0, "crashes": 0, "recycled": 0, "restarts": 0}
+        if start:
+            self.start()
+
+    def start(self):
+        """
+        zygote fork 후 워커 생성 (이미 시작했으면 무시)
+        요청 처리 스레드가 생기기 전에 호출해야 함 (단일 프로세스는 import 시점, gunicorn은 post_fork)
+        """
+        with self._lock:
+            if self._started:
+                return
+            self._started = True
+        self._control, zygote_conn = self._context.Pipe()
+        self._zygote = self._context.Process(
+            target=_zygote_main,
+            args=(zygote_conn, self._control, self._df, self._namespace, self.cpu_seconds, self.memory_bytes, self.max_result_bytes),
+            name="code-sandbox-zygote",
+            daemon=True,
+        )
+        self._zygote.start()
+        zygote_conn.close()
+        for _ in range(self.size):
+            self._idle.put(self._spawn())
+
+    def _spawn(self) -> _Worker:
+        """zygote에 워커 파이프의 한쪽 fd를 넘겨 워커 fork 요청"""
+        parent_conn, child_conn = self._context.Pipe()
+        try:
+            with self._spawn_lock:
+                reduction.send_handle(self._control, child_conn.fileno(), self._zygote.pid)
+                pid = self._control.recv()
+        except (EOFError, OSError) as e:
+            parent_conn.close()
+            raise SandboxUnavailable(f"sandbox zygote is not available: {e}")
+        finally:
+            child_conn.close()
+        return _Worker(pid, parent_conn)
+
+    def _replace(self, worker: _Worker, reason: str, force: bool = False):
+        worker.kill(force)
+        with self._lock:
+            self.stats[reason] += 1
+            self.stats["restarts"] += 1
+            closed = self._closed
+        if closed:
+            return
+        try:
+            self._idle.put(self._spawn())
+        except SandboxUnavailable as e:
+            print(f"⚠️ 코드 실행 워커 교체 실패: {e}")
+
+    def execute(self, code: str, timeout: Optional[float] = None):
+        """코드를 워커에서 실행하고 return_var 반환"""
+        timeout = self.timeout_seconds if timeout is None else timeout
+        if self._closed:
+            raise SandboxUnavailable("sandbox pool is closed")
+        if not self._started:
+            raise SandboxUnavailable("sandbox pool has not been started")
+        try:
+            worker = self._idle.get(timeout=timeout)
+        except queue.Empty:
+            raise TimeoutError(f"No code execution worker became available within {timeout:.0f}s.")
+
+        try:
+            worker.conn.send(code)
+            finished = worker.conn.poll(timeout)
+            if finished:
+                ok, payload = worker.conn.recv()
+        except (EOFError, OSError):
+            # CPU/메모리 제한 등으로 워커가 죽은 경우
+            self._replace(worker, "crashes")
+            raise RuntimeError("Code execution worker crashed (resource limit exceeded?).")
+        if not finished:
+            self._replace(worker, "timeouts", force=True)
+            raise TimeoutError(f"Code execution exceeded {timeout:.0f}s and was stopped.")
+
+        worker.tasks += 1
+        with self._lock:
+            self.stats["executions"] += 1
+            if not ok:
+                self.stats["errors"] += 1
+        if self._closed:
+            worker.kill()
+        elif self.max_tasks_per_worker and worker.tasks >= self.max_tasks_per_worker:
+            self._replace(worker, "recycled")
+        else:
+            self._idle.put(worker)
+
+        value = pickle.loads(payload)
+        if not ok:
+            raise value
+        return value
+
+    def close(self):
+        with self._lock:
+            self._closed = True
+        while True:
+            try:
+                self._idle.get_nowait().kill()
+            except queue.Empty:
+                break
+        if self._zygote is not None:
+            with self._spawn_lock:
+                self._control.close()
+            self._zygote.join(timeout=1)
+
+    def get_stats(self):
+        with self._lock:
+            return {**self.stats, "workers": self.size, "idle": self._idle.qsize(), "started": self._started, "closed": self._closed}
@@ -0,0 +1,97 @@
+"""
+데이터셋 스키마 모듈
+- 저카디널리티 문자열 컬럼을 categorical로 변환
+- 정수 컬럼 다운캐스트
+- 날짜 컬럼을 미리 파싱하고 연도/월 파생 컬럼 추가
+"""
+import numpy as np
+import pandas as pd
+
+
+# 스키마 변환 규칙이 바뀌면 올려서 기존 스냅샷을 무효화
+SCHEMA_VERSION = 2
+
+CATEGORICAL_COLUMNS = [
+    "정제_시군구명",
+    "정제_시도명",
+    "정제_업종명",
+    "정제_대표업종",
+    "정제_용도지역",
+    "정제_지목",
+    "정제_보유구분",
+    "정제_관리기관",
+    "공장규모",
+    "공장구분",
+    "설립구분",
+    "입주형태",
+    "등록구분",
+]
+
+INTEGER_COLUMNS = [
+    "남자종업원",
+    "여자종업원",
+    "외국인남자종업원",
+    "외국인여자종업원",
+    "종업원합계",
+    "필지수",
+    "인구",
+]
+
+# 날짜 컬럼 -> (연도 컬럼, 월 컬럼)
+DATE_COLUMNS = {
+    "정제_최초등록일": ("정제_최초등록연도", "정제_최초등록월"),
+    "정제_최초승인일": ("정제_최초승인연도", "정제_최초승인월"),
+}
+
+
+def _downcast_integer(values: pd.Series) -> pd.Series:
+    """
+    정수 컬럼 다운캐스트 (결측이 있으면 nullable Int32/Int64로 정수 유지)
+    생성 코드의 컬럼 간 덧셈이 넘치지 않도록 int32 아래로는 줄이지 않음
+    """
+    numeric = pd.to_numeric(values, errors="coerce")
+    nullable = numeric.isna().any()
+    info = np.iinfo(np.int32)
+    if numeric.min() >= info.min and numeric.max() <= info.max:
+        return numeric.astype("Int32" if nullable else "int32")
+    return numeric.astype("Int64" if nullable else "int64")
+
+
+def _parse_dates(values: pd.Series, column: str) -> pd.Series:
+    """
+    날짜 컬럼 파싱 (YYYY-MM-DD 형식 우선)
+    - 형식에 맞지 않아 NaT가 된 값이 있으면 형식 추론으로 다시 파싱
+    - 그래도 날짜로 바꿀 수 없는 값은 NaT로 두고 개수를 로그로 남김
+    """
+    present = values.notna() & (values.astype(str).str.strip() != "")
+    parsed = pd.to_datetime(values, errors="coerce", format="%Y-%m-%d")
+    failed = present & parsed.isna()
+    if failed.any():
+        parsed[failed] = pd.to_datetime(values[failed], errors="coerce", format="mixed")
+        still_failed = present & parsed.isna()
+        print(f"⚠️ {column}: YYYY-MM-DD 형식이 아닌 값 {int(failed.sum())}개 중 {int(still_failed.sum())}개를 날짜로 변환하지 못해 NaT로 둠")
+    return parsed
+
+
+def compact_factory_dataframe(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    공장 데이터셋의 dtype을 압축합니다.
+    원본 컬럼 이름은 그대로 두고, 날짜 컬럼마다 연도/월 컬럼을 추가합니다.
+    """
+    for column in CATEGORICAL_COLUMNS:
+        if column in df.columns:
+            df[column] = df[column].astype("category")
+
+    for column in INTEGER_COLUMNS:
+        if column in df.columns:
+            df[column] = _downcast_integer(df[column])
+
+    for column, (year_column, month_column) in DATE_COLUMNS.items():
+        if column not in df.columns:
+            continue
+        parsed = _parse_dates(df[column], column)
+        df[column] = parsed
+        df[year_column] = parsed.dt.year.astype("Int16")
+        df[month_column] = parsed.dt.month.astype("Int8")
+
+    return df
@@ -0,0 +1,80 @@
+"""
+서버 워커 간 공유 상태 모듈
+- 멀티 워커(gunicorn)로 실행할 때 세션 히스토리/실행 결과를 로컬 SQLite 파일(WAL)에 저장하여
+  어느 워커로 요청이 가도 같은 session_id/execution_id를 조회할 수 있게 함
+- 연결은 프로세스마다 따로 엶 (preload 후 fork된 워커가 마스터의 연결을 공유하지 않도록)
+- SHARED_STATE_PATH가 비어 있으면 사용하지 않음 (단일 프로세스 메모리 저장소)
+"""
+import os
+import sqlite3
+import threading
+from contextlib import contextmanager
+from typing import Iterator, Optional
+
+
+SHARED_STATE_PATH = os.getenv("SHARED_STATE_PATH", "")
+SQLITE_BUSY_TIMEOUT_SECONDS = 30
+
+
+def connect_sqlite(path: str) -> sqlite3.Connection:
+    """여러 프로세스가 동시에 읽고 쓰는 SQLite 연결 (WAL 모드)"""
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    conn = sqlite3.connect(path, timeout=SQLITE_BUSY_TIMEOUT_SECONDS, check_same_thread=False)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    return conn
+
+
+class SharedSqlite:
+    """
+    프로세스별 SQLite 연결
+    - 처음 사용할 때, 또는 fork 후 pid가 바뀌었을 때 연결을 새로 엶
+    - 같은 프로세스의 스레드들은 락으로 연결 하나를 나눠 씀
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._conn = None
+        self._pid = None
+        self._lock = threading.RLock()
+
+    @property
+    def conn(self) -> sqlite3.Connection:
+        if self._conn is None or self._pid != os.getpid():
+            self._conn = connect_sqlite(self.path)
+            self._pid = os.getpid()
+        return self._conn
+
+    @contextmanager
+    def cursor(self) -> Iterator[sqlite3.Cursor]:
+        """트랜잭션 커서 (정상 종료 시 commit, 예외 시 rollback)"""
+        with self._lock:
+            conn = self.conn
+            cur = conn.cursor()
+            try:
+                yield cur
+                conn.commit()
+            except BaseException:
+                conn.rollback()
+                raise
+            finally:
+                cur.close()
+
+    def executescript(self, script: str):
+        with self._lock:
+            self.conn.executescript(script)
+
+
+_shared_db = None
+
+
+def get_shared_db() -> Optional[SharedSqlite]:
+    """SHARED_STATE_PATH가 설정된 경우 공유 SQLite, 아니면 None"""
+    global _shared_db
+    if not SHARED_STATE_PATH:
+        return None
+    if _shared_db is None:
+        _shared_db = SharedSqlite(SHARED_STATE_PATH)
+    return _shared_db
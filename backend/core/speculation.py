@@ -0,0 +1,129 @@
+"""
+추측 실행(speculative) 코드 생성 모듈
+- Router LLM 호출과 동시에 원본 질문으로 코드 생성을 시작
+- Router가 domain_specific이면 Agent의 첫 code_generator 호출이 미리 생성된 코드를 사용하고,
+  general이면 진행 중인 생성을 취소하고 버림
+- 비동기 실행(graph.ainvoke/astream)에서만 동작, 동기 graph.invoke는 기존 순차 실행
+- Agent가 code_generator에 넘긴 입력이 원본 질문과 다르면(질문을 다시 쓴 경우) 추측 코드를 버리고 새로 생성
+"""
+import asyncio
+import threading
+from typing import Optional
+from langchain_core.messages import AIMessage, HumanMessage
+from langchain_core.runnables import RunnableConfig, RunnableLambda
+from core.models import GraphState
+from core.history_window import windowed_session_history
+from core.question_cache import normalize_question
+from core.state import get_session_history
+
+
+class SpeculativeCodeGenerator:
+    """
+    세션별로 하나의 추측 코드 생성 태스크를 관리
+    - session_id -> (정규화된 원본 질문, asyncio.Task)
+    - 사용된 코드는 code_generator 도구를 거친 것과 같게 세션 히스토리에 기록
+    """
+
+    def __init__(self, code_generator_chain):
+        self._chain = code_generator_chain
+        self._history = windowed_session_history("code_generator")
+        self._pending = {}
+        self._lock = threading.Lock()
+        self.counters = {"started": 0, "used": 0, "discarded": 0, "mismatched": 0, "failed": 0}
+
+    def start(self, session_id: str, question: str):
+        """현재 이벤트 루프에서 코드 생성 시작 (히스토리에는 기록하지 않음)"""
+        async def generate():
+            # 세션 히스토리는 공유 SQLite일 수 있으므로 워커 스레드에서 조회
+            chat_history = await asyncio.to_thread(lambda: self._history(session_id).messages)
+            return await self._chain.ainvoke(
+                {"query": question, "chat_history": chat_history},
+                RunnableConfig(callbacks=[])  # 콜백 비활성화
+            )
+
+        task = asyncio.ensure_future(generate())
+        # 버려진 태스크의 예외가 경고로 남지 않도록 소비
+        task.add_done_callback(lambda done: done.cancelled() or done.exception())
+        with self._lock:
+            previous = self._pending.pop(session_id, None)
+            self._pending[session_id] = (normalize_question(question), task)
+            self.counters["started"] += 1
+        if previous is not None:
+            previous[1].cancel()
+
+    def discard(self, session_id: str):
+        """사용하지 않을 추측 결과 취소"""
+        with self._lock:
+            pending = self._pending.pop(session_id, None)
+            if pending is not None:
+                self.counters["discarded"] += 1
+        if pending is not None:
+            pending[1].cancel()
+
+    async def consume(self, session_id: str, query: str) -> Optional[str]:
+        """
+        추측 생성된 코드 반환 (세션당 한 번), 없거나 실패하면 None
+        - query: 도구 입력, 히스토리에 질문으로 기록
+        - 정규화한 도구 입력이 추측 생성에 쓴 질문과 다르면 취소하고 None (도구 입력으로 새로 생성)
+        """
+        with self._lock:
+            pending = self._pending.pop(session_id, None)
+        if pending is None:
+            return None
+        question, task = pending
+        if normalize_question(query) != question:
+            with self._lock:
+                self.counters["mismatched"] += 1
+            task.cancel()
+            return None
+        try:
+            result = await task
+            code = result['code']
+        except Exception as e:
+            print(f"⚠️ 추측 코드 생성 실패, 다시 생성: {e}")
+            with self._lock:
+                self.counters["failed"] += 1
+            return None
+
+        await asyncio.to_thread(
+            get_session_history(session_id).add_messages, [HumanMessage(content=query), AIMessage(content=code)]
+        )
+        with self._lock:
+            self.counters["used"] += 1
+        return code
+
+    def wrap_nodes(self, router, agent):
+        """
+        Router/Agent 노드에 추측 실행을 연결
+        - Router: 분류와 동시에 코드 생성 시작, domain_specific이 아니면 취소
+        - Agent: 종료 시 사용되지 않은 추측 결과 정리
+        """
+        async def arouter(state: GraphState, config: RunnableConfig) -> GraphState:
+            session_id = state["session_id"]
+            self.start(session_id, state["question"])
+            try:
+                state = await router.ainvoke(state, config)
+            except BaseException:
+                self.discard(session_id)
+                raise
+            if state["q_type"].strip() != "domain_specific":
+                self.discard(session_id)
+            return state
+
+        async def aagent(state: GraphState, config: RunnableConfig) -> GraphState:
+            try:
+                return await agent.ainvoke(state, config)
+            finally:
+                self.discard(state["session_id"])
+
+        def sync_router(state: GraphState, config: RunnableConfig) -> GraphState:
+            return router.invoke(state, config)
+
+        def sync_agent(state: GraphState, config: RunnableConfig) -> GraphState:
+            return agent.invoke(state, config)
+
+        return RunnableLambda(sync_router, afunc=arouter), RunnableLambda(sync_agent, afunc=aagent)
+
+    def get_stats(self):
+        with self._lock:
+            return {**self.counters, "pending": len(self._pending)}
@@ -1,48 +1,406 @@
 """
 상태 관리 및 세션 관리
 """
+import os
+import json
+import time
 import uuid
 import threading
+from collections import OrderedDict
+from contextvars import ContextVar
+from typing import List, Optional, Sequence
 from langchain_community.chat_message_histories import ChatMessageHistory
+from langchain_core.chat_history import BaseChatMessageHistory
+from langchain_core.messages import BaseMessage, HumanMessage, message_to_dict, messages_from_dict
+from core.shared_state import SharedSqlite, get_shared_db
+
+
+SESSION_IDLE_TTL_SECONDS = float(os.getenv("SESSION_IDLE_TTL_SECONDS", str(2 * 60 * 60)))
+SESSION_MAX_COUNT = int(os.getenv("SESSION_MAX_COUNT", "10000"))
+SESSION_MAX_MESSAGES = int(os.getenv("SESSION_MAX_MESSAGES", "200"))
+SESSION_SWEEP_INTERVAL_SECONDS = float(os.getenv("SESSION_SWEEP_INTERVAL_SECONDS", "60"))
+
+
+class BoundedChatMessageHistory(ChatMessageHistory):
+    """최근 max_messages개만 유지하는 세션 히스토리 (오래된 메시지부터 삭제)"""
+
+    max_messages: int = SESSION_MAX_MESSAGES
+    trimmed: int = 0
+
+    def add_message(self, message: BaseMessage) -> None:
+        self.messages.append(message)
+        self._trim()
+
+    def add_messages(self, messages: Sequence[BaseMessage]) -> None:
+        self.messages.extend(messages)
+        self._trim()
+
+    def _trim(self):
+        overflow = len(self.messages) - self.max_messages
+        if overflow <= 0:
+            return
+        # 대화 턴이 중간부터 시작하지 않도록 사람 메시지가 나올 때까지 함께 삭제
+        while overflow < len(self.messages) and not isinstance(self.messages[overflow], HumanMessage):
+            overflow += 1
+        del self.messages[:overflow]
+        self.trimmed += overflow
 
 
 class ThreadSafeStore:
-    """스레드 안전한 세션 히스토리 저장소"""
-    def __init__(self):
-        self._store = {}
+    """
+    스레드 안전한 세션 히스토리 저장소
+    - _store는 마지막 접근 순서(OrderedDict)로 유지하여 유휴 세션/초과 세션을 앞에서부터 O(1)로 제거
+    - 세션 수 상한은 새 세션 생성 시 바로 적용, 유휴 세션 정리는 백그라운드 스레드(start_sweeper)에서 수행
+    """
+    def __init__(
+        self,
+        idle_ttl_seconds: float = SESSION_IDLE_TTL_SECONDS,
+        max_sessions: int = SESSION_MAX_COUNT,
+        max_messages: int = SESSION_MAX_MESSAGES,
+    ):
+        self._store = OrderedDict()  # session_id -> history (마지막 접근 순서)
+        self._last_access = {}  # session_id -> 마지막 접근 시각
+        self._usage = {}  # session_id -> [LLM 호출 수, 입력 토큰, 출력 토큰]
         self._lock = threading.RLock()  # 재진입 가능한 락
+        self.idle_ttl_seconds = idle_ttl_seconds
+        self.max_sessions = max_sessions
+        self.max_messages = max_messages
+        self.evictions = {"idle": 0, "max_sessions": 0}
+        self._trimmed_messages = 0  # 제거된 세션에서 잘려 나간 메시지 수
+        self._sweeper = None
+        self._sweeper_stop = threading.Event()
     
     def get_session_history(self, session_id: str):
         with self._lock:
-            if session_id not in self._store:
-                self._store[session_id] = ChatMessageHistory()
+            history = self._store.get(session_id)
+            if history is None:
+                history = BoundedChatMessageHistory(max_messages=self.max_messages)
+                self._store[session_id] = history
                 print(f"🆕 새로운 세션 히스토리 생성: {session_id[:8]}...")
-            return self._store[session_id]
+                while len(self._store) > self.max_sessions:
+                    self._remove(next(iter(self._store)))
+                    self.evictions["max_sessions"] += 1
+            else:
+                self._store.move_to_end(session_id)
+            self._last_access[session_id] = time.time()
+            return history
+
+    def _remove(self, session_id: str):
+        history = self._store.pop(session_id)
+        self._last_access.pop(session_id, None)
+        self._usage.pop(session_id, None)
+        self._trimmed_messages += history.trimmed
+        return history
+
+    def sweep(self, now: Optional[float] = None, batch_size: int = 1000) -> int:
+        """유휴 세션 정리 (락은 batch_size개마다 놓아 요청 경로를 오래 막지 않음)"""
+        now = time.time() if now is None else now
+        removed = 0
+        while True:
+            with self._lock:
+                batch = 0
+                while self._store and batch < batch_size:
+                    session_id = next(iter(self._store))
+                    if now - self._last_access.get(session_id, now) < self.idle_ttl_seconds:
+                        return removed
+                    self._remove(session_id)
+                    self.evictions["idle"] += 1
+                    batch += 1
+                removed += batch
+                if not self._store:
+                    return removed
+
+    def start_sweeper(self, interval_seconds: float = SESSION_SWEEP_INTERVAL_SECONDS):
+        """유휴 세션 정리 데몬 스레드 시작 (이미 실행 중이면 무시)"""
+        if self._sweeper is not None and self._sweeper.is_alive():
+            return
+        self._sweeper_stop.clear()
+
+        def run():
+            while not self._sweeper_stop.wait(interval_seconds):
+                try:
+                    removed = self.sweep()
+                    if removed:
+                        print(f"🧹 유휴 세션 {removed}개 정리")
+                except Exception as e:
+                    print(f"⚠️ 세션 정리 실패: {e}")
+
+        self._sweeper = threading.Thread(target=run, name="session-sweeper", daemon=True)
+        self._sweeper.start()
+
+    def stop_sweeper(self):
+        self._sweeper_stop.set()
+        if self._sweeper is not None:
+            self._sweeper.join(timeout=5)
+            self._sweeper = None
     
     def clear_session(self, session_id: str = None):
         with self._lock:
             if session_id:
                 if session_id in self._store:
                     message_count = len(self._store[session_id].messages)
-                    del self._store[session_id]
+                    self._remove(session_id)
                     return message_count
                 return 0
             else:
                 total_sessions = len(self._store)
                 total_messages = sum(len(history.messages) for history in self._store.values())
+                for history in self._store.values():
+                    self._trimmed_messages += history.trimmed
                 self._store.clear()
+                self._last_access.clear()
+                self._usage.clear()
                 return total_sessions, total_messages
+
+    def add_usage(self, session_id: str, llm_calls: int, input_tokens: int, output_tokens: int):
+        """세션 누적 LLM 사용량에 더함 (이미 제거된 세션은 무시)"""
+        with self._lock:
+            if session_id not in self._store:
+                return
+            usage = self._usage.setdefault(session_id, [0, 0, 0])
+            usage[0] += llm_calls
+            usage[1] += input_tokens
+            usage[2] += output_tokens
+
+    def get_usage(self, session_id: str) -> dict:
+        """세션 누적 LLM 호출 수/토큰 사용량"""
+        with self._lock:
+            llm_calls, input_tokens, output_tokens = self._usage.get(session_id, (0, 0, 0))
+        return {
+            "llm_calls": llm_calls,
+            "input_tokens": input_tokens,
+            "output_tokens": output_tokens,
+            "total_tokens": input_tokens + output_tokens,
+        }
     
     def get_stats(self):
         with self._lock:
             return {
                 'total_sessions': len(self._store),
-                'total_messages': sum(len(history.messages) for history in self._store.values())
+                'total_messages': sum(len(history.messages) for history in self._store.values()),
+                'max_sessions': self.max_sessions,
+                'max_messages': self.max_messages,
+                'idle_ttl_seconds': self.idle_ttl_seconds,
+                'evictions': dict(self.evictions),
+                'trimmed_messages': self._trimmed_messages + sum(history.trimmed for history in self._store.values()),
             }
 
 
-# 전역 스레드 안전 저장소
-thread_safe_store = ThreadSafeStore()
+class SqliteChatMessageHistory(BaseChatMessageHistory):
+    """
+    공유 SQLite에 저장되는 세션 히스토리 (멀티 워커용)
+    - BoundedChatMessageHistory와 같이 최근 max_messages개만 유지하고 사람 메시지 경계에서 자름
+    - 생성 시에는 DB를 건드리지 않고, 조회/추가할 때 마지막 접근 시각을 갱신
+      (세션 등록과 세션 수 상한 축출은 첫 메시지 추가 시)
+      RunnableWithMessageHistory는 비동기 실행에서 조회/추가를 스레드 풀에서 호출하므로 이벤트 루프를 막지 않음
+    """
+
+    def __init__(self, store: "SqliteSessionStore", session_id: str):
+        self.store = store
+        self.db = store.db
+        self.session_id = session_id
+        self.max_messages = store.max_messages
+
+    @property
+    def messages(self) -> List[BaseMessage]:
+        with self.db.cursor() as cur:
+            self.store._touch(cur, self.session_id, create=False)
+            cur.execute("SELECT message FROM chat_messages WHERE session_id = ? ORDER BY id", (self.session_id,))
+            return messages_from_dict([json.loads(row[0]) for row in cur.fetchall()])
+
+    @property
+    def trimmed(self) -> int:
+        with self.db.cursor() as cur:
+            cur.execute("SELECT trimmed FROM chat_sessions WHERE session_id = ?", (self.session_id,))
+            row = cur.fetchone()
+        return row[0] if row else 0
+
+    def add_message(self, message: BaseMessage) -> None:
+        self.add_messages([message])
+
+    def add_messages(self, messages: Sequence[BaseMessage]) -> None:
+        rows = [
+            (self.session_id, message.type, json.dumps(message_to_dict(message), ensure_ascii=False))
+            for message in messages
+        ]
+        with self.db.cursor() as cur:
+            self.store._touch(cur, self.session_id, create=True)
+            cur.executemany("INSERT INTO chat_messages (session_id, type, message) VALUES (?, ?, ?)", rows)
+            self._trim(cur)
+
+    def _trim(self, cur):
+        cur.execute("SELECT id, type FROM chat_messages WHERE session_id = ? ORDER BY id", (self.session_id,))
+        rows = cur.fetchall()
+        overflow = len(rows) - self.max_messages
+        if overflow <= 0:
+            return
+        # 대화 턴이 중간부터 시작하지 않도록 사람 메시지가 나올 때까지 함께 삭제
+        while overflow < len(rows) and rows[overflow][1] != "human":
+            overflow += 1
+        cur.execute("DELETE FROM chat_messages WHERE session_id = ? AND id <= ?", (self.session_id, rows[overflow - 1][0]))
+        cur.execute("UPDATE chat_sessions SET trimmed = trimmed + ? WHERE session_id = ?", (overflow, self.session_id))
+
+    def clear(self) -> None:
+        with self.db.cursor() as cur:
+            cur.execute("DELETE FROM chat_messages WHERE session_id = ?", (self.session_id,))
+
+
+class SqliteSessionStore(ThreadSafeStore):
+    """
+    공유 SQLite 세션 저장소 (멀티 워커용, ThreadSafeStore와 같은 인터페이스)
+    - chat_sessions: 세션별 마지막 접근 시각/잘린 메시지 수, chat_messages: 메시지, session_usage: 세션 누적 LLM 사용량
+    - 세션 수 상한/유휴 정리 기준은 ThreadSafeStore와 같고, 축출 카운터는 워커별로 집계
+    """
+
+    def __init__(self, db: SharedSqlite, **kwargs):
+        super().__init__(**kwargs)
+        self.db = db
+        self.db.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS chat_sessions (
+                session_id TEXT PRIMARY KEY,
+                last_access REAL NOT NULL,
+                trimmed INTEGER NOT NULL DEFAULT 0
+            );
+            CREATE INDEX IF NOT EXISTS chat_sessions_last_access ON chat_sessions (last_access);
+            CREATE TABLE IF NOT EXISTS chat_messages (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                session_id TEXT NOT NULL,
+                type TEXT NOT NULL,
+                message TEXT NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS chat_messages_session ON chat_messages (session_id, id);
+            CREATE TABLE IF NOT EXISTS session_usage (
+                session_id TEXT PRIMARY KEY,
+                llm_calls INTEGER NOT NULL DEFAULT 0,
+                input_tokens INTEGER NOT NULL DEFAULT 0,
+                output_tokens INTEGER NOT NULL DEFAULT 0
+            );
+            """
+        )
+
+    def get_session_history(self, session_id: str):
+        """
+        세션 히스토리 객체 반환 (DB 접근 없음)
+        RunnableWithMessageHistory가 비동기 실행 중에도 이벤트 루프에서 동기로 호출하므로 I/O는 조회/추가 시점으로 미룸
+        """
+        return SqliteChatMessageHistory(self, session_id)
+
+    def _touch(self, cur, session_id: str, create: bool):
+        """
+        마지막 접근 시각 갱신
+        - create=True면 없는 세션을 등록하고 세션 수 상한을 넘은 만큼 오래된 세션 축출
+        """
+        now = time.time()
+        if not create:
+            cur.execute("UPDATE chat_sessions SET last_access = ? WHERE session_id = ?", (now, session_id))
+            return
+        cur.execute("INSERT OR IGNORE INTO chat_sessions (session_id, last_access) VALUES (?, ?)", (session_id, now))
+        if not cur.rowcount:
+            cur.execute("UPDATE chat_sessions SET last_access = ? WHERE session_id = ?", (now, session_id))
+            return
+        print(f"🆕 새로운 세션 히스토리 생성: {session_id[:8]}...")
+        cur.execute("SELECT COUNT(*) FROM chat_sessions")
+        overflow = cur.fetchone()[0] - self.max_sessions
+        if overflow > 0:
+            cur.execute(
+                "SELECT session_id FROM chat_sessions WHERE session_id != ? ORDER BY last_access LIMIT ?",
+                (session_id, overflow),
+            )
+            self._delete(cur, [row[0] for row in cur.fetchall()])
+            self.evictions["max_sessions"] += overflow
+
+    def _delete(self, cur, session_ids: List[str]):
+        rows = [(session_id,) for session_id in session_ids]
+        for row in rows:
+            cur.execute("SELECT trimmed FROM chat_sessions WHERE session_id = ?", row)
+            trimmed = cur.fetchone()
+            self._trimmed_messages += trimmed[0] if trimmed else 0
+        cur.executemany("DELETE FROM chat_messages WHERE session_id = ?", rows)
+        cur.executemany("DELETE FROM session_usage WHERE session_id = ?", rows)
+        cur.executemany("DELETE FROM chat_sessions WHERE session_id = ?", rows)
+
+    def sweep(self, now: Optional[float] = None, batch_size: int = 1000) -> int:
+        """유휴 세션 정리 (batch_size개씩 나눠 트랜잭션을 짧게 유지)"""
+        cutoff = (time.time() if now is None else now) - self.idle_ttl_seconds
+        removed = 0
+        while True:
+            with self.db.cursor() as cur:
+                cur.execute("SELECT session_id FROM chat_sessions WHERE last_access <= ? LIMIT ?", (cutoff, batch_size))
+                session_ids = [row[0] for row in cur.fetchall()]
+                self._delete(cur, session_ids)
+            self.evictions["idle"] += len(session_ids)
+            removed += len(session_ids)
+            if len(session_ids) < batch_size:
+                return removed
+
+    def clear_session(self, session_id: str = None):
+        with self.db.cursor() as cur:
+            if session_id:
+                cur.execute("SELECT COUNT(*) FROM chat_messages WHERE session_id = ?", (session_id,))
+                message_count = cur.fetchone()[0]
+                self._delete(cur, [session_id])
+                return message_count
+            cur.execute("SELECT COUNT(*), COALESCE(SUM(trimmed), 0) FROM chat_sessions")
+            total_sessions, trimmed = cur.fetchone()
+            cur.execute("SELECT COUNT(*) FROM chat_messages")
+            total_messages = cur.fetchone()[0]
+            cur.execute("DELETE FROM chat_messages")
+            cur.execute("DELETE FROM session_usage")
+            cur.execute("DELETE FROM chat_sessions")
+            self._trimmed_messages += trimmed
+            return total_sessions, total_messages
+
+    def add_usage(self, session_id: str, llm_calls: int, input_tokens: int, output_tokens: int):
+        with self.db.cursor() as cur:
+            # 이미 제거된 세션은 무시
+            cur.execute(
+                """
+                INSERT INTO session_usage (session_id, llm_calls, input_tokens, output_tokens)
+                SELECT ?, ?, ?, ? WHERE EXISTS (SELECT 1 FROM chat_sessions WHERE session_id = ?)
+                ON CONFLICT (session_id) DO UPDATE SET
+                    llm_calls = llm_calls + excluded.llm_calls,
+                    input_tokens = input_tokens + excluded.input_tokens,
+                    output_tokens = output_tokens + excluded.output_tokens
+                """,
+                (session_id, llm_calls, input_tokens, output_tokens, session_id),
+            )
+
+    def get_usage(self, session_id: str) -> dict:
+        with self.db.cursor() as cur:
+            cur.execute("SELECT llm_calls, input_tokens, output_tokens FROM session_usage WHERE session_id = ?", (session_id,))
+            llm_calls, input_tokens, output_tokens = cur.fetchone() or (0, 0, 0)
+        return {
+            "llm_calls": llm_calls,
+            "input_tokens": input_tokens,
+            "output_tokens": output_tokens,
+            "total_tokens": input_tokens + output_tokens,
+        }
+
+    def get_stats(self):
+        with self.db.cursor() as cur:
+            cur.execute("SELECT COUNT(*), COALESCE(SUM(trimmed), 0) FROM chat_sessions")
+            total_sessions, trimmed = cur.fetchone()
+            cur.execute("SELECT COUNT(*) FROM chat_messages")
+            total_messages = cur.fetchone()[0]
+        return {
+            'total_sessions': total_sessions,
+            'total_messages': total_messages,
+            'max_sessions': self.max_sessions,
+            'max_messages': self.max_messages,
+            'idle_ttl_seconds': self.idle_ttl_seconds,
+            'evictions': dict(self.evictions),
+            'trimmed_messages': self._trimmed_messages + trimmed,
+        }
+
+
+# 전역 스레드 안전 저장소 (SHARED_STATE_PATH가 있으면 워커 간 공유 SQLite)
+_shared_db = get_shared_db()
+thread_safe_store = SqliteSessionStore(_shared_db) if _shared_db is not None else ThreadSafeStore()
+
+# 현재 요청의 세션 ID
+# AgentExecutor는 도구 호출에 RunnableConfig를 넘기지 않으므로, 도구는 이 값으로 세션을 찾음
+current_session_id: ContextVar[Optional[str]] = ContextVar("current_session_id", default=None)
 
 
 def get_session_history(session_ids):
@@ -0,0 +1,70 @@
+"""
+스트리밍 이벤트 모듈
+- 그래프 노드/도구에서 발생한 단계 이벤트와 답변 토큰을 요청별 큐로 전달
+- /api/의 Server-Sent Events 모드에서 사용
+"""
+import json
+import asyncio
+from contextvars import ContextVar
+from typing import Optional
+from langchain_core.callbacks import BaseCallbackHandler
+
+
+class StreamEmitter:
+    """
+    요청별 이벤트 큐
+    - 그래프가 워커 스레드에서 실행되어도 안전하도록 이벤트 루프 스레드에서 큐에 넣음
+    """
+    _CLOSED = object()
+
+    def __init__(self, loop: asyncio.AbstractEventLoop):
+        self._loop = loop
+        self._queue = asyncio.Queue()
+
+    def emit(self, event: str, data: Optional[dict] = None):
+        self._loop.call_soon_threadsafe(self._queue.put_nowait, (event, data or {}))
+
+    def close(self):
+        self._loop.call_soon_threadsafe(self._queue.put_nowait, self._CLOSED)
+
+    async def next_event(self):
+        """다음 (event, data) 반환, close() 이후에는 None"""
+        item = await self._queue.get()
+        if item is self._CLOSED:
+            return None
+        return item
+
+
+# 현재 요청의 이벤트 큐 (스트리밍 요청이 아니면 None)
+current_emitter: ContextVar[Optional[StreamEmitter]] = ContextVar("current_emitter", default=None)
+
+
+def emit_event(event: str, **data):
+    """스트리밍 요청이면 단계 이벤트 전송, 아니면 무시"""
+    emitter = current_emitter.get()
+    if emitter is not None:
+        emitter.emit(event, data)
+
+
+class TokenStreamHandler(BaseCallbackHandler):
+    """
+    LLM이 생성하는 답변 토큰을 이벤트로 전달하는 콜백
+    - 에이전트 시도가 실패해 다시 실행되면 answer_reset 이벤트가 먼저 가므로, 클라이언트는 그때까지 받은 token을 버림
+    """
+
+    def on_llm_new_token(self, token: str, **kwargs):
+        # 도구 호출 턴은 content가 비어 있으므로 답변 텍스트만 전달됨
+        if token:
+            emit_event("token", text=token)
+
+
+def stream_callbacks() -> list:
+    """스트리밍 요청이면 토큰 콜백, 아니면 빈 리스트 (RootListenersTracer 에러 방지용 콜백 비활성화 유지)"""
+    if current_emitter.get() is None:
+        return []
+    return [TokenStreamHandler()]
+
+
+def format_sse(event: str, data: dict) -> str:
+    """Server-Sent Events 메시지 포맷"""
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False, default=str)}\n\n"
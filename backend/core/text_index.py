@@ -0,0 +1,89 @@
+"""
+자유 텍스트 컬럼(생산품, 원자재) 검색용 n-gram 역색인 모듈
+- 데이터셋 로드 시 컬럼의 고유값마다 1-gram/2-gram 포스팅 리스트 생성
+- 검색은 포스팅 교집합으로 후보를 좁힌 뒤 후보 고유값만 부분 문자열 검증
+- 결과는 df 행에 맞춘 boolean mask로 반환
+"""
+import time
+from collections import defaultdict
+import numpy as np
+import pandas as pd
+
+
+class NGramIndex:
+    """
+    단일 컬럼에 대한 n-gram 역색인
+    - 대소문자를 구분하지 않는 부분 문자열 검색 (str.contains(..., case=False, regex=False, na=False)와 동일)
+    """
+
+    def __init__(self, values: pd.Series):
+        codes, uniques = pd.factorize(values, use_na_sentinel=True)
+        self._index = values.index
+        self._codes = codes.astype(np.int32)
+        self._texts = [str(text).lower() for text in uniques]
+
+        postings = defaultdict(list)
+        for uid, text in enumerate(self._texts):
+            for gram in set(text) | {text[i:i + 2] for i in range(len(text) - 1)}:
+                postings[gram].append(uid)
+        self._postings = {gram: np.asarray(uids, dtype=np.int32) for gram, uids in postings.items()}
+
+    @staticmethod
+    def _query_grams(keyword: str):
+        if len(keyword) == 1:
+            return {keyword}
+        return {keyword[i:i + 2] for i in range(len(keyword) - 1)}
+
+    def match_uniques(self, keyword: str) -> np.ndarray:
+        """키워드를 포함하는 고유값 id 배열"""
+        keyword = keyword.lower()
+        if not keyword:
+            return np.arange(len(self._texts), dtype=np.int32)
+
+        posting_lists = []
+        for gram in self._query_grams(keyword):
+            posting = self._postings.get(gram)
+            if posting is None:
+                return np.empty(0, dtype=np.int32)
+            posting_lists.append(posting)
+
+        posting_lists.sort(key=len)
+        candidates = posting_lists[0]
+        for posting in posting_lists[1:]:
+            candidates = np.intersect1d(candidates, posting, assume_unique=True)
+            if len(candidates) == 0:
+                return candidates
+
+        # n-gram 교집합은 상위 집합이므로 후보만 실제 포함 여부 검증
+        return np.asarray([uid for uid in candidates if keyword in self._texts[uid]], dtype=np.int32)
+
+    def search(self, *keywords: str) -> pd.Series:
+        """키워드 중 하나라도 포함하는 행의 boolean mask (키워드의 '|'도 OR로 처리)"""
+        hit = np.zeros(len(self._texts) + 1, dtype=bool)  # 마지막 칸은 결측값(-1) 자리
+        for keyword in keywords:
+            for part in str(keyword).split("|"):
+                part = part.strip()
+                if part:
+                    hit[self.match_uniques(part)] = True
+        return pd.Series(hit[self._codes], index=self._index)
+
+
+def create_search_helpers(df: pd.DataFrame) -> dict:
+    """code_executor 실행 환경에 주입할 검색 함수 생성"""
+    started = time.perf_counter()
+    product_index = NGramIndex(df["생산품"])
+    material_index = NGramIndex(df["원자재"])
+    print(f"🔎 생산품/원자재 검색 색인 생성 ({(time.perf_counter() - started) * 1000:.0f}ms)")
+
+    def search_products(*keywords: str) -> pd.Series:
+        """'생산품'에 키워드를 포함하는 행의 boolean mask"""
+        return product_index.search(*keywords)
+
+    def search_materials(*keywords: str) -> pd.Series:
+        """'원자재'에 키워드를 포함하는 행의 boolean mask"""
+        return material_index.search(*keywords)
+
+    return {
+        "search_products": search_products,
+        "search_materials": search_materials,
+    }
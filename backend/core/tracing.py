@@ -0,0 +1,216 @@
+"""
+단계별 지연 시간 추적 모듈
+- span(stage)으로 감싼 구간의 시간을 단계별 히스토그램에 누적하고 /metrics에서 Prometheus 텍스트 형식으로 노출
+- 요청마다 RequestTrace를 ContextVar로 설정하면 같은 요청의 구간이 모여 응답의 timings로 반환됨
+  (실행 config의 콜백은 RootListenersTracer 에러 때문에 비활성화 상태라 노드/도구/실행 구간은 직접 감싸고,
+   LLM 호출은 모델에 직접 연결한 콜백(core.llm.LLMCallHandler)으로 기록)
+- 구간은 중첩될 수 있음 (예: node.agent 안에 llm.agent, tool.code_executor, exec)
+- LLM 호출 수/토큰 사용량도 단계별 카운터, 요청별 합계(usage), 세션별 누적(usage_sink)으로 집계
+- 히스토그램/카운터는 프로세스별 집계 (gunicorn 멀티 워커에서는 스크랩한 워커의 값)
+"""
+import time
+import functools
+import threading
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Callable, Dict, Optional
+
+
+# Prometheus 기본 버킷에 LLM/그래프 호출 길이를 고려한 긴 버킷 추가 (초)
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0)
+METRIC_NAME = "factory_chatbot_stage_seconds"
+LLM_CALLS_METRIC_NAME = "factory_chatbot_llm_calls_total"
+LLM_TOKENS_METRIC_NAME = "factory_chatbot_llm_tokens_total"
+
+
+class _Histogram:
+    def __init__(self):
+        self.buckets = [0] * len(LATENCY_BUCKETS)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, seconds: float):
+        self.count += 1
+        self.sum += seconds
+        for i, bound in enumerate(LATENCY_BUCKETS):
+            if seconds <= bound:
+                self.buckets[i] += 1
+
+
+_histograms: Dict[str, _Histogram] = {}
+_llm_usage: Dict[str, list] = {}  # stage -> [호출 수, 입력 토큰, 출력 토큰]
+_histograms_lock = threading.Lock()
+
+
+def _add_usage(usage: Dict[str, list], stage: str, input_tokens: int, output_tokens: int):
+    entry = usage.setdefault(stage, [0, 0, 0])
+    entry[0] += 1
+    entry[1] += input_tokens
+    entry[2] += output_tokens
+
+
+def _usage_summary(calls: int, input_tokens: int, output_tokens: int) -> dict:
+    return {
+        "llm_calls": calls,
+        "input_tokens": input_tokens,
+        "output_tokens": output_tokens,
+        "total_tokens": input_tokens + output_tokens,
+    }
+
+
+def observe(stage: str, seconds: float):
+    """단계 히스토그램에 기록하고, 현재 요청이 추적 중이면 요청별 합계에도 반영"""
+    with _histograms_lock:
+        histogram = _histograms.get(stage)
+        if histogram is None:
+            histogram = _histograms[stage] = _Histogram()
+        histogram.observe(seconds)
+    trace = current_trace.get()
+    if trace is not None:
+        trace.add(stage, seconds)
+
+
+def record_llm_usage(stage: str, input_tokens: int, output_tokens: int):
+    """LLM 호출 한 번의 토큰 사용량을 단계 카운터와 현재 요청에 반영"""
+    with _histograms_lock:
+        _add_usage(_llm_usage, stage, input_tokens, output_tokens)
+    trace = current_trace.get()
+    if trace is not None:
+        trace.add_usage(stage, input_tokens, output_tokens)
+
+
+class RequestTrace:
+    """
+    요청 하나의 단계별 소요 시간/LLM 사용량 합계
+    - 도구는 워커 스레드에서 실행되므로 lock으로 보호 (ContextVar 복사본도 같은 객체를 가리킴)
+    - usage_sink(session_id, llm_calls, input_tokens, output_tokens): 세션 누적 사용량 반영 함수
+      요청이 끝날 때 한 번에 반영하고, 끝난 뒤의 호출(백그라운드 시각화 추천)은 바로 반영
+    """
+
+    def __init__(self, session_id: Optional[str] = None, usage_sink: Optional[Callable] = None):
+        self.started = time.perf_counter()
+        self.session_id = session_id
+        self.usage_sink = usage_sink
+        self._stages: Dict[str, list] = {}
+        self._usage: Dict[str, list] = {}
+        self._finished = False
+        self._lock = threading.Lock()
+
+    def add(self, stage: str, seconds: float):
+        with self._lock:
+            entry = self._stages.setdefault(stage, [0, 0.0])
+            entry[0] += 1
+            entry[1] += seconds
+
+    def add_usage(self, stage: str, input_tokens: int, output_tokens: int):
+        with self._lock:
+            finished = self._finished
+            if not finished:
+                _add_usage(self._usage, stage, input_tokens, output_tokens)
+        if finished:
+            self._sink(1, input_tokens, output_tokens)
+
+    def _sink(self, calls: int, input_tokens: int, output_tokens: int):
+        if self.usage_sink is None or self.session_id is None or not calls:
+            return
+        try:
+            self.usage_sink(self.session_id, calls, input_tokens, output_tokens)
+        except Exception as e:
+            print(f"⚠️ 세션 사용량 기록 실패: {e}")
+
+    def finish(self) -> dict:
+        """
+        요청 전체 시간을 'request' 단계로 기록하고 응답에 붙일 요약 반환
+        - timings: 단계별 소요 시간, usage: 요청의 LLM 호출 수/토큰 사용량 (단계별 포함)
+        """
+        total = time.perf_counter() - self.started
+        with _histograms_lock:
+            histogram = _histograms.setdefault("request", _Histogram())
+            histogram.observe(total)
+        with self._lock:
+            self._finished = True
+            stages = {
+                stage: {"count": count, "ms": round(seconds * 1000, 1)}
+                for stage, (count, seconds) in self._stages.items()
+            }
+            usage_stages = {stage: _usage_summary(*entry) for stage, entry in self._usage.items()}
+            totals = [sum(entry[i] for entry in self._usage.values()) for i in range(3)]
+        self._sink(*totals)
+        return {
+            "timings": {"total_ms": round(total * 1000, 1), "stages": stages},
+            "usage": {**_usage_summary(*totals), "stages": usage_stages},
+        }
+
+
+# 현재 요청의 추적 객체 (API 요청 밖에서 실행되면 None, 히스토그램에는 그대로 기록)
+current_trace: ContextVar[Optional[RequestTrace]] = ContextVar("current_trace", default=None)
+
+
+@contextmanager
+def span(stage: str):
+    """with span("exec"): ... 구간 시간 기록 (예외가 나도 기록)"""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        observe(stage, time.perf_counter() - started)
+
+
+def traced(stage: str):
+    """함수 전체를 span으로 감싸는 데코레이터 (동기 함수용)"""
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with span(stage):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def render_metrics() -> str:
+    """Prometheus 텍스트 형식 (0.0.4)"""
+    with _histograms_lock:
+        snapshot = {
+            stage: (list(h.buckets), h.count, h.sum)
+            for stage, h in sorted(_histograms.items())
+        }
+        usage_snapshot = {stage: list(entry) for stage, entry in sorted(_llm_usage.items())}
+    lines = [
+        f"# HELP {METRIC_NAME} Latency of each request stage (graph nodes, tools, LLM calls, code execution, serialization).",
+        f"# TYPE {METRIC_NAME} histogram",
+    ]
+    for stage, (buckets, count, total) in snapshot.items():
+        for bound, bucket_count in zip(LATENCY_BUCKETS, buckets):
+            lines.append(f'{METRIC_NAME}_bucket{{stage="{stage}",le="{bound}"}} {bucket_count}')
+        lines.append(f'{METRIC_NAME}_bucket{{stage="{stage}",le="+Inf"}} {count}')
+        lines.append(f'{METRIC_NAME}_sum{{stage="{stage}"}} {total}')
+        lines.append(f'{METRIC_NAME}_count{{stage="{stage}"}} {count}')
+    lines += [
+        f"# HELP {LLM_CALLS_METRIC_NAME} Number of LLM calls by stage.",
+        f"# TYPE {LLM_CALLS_METRIC_NAME} counter",
+    ]
+    for stage, (calls, _, _) in usage_snapshot.items():
+        lines.append(f'{LLM_CALLS_METRIC_NAME}{{stage="{stage}"}} {calls}')
+    lines += [
+        f"# HELP {LLM_TOKENS_METRIC_NAME} LLM tokens by stage and direction.",
+        f"# TYPE {LLM_TOKENS_METRIC_NAME} counter",
+    ]
+    for stage, (_, input_tokens, output_tokens) in usage_snapshot.items():
+        lines.append(f'{LLM_TOKENS_METRIC_NAME}{{stage="{stage}",type="input"}} {input_tokens}')
+        lines.append(f'{LLM_TOKENS_METRIC_NAME}{{stage="{stage}",type="output"}} {output_tokens}')
+    return "\n".join(lines) + "\n"
+
+
+def get_stats():
+    """단계별 호출 수와 평균 시간 (ms)"""
+    with _histograms_lock:
+        return {
+            stage: {"count": h.count, "avg_ms": round(h.sum / h.count * 1000, 1) if h.count else 0.0}
+            for stage, h in sorted(_histograms.items())
+        }
+
+
+def get_usage_stats():
+    """단계별 LLM 호출 수/토큰 사용량"""
+    with _histograms_lock:
+        return {stage: _usage_summary(*entry) for stage, entry in sorted(_llm_usage.items())}
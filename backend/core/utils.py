@@ -12,6 +12,8 @@ from langchain_core.runnables import RunnableConfig
 from langchain_openai import ChatOpenAI
 from core.models import VisualizationRecommendation
 from core.state import get_session_history
+from core.visualization_rules import recommend_visualization
+from core.tracing import traced
 
 
 def ensure_json_serializable(value):
@@ -26,6 +28,8 @@ def ensure_json_serializable(value):
         return [ensure_json_serializable(v) for v in value]
     if isinstance(value, dict):
         return {k: ensure_json_serializable(v) for k, v in value.items()}
+    if value is pd.NaT:
+        return None
     if isinstance(value, (pd.Timestamp,)):
         return value.isoformat()
     if isinstance(value, np.datetime64):
@@ -79,9 +83,25 @@ visualization_prompt = PromptTemplate(
 )
 
 
-def infer_visualization_type(question: str, output, model: ChatOpenAI) -> Optional[dict]:
+# 모델별로 한 번만 구성한 시각화 체인: id(model) -> (model, chain)
+_visualization_chains = {}
+
+
+def get_visualization_chain(model: ChatOpenAI):
+    """시각화 추천 체인 (모델마다 한 번만 구성하여 재사용)"""
+    cached = _visualization_chains.get(id(model))
+    if cached is None or cached[0] is not model:
+        cached = (model, visualization_prompt | model | visualization_output_parser)
+        _visualization_chains[id(model)] = cached
+    return cached[1]
+
+
+@traced("visualization")
+def infer_visualization_type(question: str, output, model: ChatOpenAI, use_rules: bool = True) -> Optional[dict]:
     """
     질문과 결과 데이터를 분석하여 적절한 시각화 타입을 추론합니다.
+    - 규칙 기반 추천(core.visualization_rules)으로 결정되면 LLM을 호출하지 않음
+    - use_rules=False면 규칙 단계를 건너뜀 (호출 측에서 이미 규칙을 적용한 경우)
     """
     try:
         # DataFrame 또는 Series인 경우에만 시각화 추론
@@ -101,6 +121,12 @@ def infer_visualization_type(question: str, output, model: ChatOpenAI) -> Option
         # 컬럼이 너무 많으면 시각화 비추천
         if len(df_for_analysis.columns) > 10:
             return {"chart_type": "none"}
+
+        # 규칙으로 결정 가능한 경우 LLM 생략
+        if use_rules:
+            rule_meta = recommend_visualization(question, output)
+            if rule_meta:
+                return rule_meta
         
         # 샘플 데이터 준비 (최대 3행)
         sample_df = df_for_analysis.head(3)
@@ -110,7 +136,7 @@ def infer_visualization_type(question: str, output, model: ChatOpenAI) -> Option
         columns = list(df_for_analysis.columns)
         
         # LLM을 사용하여 시각화 타입 추론
-        chain = visualization_prompt | model | visualization_output_parser
+        chain = get_visualization_chain(model)
         
         # 콜백 비활성화하여 RootListenersTracer 에러 방지
         config = RunnableConfig(callbacks=[])
@@ -164,6 +190,18 @@ def infer_visualization_type(question: str, output, model: ChatOpenAI) -> Option
         return None
 
 
+def result_table(output) -> Optional[pd.DataFrame]:
+    """표 형태 결과(DataFrame/Series)를 응답 행과 같은 모양의 DataFrame으로 변환 (그 외는 None)"""
+    if isinstance(output, pd.DataFrame):
+        return output
+    if isinstance(output, pd.Series):
+        series_df = output.reset_index()
+        series_df.columns = ["index", "value"]
+        return series_df
+    return None
+
+
+@traced("serialize")
 def serialize_execution_output(output, question: str = "", model: Optional[ChatOpenAI] = None):
     """실행 결과를 직렬화"""
     # 시각화 메타데이터 추론
@@ -180,8 +218,7 @@ def serialize_execution_output(output, question: str = "", model: Optional[ChatO
             result["visualization"] = visualization_meta
         return result
     if isinstance(output, pd.Series):
-        series_df = output.reset_index()
-        series_df.columns = ["index", "value"]
+        series_df = result_table(output)
         result = {
             "type": "table",
             "columns": list(series_df.columns),
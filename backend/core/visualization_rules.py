@@ -0,0 +1,144 @@
+"""
+규칙 기반 시각화 추천 모듈
+- 결과의 dtype, 카디널리티, 날짜/연도 컬럼과 질문 키워드로 차트 타입을 바로 결정
+- 규칙으로 결정할 수 없는 경우에만 None을 반환하여 LLM 추천으로 넘김
+"""
+import re
+import threading
+from typing import Optional
+import pandas as pd
+
+
+TREND_KEYWORDS = ["추이", "추세", "변화", "증가", "감소", "연도별", "년도별", "월별", "연별", "시계열", "흐름", "trend"]
+RATIO_KEYWORDS = ["비율", "비중", "점유", "구성", "퍼센트", "%", "ratio", "share", "proportion"]
+CORRELATION_KEYWORDS = ["관계", "상관", "대비", "correlation"]
+
+LOCATION_KEYWORDS = ["시군구", "시도", "구", "지역", "주소"]
+TIME_NAME_PATTERN = re.compile(r"(연도|년도|연월|월|year|month|date|등록일|승인일|일자)$", re.IGNORECASE)
+
+# 파이 차트로 보여줄 최대 항목 수
+PIE_MAX_SLICES = 8
+# 막대가 이보다 많으면 가로 막대
+HORIZONTAL_BAR_THRESHOLD = 10
+
+# 추천 경로 통계 (rule: 규칙으로 결정, llm: LLM으로 위임)
+_counters = {"rule": 0, "llm": 0}
+_counters_lock = threading.Lock()
+
+
+def _contains(question: str, keywords) -> bool:
+    return any(keyword in question for keyword in keywords)
+
+
+def _is_time_column(name: str, series: pd.Series) -> bool:
+    if pd.api.types.is_datetime64_any_dtype(series):
+        return True
+    if not TIME_NAME_PATTERN.search(str(name)):
+        return False
+    if pd.api.types.is_numeric_dtype(series) and not pd.api.types.is_bool_dtype(series):
+        values = series.dropna()
+        # 연도(1900~2100) 또는 월(1~12) 값이면 시간 축으로 간주
+        return len(values) > 0 and (values.between(1900, 2100).all() or values.between(1, 12).all())
+    return False
+
+
+def _build_meta(chart_type: str, x_axis=None, y_axis=None, orientation="vertical", group_by=None, time_series=False) -> dict:
+    return {
+        "chart_type": chart_type,
+        "x_axis": x_axis,
+        "y_axis": y_axis,
+        "orientation": orientation,
+        "has_location": False,
+        "group_by": group_by,
+        "time_series": time_series,
+    }
+
+
+def _decide(question: str, frame: pd.DataFrame, forced_time_cols=()) -> Optional[dict]:
+    time_cols, numeric_cols, category_cols = [], [], []
+    for name in frame.columns:
+        series = frame[name]
+        if name in forced_time_cols or _is_time_column(name, series):
+            time_cols.append(name)
+        elif pd.api.types.is_numeric_dtype(series) and not pd.api.types.is_bool_dtype(series):
+            numeric_cols.append(name)
+        else:
+            category_cols.append(name)
+
+    row_count = len(frame)
+
+    # 값 하나짜리 결과는 차트로 보여줄 것이 없음
+    if row_count == 1 and not time_cols and not category_cols:
+        return _build_meta("none")
+
+    # 시간 축 + 수치 -> 라인 차트
+    if time_cols and numeric_cols and len(category_cols) <= 1:
+        if row_count > 2 or _contains(question, TREND_KEYWORDS):
+            return _build_meta(
+                "line_chart", x_axis=time_cols[0], y_axis=numeric_cols[0],
+                group_by=category_cols[0] if category_cols else None, time_series=True,
+            )
+
+    if len(category_cols) == 1 and len(numeric_cols) >= 1 and not time_cols:
+        x_axis, y_axis = category_cols[0], numeric_cols[0]
+        if _contains(question, CORRELATION_KEYWORDS) and len(numeric_cols) >= 2:
+            return None  # 범주별 두 수치의 관계: 막대/산점도 중 애매함
+        if _contains(question, RATIO_KEYWORDS) and row_count <= PIE_MAX_SLICES and (frame[y_axis].dropna() >= 0).all():
+            return _build_meta("pie_chart", x_axis=x_axis, y_axis=y_axis)
+        orientation = "horizontal" if row_count > HORIZONTAL_BAR_THRESHOLD else "vertical"
+        return _build_meta("bar_chart", x_axis=x_axis, y_axis=y_axis, orientation=orientation)
+
+    # 범주 두 개 + 수치 하나 -> 교차표 히트맵
+    if len(category_cols) == 2 and len(numeric_cols) == 1 and not time_cols:
+        if frame[category_cols[0]].nunique() > 1 and frame[category_cols[1]].nunique() > 1:
+            return _build_meta("heatmap", x_axis=category_cols[0], y_axis=category_cols[1], group_by=numeric_cols[0])
+
+    # 범주 없이 수치 두 개 -> 산점도
+    if not category_cols and not time_cols and len(numeric_cols) == 2 and row_count > 2:
+        return _build_meta("scatter_plot", x_axis=numeric_cols[0], y_axis=numeric_cols[1])
+
+    return None
+
+
+def recommend_visualization(question: str, output) -> Optional[dict]:
+    """
+    규칙으로 시각화 메타데이터 추천
+    - DataFrame/Series가 아니거나 비어 있거나, 규칙으로 결정할 수 없으면 None (LLM 추천 대상)
+    - Series는 직렬화 결과와 같이 index/value 컬럼으로 보고 판단
+    """
+    if not isinstance(output, (pd.DataFrame, pd.Series)) or len(output) == 0:
+        return None
+
+    question = (question or "").lower()
+    if isinstance(output, pd.Series) and output.index.nlevels > 1:
+        # 다중 인덱스 Series는 인덱스 레벨을 컬럼으로 펼쳐서 판단
+        output = output.reset_index()
+    if isinstance(output, pd.Series):
+        frame = output.reset_index()
+        frame.columns = ["index", "value"]
+        index_name = output.index.name
+        time_index = pd.api.types.is_datetime64_any_dtype(output.index) or (
+            index_name is not None and _is_time_column(index_name, output.index.to_series())
+        )
+        meta = _decide(question, frame, forced_time_cols=["index"] if time_index else [])
+        location_names = [index_name]
+    elif len(output.columns) > 10:
+        meta = _build_meta("none")
+        location_names = []
+    else:
+        meta = _decide(question, output)
+        location_names = list(output.columns)
+
+    with _counters_lock:
+        _counters["rule" if meta else "llm"] += 1
+    if meta and meta["chart_type"] != "none":
+        meta["has_location"] = any(
+            keyword in str(name) for name in location_names if name is not None for keyword in LOCATION_KEYWORDS
+        )
+    return meta
+
+
+def get_stats():
+    """규칙/LLM 추천 경로별 횟수"""
+    with _counters_lock:
+        return dict(_counters)
@@ -1,24 +1,55 @@
 """
 워크플로우 그래프 모듈
 """
+from typing import Optional
 from langgraph.graph import END, StateGraph
-from langgraph.checkpoint.memory import MemorySaver
+from langgraph.checkpoint.base import BaseCheckpointSaver
+from langchain_core.runnables import Runnable, RunnableConfig, RunnableLambda
 from core.models import GraphState
+from core.speculation import SpeculativeCodeGenerator
+from core.checkpointer import create_checkpointer
+from core.tracing import span
 
 
-def create_workflow(router, agent):
-    """워크플로우 그래프 생성"""
+def traced_node(stage: str, node: Runnable) -> Runnable:
+    """노드 실행 시간을 stage 단계로 기록 (동기/비동기 경로 모두)"""
+
+    def run(state: GraphState, config: RunnableConfig) -> GraphState:
+        with span(stage):
+            return node.invoke(state, config)
+
+    async def arun(state: GraphState, config: RunnableConfig) -> GraphState:
+        with span(stage):
+            return await node.ainvoke(state, config)
+
+    return RunnableLambda(run, afunc=arun, name=stage)
+
+
+def create_workflow(
+    router,
+    agent,
+    speculator: Optional[SpeculativeCodeGenerator] = None,
+    checkpointer: Optional[BaseCheckpointSaver] = None,
+):
+    """
+    워크플로우 그래프 생성
+    - speculator가 있으면 Router 분류와 동시에 코드 생성을 시작 (비동기 실행 시)
+    - checkpointer가 없으면 스레드별 최근 체크포인트만 유지하는 기본 체크포인터 사용 (CHECKPOINT_BACKEND)
+    """
+    if speculator is not None:
+        router, agent = speculator.wrap_nodes(router, agent)
+
     workflow = StateGraph(GraphState)
 
-    workflow.add_node("Router", router)
-    workflow.add_node("Agent", agent)
+    workflow.add_node("Router", traced_node("node.router", router))
+    workflow.add_node("Agent", traced_node("node.agent", agent))
 
     workflow.add_edge("Router", "Agent")
     workflow.add_edge("Agent", END)
 
     workflow.set_entry_point("Router")
 
-    memory = MemorySaver()
+    memory = checkpointer or create_checkpointer()
     graph = workflow.compile(checkpointer=memory)
     
     return graph
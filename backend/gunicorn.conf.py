@@ -0,0 +1,38 @@
+"""
+운영용 멀티 워커 서버 설정 (gunicorn + uvicorn 워커)
+실행: gunicorn -c gunicorn.conf.py main:app
+- preload_app: 마스터에서 데이터셋/색인/집계 큐브를 한 번 로드한 뒤 워커를 fork하여 copy-on-write로 공유
+  (Arrow 스냅샷의 숫자/카테고리 버퍼는 메모리 맵이라 페이지 캐시 하나를 모든 워커가 공유)
+- 세션 히스토리/실행 결과/체크포인트는 로컬 SQLite 파일(WAL)로 공유하여
+  어느 워커로 요청이 가도 session_id/execution_id를 조회할 수 있음
+"""
+import gc
+import os
+import multiprocessing
+
+# main.py를 로드하기 전에 설정 (명시적으로 지정한 값이 있으면 유지)
+os.environ.setdefault("SERVER_PRELOAD", "1")
+os.environ.setdefault("SHARED_STATE_PATH", os.path.join("data", ".cache", "shared_state.sqlite"))
+os.environ.setdefault("CHECKPOINT_BACKEND", "sqlite")
+
+bind = os.getenv("SERVER_BIND", "0.0.0.0:8000")
+workers = int(os.getenv("SERVER_WORKERS", str(multiprocessing.cpu_count())))
+worker_class = "uvicorn.workers.UvicornWorker"
+preload_app = True
+keepalive = 30
+timeout = 240  # 그래프 타임아웃(180초)보다 길게
+max_requests = 1000  # 워커별 최대 요청 수 (uvicorn limit_max_requests)
+max_requests_jitter = 100
+loglevel = os.getenv("SERVER_LOG_LEVEL", "warning")
+
+
+def pre_fork(server, worker):
+    # 로드된 객체를 GC 추적 대상에서 빼서, 워커의 GC가 공유 페이지를 건드려 복사되지 않도록 함
+    gc.freeze()
+
+
+def post_fork(server, worker):
+    # 코드 실행 샌드박스는 서버 워커마다 따로 fork (워커 간 파이프 공유 방지)
+    import main
+    if main.sandbox is not None:
+        main.sandbox.start()
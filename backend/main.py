@@ -3,9 +3,7 @@ Factory Chatbot Main Entry Point
 모든 모듈을 통합하여 실행하는 메인 파일
 """
 import os
-import pandas as pd
 from dotenv import load_dotenv
-from langchain_openai import ChatOpenAI
 
 # uvicorn은 FastAPI 실행 시에만 필요하므로 선택적으로 import
 try:
@@ -15,48 +13,88 @@ except ImportError:
 
 # 환경변수 로드
 load_dotenv(override=True)
-OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
-if not OPENAI_API_KEY:
-    raise ValueError("OPENAI_API_KEY not found in environment variables")
-
-# 모델 초기화
-model = ChatOpenAI(
-    openai_api_key=OPENAI_API_KEY,
-    model="gpt-5.1-2025-11-13",
-    temperature=0
-)
 
-# 데이터 로드
-df = pd.read_csv('data/전국공장등록현황_서울_통합.csv')
+# 모델 초기화 (LLM_BACKEND=replay면 OpenAI 없이 기록된 응답을 재생, record면 응답을 기록)
+from core.llm import create_chat_model
+model = create_chat_model()
 
 # 모듈 import
+from core.data_loader import load_factory_dataframe, get_dataset_version
 from core.models import GraphState  # test.ipynb에서 사용하기 위해 export
 from core.router import create_router
-from core.code_executor import create_code_tools
+from core.fast_router import FastRouteClassifier
+from core.code_executor import create_code_tools, create_code_generator_chain
+from core.speculation import SpeculativeCodeGenerator
+from core.sandbox import SandboxPool, SANDBOX_WORKERS, fork_available
+from core.text_index import create_search_helpers
+from core.aggregate_cube import create_aggregate_helpers
+from core.result_cache import ExecutionResultCache
+from core.question_cache import QuestionCache
 from core.agent import create_agent
 from core.workflow import create_workflow
 from core.execution_store import ExecutionResultStore
+from core.shared_state import get_shared_db
 from core.api import create_app
 
-# Router 생성
-router, router_conditional_edge = create_router(model)
+# gunicorn.conf.py로 실행하면 마스터에서 이 모듈을 한 번 로드한 뒤 서버 워커를 fork
+SERVER_PRELOAD = os.getenv("SERVER_PRELOAD", "0") == "1"
+
+# 데이터 로드 (Arrow 스냅샷이 있으면 메모리 맵으로 로드)
+DATASET_PATH = 'data/전국공장등록현황_서울_통합.csv'
+df = load_factory_dataframe(DATASET_PATH)
+
+# 데이터셋 어휘 (구 이름, 업종명, 규모) - 질문 캐시/로컬 분류기에서 사용
+dataset_vocabulary = [
+    str(value)
+    for column in ['정제_시군구명', '정제_업종명', '공장규모']
+    if column in df.columns
+    for value in df[column].dropna().unique()
+]
+
+# Router 생성 (로컬 분류기로 확실한 질문은 LLM 호출 없이 분류)
+route_classifier = FastRouteClassifier(vocabulary=dataset_vocabulary)
+router, router_conditional_edge = create_router(model, route_classifier)
+
+# 코드 실행 환경에 주입할 헬퍼 (생산품/원자재 n-gram 색인, 공장 수 집계 큐브)
+executor_namespace = {
+    **create_search_helpers(df),
+    **create_aggregate_helpers(df),
+}
+
+# 코드 실행 결과 캐시 (데이터셋 버전이 바뀌면 키가 달라짐)
+result_cache = ExecutionResultCache(dataset_version=get_dataset_version(DATASET_PATH))
+
+# 라우팅과 코드 생성을 동시에 시작하는 추측 실행 (SPECULATIVE_CODEGEN=1로 켬)
+SPECULATIVE_CODEGEN = os.getenv("SPECULATIVE_CODEGEN", "0") == "1"
+speculator = SpeculativeCodeGenerator(create_code_generator_chain(model)) if SPECULATIVE_CODEGEN else None
+
+# 생성 코드 실행용 워커 프로세스 풀 (서버 스레드가 뜨기 전에 fork, SANDBOX_WORKERS=0이면 현재 프로세스에서 실행)
+# preload 모드에서는 서버 워커가 fork된 뒤 post_fork 훅에서 시작
+sandbox = (
+    SandboxPool(df, executor_namespace, start=not SERVER_PRELOAD)
+    if SANDBOX_WORKERS > 0 and fork_available() else None
+)
 
 # 코드 도구 생성
-tools = create_code_tools(model, df)
+tools = create_code_tools(model, df, executor_namespace, result_cache, speculator, sandbox)
 
-# 실행 결과 저장소 생성 (model 전달)
-execution_store = ExecutionResultStore(model=model)
+# 실행 결과 저장소 생성 (model 전달, SHARED_STATE_PATH가 있으면 서버 워커 간 공유)
+execution_store = ExecutionResultStore(model=model, shared_db=get_shared_db())
 
 # Agent 생성
 agent = create_agent(model, tools, execution_store)
 
 # 워크플로우 그래프 생성
-graph = create_workflow(router, agent)
+graph = create_workflow(router, agent, speculator)
+
+# 질문 유사도 캐시 (구 이름/업종명/규모가 다른 질문은 같은 질문으로 보지 않음)
+question_cache = QuestionCache(entity_terms=dataset_vocabulary)
 
 # FastAPI 앱 생성
-app = create_app(graph, execution_store)
+app = create_app(graph, execution_store, result_cache, question_cache, route_classifier, speculator, sandbox)
 
 if __name__ == "__main__":
+    # 개발용 단일 프로세스 실행 (운영 멀티 워커 실행은 gunicorn -c gunicorn.conf.py main:app)
     if uvicorn is None:
         raise ImportError("uvicorn is required to run the FastAPI server. Install it with: pip install uvicorn")
     uvicorn.run(
@@ -64,7 +102,7 @@ if __name__ == "__main__":
         host="0.0.0.0", 
         port=8000, 
         reload=True,
-        workers=1,  # 단일 워커로 메모리 공유 문제 방지
+        workers=1,  # reload 모드는 단일 워커만 지원
         timeout_keep_alive=30,
         limit_concurrency=100,  # 동시 연결 제한
         limit_max_requests=1000  # 최대 요청 수 제한
@@ -0,0 +1,60 @@
+"""
+질문 캐시 회귀 테스트
+- 방향/비교/부정 표현만 다른 긴 질문은 n-gram 유사도가 임계값을 넘어도 캐시 답변을 돌려주면 안 됨
+
+backend 디렉토리에서 실행:
+    python -m unittest discover tests
+"""
+import unittest
+from core.question_cache import QuestionCache
+
+
+STORED = "서울에서 종업원 수가 가장 많은 공장 상위 10곳을 알려줘"
+
+# (저장한 질문, 방향만 바꾼 질문)
+OPPOSITE_PAIRS = [
+    (STORED, "서울에서 종업원 수가 가장 적은 공장 상위 10곳을 알려줘"),
+    (STORED, "서울에서 종업원 수가 가장 많은 공장 하위 10곳을 알려줘"),
+    ("종업원이 가장 많은 업종별 공장 수 최대값을 알려줘", "종업원이 가장 많은 업종별 공장 수 최소값을 알려줘"),
+    ("최근 5년 동안 공장 수가 가장 많이 증가한 구를 알려줘", "최근 5년 동안 공장 수가 가장 많이 감소한 구를 알려줘"),
+    ("여성 종업원 비율이 가장 높은 업종 상위 5개를 알려줘", "여성 종업원 비율이 가장 낮은 업종 상위 5개를 알려줘"),
+    ("종업원이 100명 이상인 공장의 업종별 공장 수를 알려줘", "종업원이 100명 이하인 공장의 업종별 공장 수를 알려줘"),
+    ("업종별 공장 수를 오름차순으로 정렬해서 보여줘", "업종별 공장 수를 내림차순으로 정렬해서 보여줘"),
+    ("지식산업센터를 제외한 구별 공장 수를 알려줘", "지식산업센터를 포함한 구별 공장 수를 알려줘"),
+    ("원자재 정보가 있는 공장의 업종별 공장 수를 알려줘", "원자재 정보가 없는 공장의 업종별 공장 수를 알려줘"),
+    ("생산품이 등록된 공장의 업종별 공장 수를 알려줘", "생산품이 등록되지 않은 공장의 업종별 공장 수를 알려줘"),
+]
+
+
+class QuestionCacheDirectionTest(unittest.TestCase):
+    def make_cache(self):
+        return QuestionCache(entity_terms=["강남구", "금천구", "전자부품 제조업"], threshold=0.9)
+
+    def test_opposite_direction_is_not_served(self):
+        for stored, opposite in OPPOSITE_PAIRS:
+            with self.subTest(stored=stored, opposite=opposite):
+                cache = self.make_cache()
+                cache.store(stored, "stored answer", "execution-1")
+                self.assertIsNone(cache.lookup(opposite))
+                # 반대 방향 질문을 저장해도 원래 질문에는 원래 답변
+                cache.store(opposite, "opposite answer", "execution-2")
+                self.assertEqual(cache.lookup(stored)["execution_id"], "execution-1")
+
+    def test_same_direction_is_served(self):
+        cache = self.make_cache()
+        cache.store(STORED, "stored answer", "execution-1")
+        cached = cache.lookup("서울에서 종업원 수가 가장 많은 공장 상위 10곳 알려줘")
+        self.assertIsNotNone(cached)
+        self.assertEqual(cached["execution_id"], "execution-1")
+
+    def test_words_containing_short_stems_do_not_change_direction(self):
+        # '면적'의 '적', '오늘'의 '늘'은 방향 표현이 아님
+        cache = self.make_cache()
+        question = "오늘 기준으로 강남구에 있는 공장들의 평균 건축면적과 제조시설면적을 알려줘"
+        cache.store(question, "stored answer", "execution-1")
+        self.assertIsNotNone(cache.lookup("오늘 기준으로 강남구에 있는 공장들의 평균 건축면적과 제조시설면적 알려줘"))
+        self.assertEqual(cache._signature(question, "")[2], frozenset())
+
+
+if __name__ == "__main__":
+    unittest.main()
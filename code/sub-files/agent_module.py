@@ -3,15 +3,13 @@ import time
 import uuid
 import pandas as pd
 from langchain.agents import AgentExecutor, create_tool_calling_agent
-from langchain_core.tools import StructuredTool
 from langchain_core.prompts import ChatPromptTemplate
 from langchain_core.runnables.history import RunnableWithMessageHistory
 from langchain_core.runnables import RunnableConfig
-from langchain_core.pydantic_v1 import BaseModel, Field
 
 from config import model
-from state import get_session_history, generate_session_id
-from tools_module import _query_router_impl, _code_generator_impl, code_executor
+from state import get_session_history, generate_session_id, current_session_id
+from tools_module import tools
 
 
 class ExecutionResultStore:
@@ -141,6 +139,26 @@ agent_prompt = ChatPromptTemplate.from_messages(
 )
 
 
+# Agent는 모듈 로드 시 한 번만 구성하고, 세션은 호출마다 config로 바인딩
+agent_obj = create_tool_calling_agent(model, tools, agent_prompt)
+
+agent_executor = AgentExecutor(
+    agent=agent_obj,
+    tools=tools,
+    verbose=False,
+    max_iterations=10,
+    max_execution_time=120,
+    handle_parsing_errors=True,
+    return_intermediate_steps=True,
+)
+
+agent_with_history = RunnableWithMessageHistory(
+    agent_executor,
+    get_session_history,
+    history_messages_key="chat_history",
+)
+
+
 def run_agent(
     question: str,
     session_id: str | None = None,
@@ -165,62 +183,10 @@ def run_agent(
         }
     """
     resolved_session_id = session_id or generate_session_id()
+    # 도구(query_router, code_generator)가 같은 세션 히스토리를 쓰도록 현재 세션 설정
+    session_token = current_session_id.set(resolved_session_id)
 
     try:
-        # session_id를 바인딩한 도구들 생성
-        # 도구들이 같은 세션을 사용하도록 래핑
-        def create_session_bound_tools(session_id: str):
-            """session_id를 바인딩한 도구들을 생성"""
-            def query_router_wrapper(query: str):
-                return _query_router_impl(query, session_id)
-            
-            def code_generator_wrapper(input: str):
-                return _code_generator_impl(input, session_id)
-            
-            # StructuredTool을 사용하여 명시적 입력 스키마 정의
-            class QueryRouterInput(BaseModel):
-                query: str = Field(description="분류할 질문")
-            
-            class CodeGeneratorInput(BaseModel):
-                input: str = Field(description="코드를 생성할 질문")
-            
-            query_router_tool = StructuredTool.from_function(
-                func=query_router_wrapper,
-                name="query_router",
-                description="질문을 일반(general) 또는 도메인 특화(domain_specific)로 분류하는 도구. 'general': 데이터 쿼리와 무관한 일반적인 질문 (번역, 일반 상식 등). 'domain_specific': 공장이나 회사 도메인과 관련된 데이터 쿼리 질문",
-                args_schema=QueryRouterInput,
-            )
-            
-            code_generator_tool = StructuredTool.from_function(
-                func=code_generator_wrapper,
-                name="code_generator",
-                description="사용자의 질문에 답하기 위해 CSV에서 쿼리할 수 있는 Python Pandas 코드를 작성하는 도구",
-                args_schema=CodeGeneratorInput,
-            )
-            
-            return [query_router_tool, code_generator_tool, code_executor]
-        
-        session_tools = create_session_bound_tools(resolved_session_id)
-        
-        # Agent 생성
-        agent_obj = create_tool_calling_agent(model, session_tools, agent_prompt)
-
-        agent_executor = AgentExecutor(
-            agent=agent_obj,
-            tools=session_tools,
-            verbose=False,
-            max_iterations=10,
-            max_execution_time=120,
-            handle_parsing_errors=True,
-            return_intermediate_steps=True,
-        )
-
-        agent_with_history = RunnableWithMessageHistory(
-            agent_executor,
-            get_session_history,
-            history_messages_key="chat_history",
-        )
-
         max_attempts = 3
         for attempt in range(max_attempts):
             try:
@@ -261,6 +227,8 @@ def run_agent(
             "execution_id": None,
             "session_id": resolved_session_id,
         }
+    finally:
+        current_session_id.reset(session_token)
 
 
 __all__ = ["run_agent", "agent_prompt", "capture_execution_snapshot", "execution_store"]
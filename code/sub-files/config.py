@@ -1,7 +1,11 @@
 import os
+import sys
 from dotenv import load_dotenv
 from langchain_openai import ChatOpenAI
-import pandas as pd
+
+# 데이터 로더는 backend/core/data_loader.py 하나만 유지 (스냅샷/스키마 변환 로직 공유)
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "..", "backend"))
+from core.data_loader import load_factory_dataframe
 
 
 # 환경변수 로드
@@ -20,7 +24,8 @@ model = ChatOpenAI(
 )
 
 # 데이터프레임 로드
-df = pd.read_csv("data/cleaned_전국공장등록현황_preprocessed_seoul.csv", low_memory=False)
+# (Arrow 스냅샷이 있으면 메모리 맵으로 로드, 원본이 바뀐 경우에만 CSV 파싱)
+df = load_factory_dataframe("data/cleaned_전국공장등록현황_preprocessed_seoul.csv")
 
 
 __all__ = ["OPENAI_API_KEY", "model", "df"]
@@ -1,5 +1,6 @@
 import threading
 import uuid
+from contextvars import ContextVar
 
 from langchain_community.chat_message_histories import ChatMessageHistory
 
@@ -23,6 +24,9 @@ class ThreadSafeStore:
 # 전역 스레드 안전 저장소
 thread_safe_store = ThreadSafeStore()
 
+# 현재 요청의 세션 ID (도구 호출에는 RunnableConfig가 전달되지 않으므로 이 값으로 세션을 찾음)
+current_session_id: ContextVar[str | None] = ContextVar("current_session_id", default=None)
+
 
 def get_session_history(session_id: str) -> ChatMessageHistory:
     """
@@ -41,6 +45,7 @@ def generate_session_id() -> str:
 __all__ = [
     "get_session_history",
     "generate_session_id",
+    "current_session_id",
 ]
 
 
@@ -8,7 +8,7 @@ from langchain_core.runnables import RunnableConfig
 
 from config import df
 from config import model
-from state import generate_session_id, get_session_history
+from state import current_session_id, generate_session_id, get_session_history
 
 
 class Router(BaseModel):
@@ -114,19 +114,26 @@ code_generator_prompt = PromptTemplate(
 )
 
 
+# 체인은 모듈 로드 시 한 번만 구성하고, 세션은 호출마다 config로 바인딩
+router_with_history = RunnableWithMessageHistory(
+    router_prompt | model | router_output_parser,
+    get_session_history,
+    input_messages_key="query",
+    history_messages_key="chat_history",
+)
+
+code_generator_with_history = RunnableWithMessageHistory(
+    code_generator_prompt | model | code_generator_output_parser,
+    get_session_history,
+    input_messages_key="query",
+    history_messages_key="chat_history",
+)
+
+
 def _query_router_impl(query: str, session_id: str):
     """
     질문을 일반(general) 또는 도메인 특화(domain_specific)로 분류하는 내부 구현.
     """
-    chain = router_prompt | model | router_output_parser
-
-    router_with_history = RunnableWithMessageHistory(
-        chain,
-        get_session_history,
-        input_messages_key="query",
-        history_messages_key="chat_history",
-    )
-
     config = RunnableConfig(
         configurable={"session_id": session_id},
         callbacks=[]  # 콜백 비활성화
@@ -145,10 +152,8 @@ def query_router(query: str):
     'general': 데이터 쿼리와 무관한 일반적인 질문 (번역, 일반 상식 등)
     'domain_specific': 공장이나 회사 도메인과 관련된 데이터 쿼리 질문
     """
-    # Agent가 호출할 때는 session_id가 없으므로 자동 생성
-    # 실제로는 Agent 실행 컨텍스트에서 session_id를 가져와야 하지만,
-    # LangChain 도구는 이를 직접 지원하지 않으므로 자동 생성 사용
-    session_id = generate_session_id()
+    # run_agent가 설정한 현재 세션을 사용하고, 없으면 자동 생성
+    session_id = current_session_id.get() or generate_session_id()
     return _query_router_impl(query, session_id)
 
 
@@ -156,15 +161,6 @@ def _code_generator_impl(input, session_id: str):
     """
     코드 생성 내부 구현.
     """
-    chain = code_generator_prompt | model | code_generator_output_parser
-
-    code_generator_with_history = RunnableWithMessageHistory(
-        chain,
-        get_session_history,
-        input_messages_key="query",
-        history_messages_key="chat_history",
-    )
-
     config = RunnableConfig(
         configurable={"session_id": session_id},
         callbacks=[]  # 콜백 비활성화
@@ -181,32 +177,25 @@ def code_generator(input: str):
     """
     사용자의 질문에 답하기 위해 CSV에서 쿼리할 수 있는 Python Pandas 코드를 작성하는 도구
     """
-    # Agent가 호출할 때는 session_id가 없으므로 자동 생성
-    session_id = generate_session_id()
+    # run_agent가 설정한 현재 세션을 사용하고, 없으면 자동 생성
+    session_id = current_session_id.get() or generate_session_id()
     return _code_generator_impl(input, session_id)
 
 
 @tool
-def code_executor(input_code: str, max_retries: int = 2):
+def code_executor(input_code: str):
     """
     LLM이 생성한 Pandas 코드를 안전하게 실행하고 return_var 반환.
     df는 글로벌 변수 사용.
-    NA, None, 0 등의 에러 대비.
+    같은 코드를 다시 실행해도 같은 오류가 나므로 한 번만 실행하고, 오류는 에이전트가 코드를 고치도록 그대로 전달.
     """
     global df  # type: ignore[global-variable-not-assigned]
     local_vars = {"df": df}
 
-    for attempt in range(max_retries):
-        try:
-            exec(input_code, local_vars)
-            if "return_var" not in local_vars:
-                raise ValueError("Generated code did not assign value to 'return_var'.")
-            return local_vars["return_var"]
-        except Exception as e:  # pylint: disable=broad-except
-            # print(f"⚠️ 코드 실행 실패 (시도 {attempt+1}/{max_retries}): {e}")
-            # NA나 boolean 비교 에러 등 재시도 가능
-            if attempt == max_retries - 1:
-                raise
+    exec(input_code, local_vars)
+    if "return_var" not in local_vars:
+        raise ValueError("Generated code did not assign value to 'return_var'.")
+    return local_vars["return_var"]
 
 
 tools = [query_router, code_generator, code_executor]